@@ -18,10 +18,19 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import our modules
 from modules.transcription import transcribe_video
-from modules.engagement import find_engaging_moments, frames_to_timestamps
-from modules.insights import generate_insights, generate_ad_creatives
-from modules.content import create_youtube_short, create_ad_video, generate_thumbnail
-from modules.utils import ensure_dir, save_metadata, generate_output_filename, predict_engagement
+from modules.engagement import find_engaging_moments, load_engagement_head
+from modules.llm_client import configure as configure_llm, get_metrics_summary
+from modules.llm_pipeline import LLMPipeline
+from modules.llm_cache import configure_cache, get_cache_stats
+from modules.llm_health import get_breaker_stats
+from modules.llm_dispatch import configure_dispatcher, get_dispatch_stats
+from modules.insights import save_transcript, load_or_generate_insights, INSIGHTS_FILENAME
+from modules.content import render_platform_outputs, render_previews
+from modules.render_pool import render_platforms
+from modules.encoding import ENCODING_PROFILES
+from modules.captions import CAPTION_MODES
+from modules.scratch import open_scratch, close_scratch
+from modules.utils import ensure_dir, generate_output_filename
 
 # Define output directories BEFORE main function
 OUTPUT_DIR = "outputs"
@@ -37,22 +46,36 @@ PLATFORM_SETTINGS = {
     "youtube_shorts": {
         "duration": 60,  # seconds
         "aspect_ratio": "9:16",
+        "encoding": "balanced",  # profile in modules/encoding.py
+        "smart_format": True,  # see SMART_FORMATS in modules/content.py
+        "captions": "burn_in",  # see CAPTION_MODES in modules/captions.py
     },
     "youtube_ads": {
         "duration": 15,  # seconds
         "aspect_ratio": "16:9",
+        "encoding": "balanced",
+        "captions": "none",
     },
     "display_ads": {
         "duration": 6,  # seconds
         "aspect_ratio": "1:1",
+        "encoding": "fast",
+        "captions": "none",
     },
     "performance_max": {
         "duration": 20,  # seconds
         "aspect_ratio": "16:9",
+        "encoding": "balanced",
+        "captions": "none",
     }
 }
 
-def process_video(video_path, platforms=None, job_id=None, output_dir=None, font_path=None):
+# --short-format choices for the smart_format of YouTube Shorts
+SHORT_FORMATS = {"smart": True, "center": False, "background_extension": "background_extension", "blur_fill": "blur_fill"}
+
+def process_video(video_path, platforms=None, job_id=None, output_dir=None, font_path=None, insights=False,
+                  multi_output=False, render_workers=None, ffmpeg_threads=None, encoding=None, short_format=None,
+                  preview=True, captions=None):
     """
     Process a video to create content for different platforms.
     
@@ -62,6 +85,14 @@ def process_video(video_path, platforms=None, job_id=None, output_dir=None, font
     - job_id: Optional job identifier
     - output_dir: Optional custom output directory
     - font_path: Optional path to a custom font for thumbnails
+    - insights: Also generate insights during the job (default: on demand only)
+    - multi_output: Render all platform videos from one decode of the source
+    - render_workers: Worker processes rendering platforms in parallel (default: RENDER_WORKERS or 1)
+    - ffmpeg_threads: Threads per ffmpeg encode in the workers (default: cores / workers)
+    - encoding: Encoding profile for every platform (default: each platform's "encoding" setting)
+    - short_format: smart_format for YouTube Shorts (default: the platform's "smart_format" setting)
+    - preview: Publish low-resolution previews before the final renders
+    - captions: Caption mode for every platform (default: each platform's "captions" setting)
     
     Returns:
     - Dictionary with results for each platform
@@ -75,161 +106,177 @@ def process_video(video_path, platforms=None, job_id=None, output_dir=None, font
             for platform in PLATFORM_DIRS
         }
 
+    job_start_time = time.time()
+    
     # Create output directories
     for directory in PLATFORM_DIRS.values():
         ensure_dir(directory)
+
+    # Render intermediates go to a scratch directory for this job (tmpfs when available)
+    scratch = open_scratch(job_id)
+    print(f"Scratch space: {scratch.directory}")
     
-    if platforms is None:
-        platforms = list(PLATFORM_DIRS.keys())
-    
-    results = {}
-    
-    # Step 1: Transcribe the video
-    print("\n1. Transcribing video...")
-    start_time = time.time()
-    transcript = transcribe_video(video_path)
-    # Changed Unicode checkmark to "+" to avoid encoding issues
-    print(f"+ Transcription completed in {time.time() - start_time:.1f} seconds")
-    print(f"  Transcript length: {len(transcript)} characters")
-    
-    # Step 2: Find engaging moments
-    print("\n2. Analyzing video for engaging moments...")
-    start_time = time.time()
-    engaging_moments = find_engaging_moments(video_path, top_n=5)
-    timestamps = frames_to_timestamps(engaging_moments, video_path)
-    # Changed Unicode checkmark to "+" to avoid encoding issues
-    print(f"+ Video analysis completed in {time.time() - start_time:.1f} seconds")
-    print(f"  Found {len(timestamps)} engaging moments:")
-    for i, ts in enumerate(timestamps):
-        print(f"  - Moment {i+1}: {ts:.2f}s")
-    
-    # Step 3: Generate insights
-    print("\n3. Generating insights...")
-    start_time = time.time()
-    insights = generate_insights(transcript)
-    print(insights)
-    # Changed Unicode checkmark to "+" to avoid encoding issues
-    print(f"+ Insights generated in {time.time() - start_time:.1f} seconds")
-    
-    # Step 4: Process for each platform
-    for platform in platforms:
-        print(f"\n4. Creating content for {platform}...")
+    # The LLM loop thread and the scratch files are released even when a stage fails
+    pipeline = None
+    try:
+        if platforms is None:
+            platforms = list(PLATFORM_DIRS.keys())
+        
+        # Step 1: Transcribe the video
+        print("\n1. Transcribing video...")
         start_time = time.time()
+        transcript = transcribe_video(video_path)
+        # Changed Unicode checkmark to "+" to avoid encoding issues
+        print(f"+ Transcription completed in {time.time() - start_time:.1f} seconds")
+        print(f"  Transcript length: {len(transcript)} characters")
+        # Kept with the job outputs so insights can be generated on demand later
+        save_transcript(transcript, OUTPUT_DIR)
         
-        # Get platform settings
-        settings = PLATFORM_SETTINGS[platform]
-        output_dir = PLATFORM_DIRS[platform]
+        # Start every LLM request now so they overlap with video analysis and rendering
+        ad_formats = {platform: platform.replace("_", " ").title() for platform in platforms}
+        llm_start_time = time.time()
+        pipeline = LLMPipeline()
+        llm_futures = pipeline.start(transcript, list(ad_formats.values()), with_insights=insights)
         
-        # Generate ad creatives for this platform
-        ad_creatives = generate_ad_creatives(transcript, ad_format=platform.replace("_", " ").title())
+        # Step 2: Find engaging moments
+        print("\n2. Analyzing video for engaging moments...")
+        start_time = time.time()
+        timestamps = find_engaging_moments(video_path, top_n=5, output_dir=OUTPUT_DIR)
+        # Changed Unicode checkmark to "+" to avoid encoding issues
+        print(f"+ Video analysis completed in {time.time() - start_time:.1f} seconds")
+        print(f"  Found {len(timestamps)} engaging moments:")
+        for i, ts in enumerate(timestamps):
+            print(f"  - Moment {i+1}: {ts:.2f}s")
         
-        # Select the best timestamp for this platform (for simplicity, using the first one)
-        timestamp = timestamps[0]
+        # Step 3: Ad creatives (and insights, if requested) keep generating in the background;
+        # each platform only waits for its creatives at the text-overlay step
+        print("\n3. Generating ad creatives in the background...")
         
-        # Create the content based on platform
-        output_filename = generate_output_filename(platform)
-        output_path = os.path.join(output_dir, output_filename)
+        # Select the best timestamp for each platform (for simplicity, using the first one)
+        timestamp = timestamps[0]
+        output_filenames = {platform: generate_output_filename(platform) for platform in platforms}
         
-        if platform == "youtube_shorts":
-            # Create a YouTube Short
-            duration = min(settings["duration"], 60)  # Max 60 seconds for Shorts
-            video_path_out = create_youtube_short(
-                video_path, 
-                timestamp, 
-                timestamp + duration, 
-                output_path,
-                add_text={'headline': ad_creatives.get('headline', ''), 'cta': ad_creatives.get('call_to_action', '')}
-            )
-        else:
-            # Create an ad video
-            video_path_out = create_ad_video(
-                video_path,
-                timestamp,
-                settings["duration"],
-                output_path,
-                platform,
-                ad_text=ad_creatives
-            )
+        jobs = [{
+            "platform": platform,
+            "output_path": os.path.join(PLATFORM_DIRS[platform], output_filenames[platform]),
+            "start_time": timestamp,
+            "duration": min(PLATFORM_SETTINGS[platform]["duration"], 60),
+            "text": llm_futures["creatives"][ad_formats[platform]].result,
+            "encoding": encoding or PLATFORM_SETTINGS[platform]["encoding"],
+            "subtitles": (captions or PLATFORM_SETTINGS[platform]["captions"]) == "burn_in",
+            "smart_format": PLATFORM_SETTINGS[platform].get("smart_format", True) if short_format is None else short_format
+        } for platform in platforms]
         
-        # Generate a thumbnail with headline overlay
-        thumbnail_filename = generate_output_filename(platform, "jpg")
-        thumbnail_path = os.path.join(output_dir, thumbnail_filename)
+        # Low-resolution previews go out as soon as the moment and crop are known;
+        # the final renders replace them in place
+        preview_stats = None
+        if preview:
+            print("\nPublishing low-resolution previews...")
+            start_time = time.time()
+            try:
+                render_previews(video_path, jobs)
+                preview_stats = {
+                    "platforms": len(jobs),
+                    "render_time": round(time.time() - start_time, 2),
+                    "time_to_first_preview": round(time.time() - job_start_time, 2)
+                }
+                print(f"+ Previews published {preview_stats['time_to_first_preview']:.1f} seconds into the job")
+            except Exception as e:
+                print(f"Preview render failed, continuing with the final render: {e}")
         
-        # Pass both headline and call to action to the thumbnail generator
-        # We'll modify the function to accept a dictionary with both values
-        generate_thumbnail(
-            video_path, 
-            timestamp, 
-            thumbnail_path, 
-            headline=ad_creatives
-        )
+        # One decode fans out to every platform; this waits for all ad creatives up front
+        rendered = {}
+        if multi_output:
+            print("\n4. Rendering all platforms from one decode...")
+            start_time = time.time()
+            try:
+                rendered = render_platform_outputs(video_path, jobs)
+                print(f"+ Multi-output render completed in {time.time() - start_time:.1f} seconds")
+            except Exception as e:
+                print(f"Multi-output render failed, rendering platforms separately: {e}")
         
-        # Create metadata
-        metadata = {
+        # Step 4: Process for each platform, serially or on a process pool
+        tasks = [{
             "platform": platform,
+            "video_path": video_path,
             "timestamp": timestamp,
-            "duration": settings["duration"],
-            "aspect_ratio": settings["aspect_ratio"],
-            "video_file": output_filename,
-            "thumbnail_file": thumbnail_filename,
-            "creatives": ad_creatives,
-            "job_id": job_id  # Include job_id in metadata
+            "settings": {
+                **PLATFORM_SETTINGS[platform],
+                "encoding": encoding or PLATFORM_SETTINGS[platform]["encoding"],
+                "captions": captions or PLATFORM_SETTINGS[platform]["captions"],
+                **({"smart_format": short_format} if short_format is not None else {})
+            },
+            "output_dir": PLATFORM_DIRS[platform],
+            "output_filename": output_filenames[platform],
+            # Ad creatives for this platform are still being generated in the background
+            "creatives": llm_futures["creatives"][ad_formats[platform]].result,
+            "rendered": platform in rendered,
+            "font_path": font_path,
+            "job_id": job_id
+        } for platform in platforms]
+        results, render_stats = render_platforms(tasks, workers=render_workers, ffmpeg_threads=ffmpeg_threads)
+        # Seconds from the start of the job until every final video was published
+        render_stats["time_to_final"] = round(time.time() - job_start_time, 2)
+        print(f"+ Rendered {len(results)} platforms in {render_stats['wall_time']:.1f} seconds "
+              f"({render_stats['mode']}, CPU utilization {render_stats['cpu_utilization'] or 0:.0%})")
+        
+        # Insights, when requested, were generated alongside rendering
+        insights_file = None
+        if insights:
+            job_insights = load_or_generate_insights(
+                OUTPUT_DIR, force=True, generate=llm_futures["insights"].result
+            )
+            if os.path.exists(os.path.join(OUTPUT_DIR, INSIGHTS_FILENAME)):
+                insights_file = INSIGHTS_FILENAME
+            print("\nInsights:")
+            print(job_insights["insights"])
+        print(f"+ LLM generation finished {time.time() - llm_start_time:.1f} seconds after transcription")
+        pipeline.close()
+        
+        # Step 5: Generate a summary report
+        print("\n5. Generating summary report...")
+        engagement_head = load_engagement_head()
+        summary = {
+            "input_video": os.path.basename(video_path),
+            "platforms_processed": platforms,
+            "job_id": job_id,  # Include job_id in summary
+            "engagement_head_version": engagement_head["version"] if engagement_head else None,
+            "llm_metrics": get_metrics_summary(),
+            "llm_cache": get_cache_stats(),
+            "llm_session": pipeline.session_stats(),
+            "llm_breaker": get_breaker_stats(),
+            "llm_dispatch": get_dispatch_stats(),
+            "render": render_stats,
+            "preview": preview_stats,
+            "scratch": close_scratch(),
+            "insights_file": insights_file,
+            "created_content": {}
         }
         
-        # Add engagement prediction
-        metadata["engagement_prediction"] = predict_engagement(
-            {**metadata, **ad_creatives}, 
-            platform
-        )
+        for platform in results:
+            prediction = results[platform]["engagement_prediction"]
+            summary["created_content"][platform] = {
+                "status": results[platform]["status"],
+                "video_file": os.path.basename(results[platform]["video_path"]),
+                "thumbnail_file": os.path.basename(results[platform]["thumbnail_path"]),
+                "predicted_engagement": prediction["predicted_engagement"],
+                "engagement_level": prediction["engagement_level"]
+            }
         
-        # Save metadata
-        metadata_filename = generate_output_filename(platform, "json")
-        metadata_path = os.path.join(output_dir, metadata_filename)
-        save_metadata(metadata, metadata_path)
+        # Save the summary report
+        summary_path = os.path.join(OUTPUT_DIR, "summary_report.json")
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=2)
         
         # Changed Unicode checkmark to "+" to avoid encoding issues
-        print(f"+ {platform} content created in {time.time() - start_time:.1f} seconds")
-        print(f"  - Video: {output_filename}")
-        print(f"  - Thumbnail: {thumbnail_filename}")
-        print(f"  - Metadata: {metadata_filename}")
+        print(f"+ Summary report saved to {summary_path}")
+        print("\nContent creation completed successfully!")
         
-        # Store results
-        results[platform] = {
-            "video_path": output_path,
-            "thumbnail_path": thumbnail_path,
-            "metadata_path": metadata_path,
-            "metadata": metadata,
-            "engagement_prediction": metadata["engagement_prediction"]
-        }
-    
-    # Step 5: Generate a summary report
-    print("\n5. Generating summary report...")
-    summary = {
-        "input_video": os.path.basename(video_path),
-        "platforms_processed": platforms,
-        "job_id": job_id,  # Include job_id in summary
-        "created_content": {}
-    }
-    
-    for platform in results:
-        prediction = results[platform]["engagement_prediction"]
-        summary["created_content"][platform] = {
-            "video_file": os.path.basename(results[platform]["video_path"]),
-            "thumbnail_file": os.path.basename(results[platform]["thumbnail_path"]),
-            "predicted_engagement": prediction["predicted_engagement"],
-            "engagement_level": prediction["engagement_level"]
-        }
-    
-    # Save the summary report
-    summary_path = os.path.join(OUTPUT_DIR, "summary_report.json")
-    with open(summary_path, 'w') as f:
-        json.dump(summary, f, indent=2)
-    
-    # Changed Unicode checkmark to "+" to avoid encoding issues
-    print(f"+ Summary report saved to {summary_path}")
-    print("\nContent creation completed successfully!")
-    
-    return results
+        return results
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+        close_scratch()
 
 def main():
     parser = argparse.ArgumentParser(description="AI-driven YouTube content creator")
@@ -241,15 +288,56 @@ def main():
     parser.add_argument("--output", default=OUTPUT_DIR, 
                         help=f"Output directory (default: {OUTPUT_DIR})")
     parser.add_argument("--job_id", help="Job ID for tracking")
+    parser.add_argument("--llm-max-in-flight", type=int,
+                        help="Maximum concurrent requests to the LLM server (default: LLM_MAX_IN_FLIGHT or 2)")
+    parser.add_argument("--llm-timeout", type=float,
+                        help="Read timeout in seconds for each LLM request (default: LLM_READ_TIMEOUT or 300)")
+    
+    parser.add_argument("--llm-global-in-flight", type=int,
+                        help="Maximum LLM requests in flight across all jobs on this machine "
+                             "(default: LLM_GLOBAL_IN_FLIGHT or 2; match the server's parallel slots)")
+    parser.add_argument("--llm-deadline", type=float,
+                        help="Total seconds each LLM request may take (default: LLM_REQUEST_DEADLINE or 600)")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Bypass the on-disk LLM response cache")
+    parser.add_argument("--insights", action="store_true",
+                        help="Generate insights during the job instead of on demand")
+    parser.add_argument("--multi-output", action="store_true",
+                        help="Render all platform videos from one decode of the source")
+    parser.add_argument("--encoding", choices=list(ENCODING_PROFILES.keys()),
+                        help="Encoding profile for every platform (default: per-platform settings)")
+    parser.add_argument("--short-format", choices=list(SHORT_FORMATS.keys()),
+                        help="How YouTube Shorts fit the source into 9:16 (default: smart crop)")
+    parser.add_argument("--captions", choices=list(CAPTION_MODES.keys()),
+                        help="Caption mode for every platform (default: per-platform settings)")
+    parser.add_argument("--no-preview", action="store_true",
+                        help="Skip the low-resolution previews published before the final renders")
+    parser.add_argument("--render-workers", type=int,
+                        help="Worker processes rendering platforms in parallel (default: RENDER_WORKERS or 1)")
+    parser.add_argument("--ffmpeg-threads", type=int,
+                        help="Threads per ffmpeg encode when rendering in parallel (default: cores / workers)")
     
     args = parser.parse_args()
+    configure_llm(max_in_flight=args.llm_max_in_flight, read_timeout=args.llm_timeout,
+                  deadline=args.llm_deadline)
+    configure_dispatcher(job_id=args.job_id, global_in_flight=args.llm_global_in_flight)
+    if args.no_llm_cache:
+        configure_cache(bypass=True)
     
     # Process the video with all arguments
     process_video(
         args.video, 
         platforms=args.platforms, 
         job_id=args.job_id, 
-        output_dir=args.output
+        output_dir=args.output,
+        insights=args.insights,
+        multi_output=args.multi_output,
+        render_workers=args.render_workers,
+        ffmpeg_threads=args.ffmpeg_threads,
+        encoding=args.encoding,
+        short_format=SHORT_FORMATS[args.short_format] if args.short_format else None,
+        preview=not args.no_preview,
+        captions=args.captions
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+On-demand insights for a processed job.
+
+Insights are no longer produced by enhanced_app.py unless --insights is passed.
+This script generates them from the transcript saved with a job's outputs, stores
+them as insights.json and prints them as JSON. Later calls return the saved file.
+
+Usage:
+    python generate_insights.py jobs/<job_id>/outputs
+    python generate_insights.py jobs/<job_id>/outputs --force
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# Ensure the script can find modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.llm_client import configure as configure_llm
+from modules.insights import load_or_generate_insights, INSIGHTS_ERROR_MESSAGE
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate insights for a processed job on demand")
+    parser.add_argument("output_dir", help="The job's output directory (containing transcript.txt)")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if insights were already saved")
+    parser.add_argument("--llm-timeout", type=float,
+                        help="Read timeout in seconds for the LLM request (default: LLM_READ_TIMEOUT or 300)")
+
+    args = parser.parse_args()
+    configure_llm(read_timeout=args.llm_timeout)
+
+    try:
+        insights = load_or_generate_insights(args.output_dir, force=args.force)
+    except FileNotFoundError as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+    # A failed generation exits non-zero, so callers cannot mistake it for insights
+    if insights["insights"] == INSIGHTS_ERROR_MESSAGE:
+        print(json.dumps({"error": INSIGHTS_ERROR_MESSAGE}))
+        sys.exit(2)
+
+    print(json.dumps(insights))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Load-test harness for the LLM path.
+
+Drives generate_insights and the creative generators at a fixed concurrency
+against an Ollama server (or the bundled stub) and reports latency percentiles
+and throughput.
+
+Usage:
+    python llm_loadtest.py --stub --concurrency 4 --requests 40 --target creatives
+    python llm_loadtest.py --url http://localhost:11434 --target batch
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import tempfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure the script can find modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules import llm_client
+from modules.llm_cache import configure_cache
+from modules.llm_health import get_breaker_stats
+from modules.llm_dispatch import configure_dispatcher, get_dispatch_stats
+from modules.insights import (generate_insights, generate_ad_creatives, generate_ad_creatives_batch,
+                              fallback_creatives, INSIGHTS_ERROR_MESSAGE)
+
+AD_FORMATS = ["Youtube Shorts", "Youtube Ads", "Display Ads", "Performance Max"]
+
+SAMPLE_TRANSCRIPT = (
+    "Welcome back to the channel. Today we are unboxing the new trail camera and testing it "
+    "on a weekend hike. The battery lasted three full days, and the night footage surprised us. "
+    "Stick around to the end for the side-by-side comparison and a discount code for viewers. "
+) * 8
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def make_task(target, transcript, index):
+    """
+    Returns a zero-argument callable for one load-test request and a check for fallback output.
+    """
+    ad_format = AD_FORMATS[index % len(AD_FORMATS)]
+    # Vary the transcript so every request is a distinct generation
+    text = f"{transcript} (request {index})"
+
+    if target == "insights":
+        return (lambda: generate_insights(text),
+                lambda result: result == INSIGHTS_ERROR_MESSAGE)
+    if target == "batch":
+        fallbacks = {f: fallback_creatives(f) for f in AD_FORMATS}
+        return (lambda: generate_ad_creatives_batch(text, AD_FORMATS),
+                lambda result: any(result.get(f) == fallbacks[f] for f in AD_FORMATS))
+    fallback = fallback_creatives(ad_format)
+    return (lambda: generate_ad_creatives(text, ad_format=ad_format),
+            lambda result: result == fallback)
+
+def effective_in_flight():
+    """
+    Returns the number of requests that can actually be in flight: the smaller of the
+    per-process llm_client limit and, when the dispatcher is on, its global limit.
+    """
+    dispatch = get_dispatch_stats()
+    if dispatch["enabled"]:
+        return min(llm_client.MAX_IN_FLIGHT, dispatch["global_in_flight"])
+    return llm_client.MAX_IN_FLIGHT
+
+def run_load_test(target, concurrency, requests, transcript):
+    """
+    Runs the load test.
+
+    Returns:
+    - Dictionary with latency percentiles, throughput and failure counts
+    """
+    latencies = []
+    fallbacks = 0
+
+    def timed(index):
+        task, is_fallback = make_task(target, transcript, index)
+        started = time.time()
+        result = task()
+        return time.time() - started, is_fallback(result)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, used_fallback in executor.map(timed, range(requests)):
+            latencies.append(latency)
+            fallbacks += int(used_fallback)
+    wall_time = time.time() - started
+
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "effective_in_flight": effective_in_flight(),
+        "requests": requests,
+        "wall_time": round(wall_time, 3),
+        "throughput_rps": round(requests / wall_time, 3) if wall_time else None,
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+        "latency_max": round(max(latencies), 3),
+        "fallback_results": fallbacks,
+        "llm_calls": llm_client.get_metrics_summary(),
+        "llm_breaker": get_breaker_stats(),
+        "llm_dispatch": get_dispatch_stats()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the insights and creative LLM path")
+    parser.add_argument("--url", help="Ollama base URL (default: OLLAMA_URL or http://localhost:11434)")
+    parser.add_argument("--stub", action="store_true", help="Start the bundled Ollama stub in-process")
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0)
+    parser.add_argument("--stub-tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--stub-parallel", type=int, default=2)
+    parser.add_argument("--target", choices=["insights", "creatives", "batch"], default="creatives")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests issued at the same time")
+    parser.add_argument("--no-dispatcher", action="store_true",
+                        help="Disable the cross-process dispatcher so only --concurrency limits requests")
+    parser.add_argument("--requests", type=int, default=40, help="Total requests")
+    parser.add_argument("--transcript", help="Path to a transcript text file (default: built-in sample)")
+    parser.add_argument("--output", help="Optional path to write the JSON report")
+
+    args = parser.parse_args()
+
+    if args.stub:
+        from ollama_stub import start_in_thread
+        _, url = start_in_thread(port=0, seed=0, failure_rate=args.stub_failure_rate,
+                                 tokens_per_second=args.stub_tokens_per_second, parallel=args.stub_parallel)
+        print(f"Started Ollama stub at {url}")
+    else:
+        url = args.url
+
+    llm_client.configure(base_url=url, max_in_flight=args.concurrency)
+    # A private queue directory, so the test's slots never hold up real jobs' requests
+    dispatch_dir = tempfile.mkdtemp(prefix="llm_loadtest_dispatch_")
+    configure_dispatcher(global_in_flight=args.concurrency, directory=dispatch_dir,
+                         enabled=not args.no_dispatcher)
+    configure_cache(bypass=True)
+
+    transcript = SAMPLE_TRANSCRIPT
+    if args.transcript:
+        with open(args.transcript) as f:
+            transcript = f.read()
+
+    print(f"Running {args.requests} {args.target} requests at concurrency {args.concurrency} "
+          f"(effective in-flight limit {effective_in_flight()})...")
+    try:
+        report = run_load_test(args.target, args.concurrency, args.requests, transcript)
+    finally:
+        shutil.rmtree(dispatch_dir, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
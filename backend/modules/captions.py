@@ -0,0 +1,93 @@
+#backend/modules/captions.py
+import os
+from modules.render import run_ffmpeg
+from modules.scratch import scratch_path, release, publish
+
+# How a platform's auto-captions are delivered (the "captions" key of PLATFORM_SETTINGS)
+CAPTION_MODES = {
+    "burn_in": "drawn into the video with an extra re-encode",
+    "sidecar": "SRT and WebVTT files next to the video",
+    "soft": "sidecar files plus a mov_text caption track muxed into the video by stream copy",
+    "none": "no captions"
+}
+
+def _timestamp(seconds, separator):
+    millis = int(round(max(0, seconds) * 1000))
+    h, millis = divmod(millis, 3600000)
+    m, millis = divmod(millis, 60000)
+    s, millis = divmod(millis, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{separator}{millis:03d}"
+
+def write_srt(segments, path):
+    """
+    Writes timed caption segments to a SubRip (.srt) file.
+
+    Parameters:
+    - segments: List of dictionaries with 'text', 'start', and 'end' keys (seconds)
+    - path: Path of the .srt file to write
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for index, segment in enumerate(segments, 1):
+            f.write(f"{index}\n{_timestamp(segment['start'], ',')} --> {_timestamp(segment['end'], ',')}\n"
+                    f"{segment['text'].strip()}\n\n")
+
+def write_vtt(segments, path):
+    """
+    Writes timed caption segments to a WebVTT (.vtt) file.
+
+    Parameters:
+    - segments: List of dictionaries with 'text', 'start', and 'end' keys (seconds)
+    - path: Path of the .vtt file to write
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\n\n")
+        for segment in segments:
+            text = segment['text'].strip().replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            f.write(f"{_timestamp(segment['start'], '.')} --> {_timestamp(segment['end'], '.')}\n{text}\n\n")
+
+def mux_soft_captions(video_path, segments, language="eng"):
+    """
+    Adds a mov_text caption track to an MP4 without re-encoding it.
+
+    The audio and video streams are stream-copied into a new file in scratch
+    space, which then replaces video_path in one step.
+
+    Parameters:
+    - video_path: MP4 to add the track to (replaced in place)
+    - segments: Timed caption segments (see write_srt)
+    - language: ISO 639-2 language code of the track
+    """
+    srt_path = scratch_path('.srt')
+    muxed_path = scratch_path('.mp4')
+    try:
+        write_srt(segments, srt_path)
+        run_ffmpeg([
+            'ffmpeg',
+            '-i', video_path,
+            '-i', srt_path,
+            '-map', '0:v', '-map', '0:a?', '-map', '1:0',
+            '-c:v', 'copy', '-c:a', 'copy', '-c:s', 'mov_text',
+            '-metadata:s:s:0', f"language={language}",
+            '-movflags', '+faststart',
+            '-y', muxed_path
+        ])
+        publish(muxed_path, video_path)
+    finally:
+        release(srt_path)
+        release(muxed_path)
+
+def write_sidecars(video_path, segments):
+    """
+    Writes SRT and WebVTT caption files next to a rendered video.
+
+    Parameters:
+    - video_path: Path of the rendered video; the sidecars share its base name
+    - segments: Timed caption segments relative to the start of the video
+
+    Returns:
+    - Dictionary with the 'srt' and 'vtt' file names
+    """
+    base = os.path.splitext(video_path)[0]
+    write_srt(segments, base + ".srt")
+    write_vtt(segments, base + ".vtt")
+    return {"srt": os.path.basename(base + ".srt"), "vtt": os.path.basename(base + ".vtt")}
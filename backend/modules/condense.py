@@ -0,0 +1,221 @@
+#backend/modules/condense.py
+import os
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modules.llm_client import DEFAULT_MODEL, generate_stream
+from modules.llm_cache import cached_generation
+
+# Maximum transcript tokens pasted into a prompt, per model.
+# Override with LLM_TOKEN_BUDGETS="zephyr=3000,mistral=6000".
+MODEL_TOKEN_BUDGETS = {
+    "zephyr": 2500,
+}
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("LLM_TOKEN_BUDGET", 2500))
+
+# Size of each chunk summarised in the map step
+CHUNK_TOKENS = int(os.environ.get("LLM_CHUNK_TOKENS", 1500))
+
+# Reduce rounds before the digest is hard-truncated to the budget
+MAX_REDUCE_ROUNDS = 3
+
+# Threads summarising chunks. The map step has its own pool: the callers of
+# condense_transcript already run on llm_client's pool and block on the digest.
+_MAP_WORKERS = 4
+
+for _entry in os.environ.get("LLM_TOKEN_BUDGETS", "").split(","):
+    if "=" in _entry:
+        _name, _budget = _entry.split("=", 1)
+        MODEL_TOKEN_BUDGETS[_name.strip()] = int(_budget)
+
+_encoding = None
+_map_executor = None
+_digests = {}
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+def _get_encoding():
+    global _encoding
+    with _lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"tiktoken unavailable, estimating token counts: {e}")
+                _encoding = False
+    return _encoding
+
+def count_tokens(text):
+    """
+    Counts tokens in a text.
+
+    Uses tiktoken's cl100k_base encoding as an approximation of the local model's
+    tokenizer, or about four characters per token if tiktoken is unavailable.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Truncates text to at most max_tokens tokens.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+def get_token_budget(model=None):
+    """
+    Returns the transcript token budget for a model.
+    """
+    return MODEL_TOKEN_BUDGETS.get(model or DEFAULT_MODEL, DEFAULT_TOKEN_BUDGET)
+
+def split_into_chunks(text, max_tokens=CHUNK_TOKENS):
+    """
+    Splits text into chunks of at most max_tokens tokens on sentence boundaries.
+
+    Returns:
+    - List of chunk strings
+    """
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for sentence in sentences:
+        sentence_tokens = count_tokens(sentence)
+
+        # A single sentence longer than a chunk gets cut on its own
+        if sentence_tokens > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            chunks.append(truncate_to_tokens(sentence, max_tokens))
+            continue
+
+        if current_tokens + sentence_tokens > max_tokens and current:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+
+        current.append(sentence)
+        current_tokens += sentence_tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def summarize_chunks(chunks, tokens_per_summary, model=None):
+    """
+    Summarises transcript chunks concurrently (the map step).
+
+    Chunks whose summary fails are kept as truncated raw text.
+
+    Returns:
+    - (summaries, fell_back): list of summaries in chunk order, and whether any
+      chunk was kept as raw text
+    """
+    global _map_executor
+
+    def summarize(index, chunk):
+        prompt = f"""
+    Summarize part {index + 1} of {len(chunks)} of a video transcript.
+    Keep key themes, memorable quotes, products, names and any calls to action.
+    Use at most {int(tokens_per_summary * 0.75)} words.
+
+    Transcript part:
+    {chunk}
+    """
+        try:
+            result = generate_stream(prompt, model=model, options={"num_predict": tokens_per_summary})
+            summary = result["response"].strip()
+            if summary:
+                return summary, False
+        except Exception as e:
+            print(f"Error summarizing transcript chunk {index + 1}: {e}")
+        return truncate_to_tokens(chunk, tokens_per_summary), True
+
+    with _lock:
+        if _map_executor is None:
+            _map_executor = ThreadPoolExecutor(max_workers=_MAP_WORKERS, thread_name_prefix="llm-map")
+    futures = [_map_executor.submit(summarize, i, chunk) for i, chunk in enumerate(chunks)]
+    results = [future.result() for future in futures]
+    return [summary for summary, _ in results], any(fell_back for _, fell_back in results)
+
+def build_digest(transcript, budget, model=None):
+    """
+    Map-reduces a long transcript into a digest of at most budget tokens.
+
+    Returns:
+    - (digest, fell_back): the digest text, and whether any chunk summary failed
+      and was replaced by truncated raw text
+    """
+    text = transcript
+    fell_back = False
+    for round_number in range(MAX_REDUCE_ROUNDS):
+        if count_tokens(text) <= budget:
+            return text, fell_back
+
+        chunks = split_into_chunks(text, CHUNK_TOKENS)
+        tokens_per_summary = max(64, budget // len(chunks))
+        print(f"Condensing transcript: round {round_number + 1}, {len(chunks)} chunks")
+        summaries, round_fell_back = summarize_chunks(chunks, tokens_per_summary, model=model)
+        text = "\n".join(summaries)
+        fell_back = fell_back or round_fell_back
+
+    return truncate_to_tokens(text, budget), fell_back
+
+def condense_transcript(transcript, model=None, budget=None):
+    """
+    Returns a bounded transcript digest for use in LLM prompts.
+
+    Transcripts that already fit the model's token budget are returned unchanged.
+    Longer ones are split into chunks, summarised concurrently and combined. The
+    digest is cached per transcript, in memory and in the on-disk LLM cache, so
+    every prompt for a job reuses the same one. A digest built while chunk
+    summaries were failing is used but not cached.
+
+    Parameters:
+    - transcript: The video transcript text
+    - model: Model the digest is for (default: LLM_MODEL or "zephyr")
+    - budget: Optional token budget overriding the per-model setting
+
+    Returns:
+    - Transcript or digest text
+    """
+    model = model or DEFAULT_MODEL
+    budget = budget or get_token_budget(model)
+
+    if count_tokens(transcript) <= budget:
+        return transcript
+
+    key = (hashlib.sha256(transcript.encode("utf-8")).hexdigest(), model, budget)
+    with _lock:
+        if key in _digests:
+            return _digests[key]
+
+    # Concurrent prompts for the same job wait for one digest instead of each building it
+    with _build_lock:
+        with _lock:
+            if key in _digests:
+                return _digests[key]
+
+        outcome = {"fell_back": False}
+
+        def build():
+            digest, outcome["fell_back"] = build_digest(transcript, budget, model=model)
+            return digest
+
+        digest = cached_generation(
+            "digest", model, {"budget": budget, "chunk_tokens": CHUNK_TOKENS}, transcript,
+            build, cache_if=lambda digest: not outcome["fell_back"]
+        )
+
+        if not outcome["fell_back"]:
+            with _lock:
+                _digests[key] = digest
+    return digest
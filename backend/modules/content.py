@@ -1,17 +1,183 @@
 #backend/modules/content.py
 import os
 import numpy as np
-import cv2
-import tempfile
 import subprocess
 import traceback
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from moviepy.video.io.VideoFileClip import VideoFileClip
 from moviepy.video.VideoClip import VideoClip
 from moviepy.video.VideoClip import ImageClip
 from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
+from modules.encoding import video_args, moviepy_args
+from modules.crop import analyze_crop
+from modules.thumbnail import select_thumbnail_frame
+from modules.text_render import get_font, text_width, text_size, wrap_text, apply_top_gradient, draw_shadowed_text
+from modules.scratch import scratch_path, release, publish, retry_on_disk
+from modules.render import (render_clip, render_outputs, smart_cut, text_overlay_filters, write_ass_subtitles, format_time,
+                            probe_video)
 
-def create_youtube_short(video_path, start_time, end_time, output_path, add_text=None, smart_format=True, add_subtitles=True):
+def resolve_deferred(value):
+    """
+    Resolves text that may still be generating.
+    
+    Overlay text can be passed as a zero-argument callable (for example a
+    future's result method) so rendering can start before the LLM has finished.
+    
+    Returns:
+    - The value itself, or the callable's result
+    """
+    return value() if callable(value) else value
+
+def clip_subtitle_segments(video_path, start_time, end_time):
+    """
+    Transcribes only the audio of a clip range and returns short-form subtitle segments.
+    
+    The audio is piped from ffmpeg straight into Whisper as 16 kHz mono
+    samples, without an intermediate WAV file. Segment times are relative to
+    start_time, matching a rendered clip's timeline.
+    
+    Returns:
+    - List of processed subtitle segments (empty if transcription failed)
+    """
+    cmd = [
+        'ffmpeg',
+        '-ss', f"{start_time:.3f}",
+        '-t', f"{end_time - start_time:.3f}",
+        '-i', video_path,
+        '-vn', '-ac', '1', '-ar', '16000',
+        '-f', 's16le', '-'
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        error = process.stderr.decode('utf-8', errors='ignore').strip().splitlines()
+        raise RuntimeError("FFmpeg failed: " + " | ".join(error[-5:]))
+    
+    audio = np.frombuffer(process.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+    return process_segments_for_shorts(transcribe_with_timestamps(audio))
+
+# Ways of fitting a landscape source into a 9:16 Short (the smart_format argument)
+SMART_FORMATS = {
+    True: "crop to the window holding the most detail",
+    False: "center crop",
+    "background_extension": "crop, unless the content is too wide; then fit it over a blurred background",
+    "blur_fill": "always fit the whole frame over a blurred background"
+}
+
+def short_bounds(video_duration, start_time, end_time):
+    """Clamps a YouTube Short's range to the source, keeping at least one second."""
+    start = max(0, min(start_time, video_duration - 1))
+    return start, max(start + 1, min(end_time, video_duration))
+
+def ad_bounds(video_duration, start_time, duration):
+    """Clamps an ad video's range to the source; the end follows the clamped start."""
+    start = max(0, min(start_time, video_duration - 1))
+    return start, min(start + duration, video_duration)
+
+def clip_bounds(video_path, platform, start_time, duration):
+    """
+    Returns the (start, end) range a platform's render of a clip actually covers.
+    
+    Matches the clamping in plan_youtube_short and plan_ad_video, so anything
+    timed against the rendered clip (such as caption files) lines up with it.
+    """
+    video_duration = probe_video(video_path)["duration"]
+    if platform == "youtube_shorts":
+        return short_bounds(video_duration, start_time, start_time + duration)
+    return ad_bounds(video_duration, start_time, duration)
+
+def plan_youtube_short(video_path, start_time, end_time, add_text=None, smart_format=True, add_subtitles=True,
+                       encoding=None):
+    """
+    Works out how a YouTube Short should be rendered, without rendering it.
+    
+    Uses the same crop analysis, text overlays and subtitle styling as the
+    multi-pass path in create_youtube_short.
+    
+    Returns:
+    - Dictionary with start_time, end_time, crop, fill, text_data, subtitles and encoding
+      (see render_clip)
+    """
+    if smart_format not in SMART_FORMATS:
+        raise ValueError(f"Unknown smart_format {smart_format!r}")
+    
+    clip = VideoFileClip(video_path)
+    try:
+        # Make sure timestamps are within video bounds
+        start_time, end_time = short_bounds(clip.duration, start_time, end_time)
+        
+        w, h = clip.size
+        target_w = int(9 * h / 16)
+    finally:
+        clip.close()
+    
+    # Center crop unless the content analysis finds a better window
+    crop_left = max(0, w // 2 - target_w // 2)
+    fill = None
+    if smart_format == "blur_fill" and target_w < w:
+        fill = (target_w, h)
+    elif smart_format and target_w < w:
+        window = analyze_crop(video_path, start_time, end_time, "9:16")
+        if not window["content_fits"] and smart_format == "background_extension":
+            fill = (target_w, h)
+        crop_left = window["crop"][2]
+    
+    subtitles = clip_subtitle_segments(video_path, start_time, end_time) if add_subtitles else None
+    
+    # Wait for deferred ad creatives only now that everything else is known
+    text_data = resolve_deferred(add_text) if add_text else None
+    
+    # Sources that are already vertical need no crop
+    crop = (min(target_w, w - crop_left), h, crop_left, 0) if target_w < w and not fill else None
+    return {
+        "start_time": start_time,
+        "end_time": end_time,
+        "crop": crop,
+        "fill": fill,
+        "text_data": text_data,
+        "subtitles": subtitles,
+        "encoding": encoding
+    }
+
+def render_planned(video_path, output_path, plan):
+    """
+    Renders a plan from plan_youtube_short or plan_ad_video with one ffmpeg encode.
+    
+    A plain cut with nothing to crop, fill or draw is smart-cut instead, copying whole GOPs.
+    
+    Returns:
+    - output_path: Path to the created video
+    """
+    if (plan["crop"] is None and not plan["fill"] and not text_overlay_filters(plan["text_data"])
+            and not plan["subtitles"]):
+        smart_cut(video_path, plan["start_time"], plan["end_time"], output_path, encoding=plan["encoding"])
+    else:
+        render_clip(video_path, plan["start_time"], plan["end_time"], output_path,
+                    crop=plan["crop"], text_data=plan["text_data"], subtitles=plan["subtitles"],
+                    encoding=plan["encoding"], fill=plan["fill"])
+    return output_path
+
+def render_youtube_short(video_path, start_time, end_time, output_path, add_text=None, smart_format=True, add_subtitles=True,
+                         encoding=None):
+    """
+    Renders a YouTube Short with one ffmpeg encode (see modules/render.py).
+    
+    Returns:
+    - output_path: Path to the created video
+    """
+    plan = plan_youtube_short(video_path, start_time, end_time, add_text, smart_format, add_subtitles, encoding)
+    
+    render_planned(video_path, output_path, plan)
+    if plan["fill"]:
+        print(f"Rendered YouTube Short in a single pass - full frame over a blurred {plan['fill'][0]}x{plan['fill'][1]} background")
+    elif plan["crop"]:
+        crop_w, _, crop_left, _ = plan["crop"]
+        print(f"Rendered YouTube Short in a single pass - content from x={crop_left} to x={crop_left + crop_w}")
+    else:
+        print("Rendered YouTube Short in a single pass")
+    return output_path
+
+def create_youtube_short(video_path, start_time, end_time, output_path, add_text=None, smart_format=True, add_subtitles=True, single_pass=True,
+                         encoding=None):
     """
     Creates a YouTube Short by clipping a segment from the video and formatting it
     for vertical viewing (9:16 aspect ratio) using intelligent content preservation.
@@ -21,9 +187,13 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
     - start_time: Start timestamp in seconds
     - end_time: End timestamp in seconds
     - output_path: Path to save the output video
-    - add_text: Optional text to overlay (dict with 'headline' and 'cta' keys)
-    - smart_format: Whether to use intelligent formatting (True) or simple center crop (False)
+    - add_text: Optional text to overlay (dict with 'headline' and 'cta' keys, or a callable returning one)
+    - smart_format: How to fit the source into 9:16 (see SMART_FORMATS): intelligent crop (True),
+      center crop (False), "background_extension" or "blur_fill"
     - add_subtitles: Whether to automatically generate and add subtitles (True/False)
+    - single_pass: Render cut, crop, overlays and subtitles with one encode, falling back
+      to the multi-pass path below if that fails
+    - encoding: Encoding profile name or dictionary (see modules/encoding.py)
     
     Returns:
     - output_path: Path to the created video
@@ -31,6 +201,17 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
     # Create the output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
+    if single_pass:
+        try:
+            return render_youtube_short(video_path, start_time, end_time, output_path, add_text, smart_format, add_subtitles, encoding)
+        except Exception as e:
+            print(f"Single-pass render failed, falling back to multi-pass rendering: {e}")
+    
+    if smart_format == "blur_fill":
+        create_youtube_short_with_background(
+            video_path, start_time, end_time, output_path, add_text, add_subtitles, encoding)
+        return output_path
+    
     # Load the video
     clip = VideoFileClip(video_path)
     
@@ -54,72 +235,18 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
         try:
             print("Attempting smart formatting to preserve important content...")
             
-            # Sample frames for content analysis
-            sample_times = np.linspace(0, subclip.duration, num=min(10, int(subclip.duration) + 1))
+            window = analyze_crop(video_path, start_time, end_time, "9:16")
             
-            # Function to detect important content regions in a frame
-            def detect_important_regions(frame):
-                # Convert to grayscale
-                gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-                
-                # Edge detection to find areas with details
-                edges = cv2.Canny(gray, 100, 200)
-                
-                # Dilate to connect nearby edges
-                kernel = np.ones((5, 5), np.uint8)
-                dilated = cv2.dilate(edges, kernel, iterations=2)
-                
-                # Find contours in the edge-detected image
-                contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # If the source is wider than 9:16, use the window holding the most detail
+            if window["crop"] and target_w < w:
+                crop_w, _, crop_left, _ = window["crop"]
+                crop_right = crop_left + crop_w
+                content_fits = window["content_fits"]
                 
-                # Only keep contours that are reasonably sized (not noise)
-                significant_contours = [c for c in contours if cv2.contourArea(c) > 500]
-                
-                # Get bounding rectangles for all significant contours
-                boxes = [cv2.boundingRect(c) for c in significant_contours]
-                
-                return boxes
-            
-            # Find important regions across sample frames
-            all_regions = []
-            for t in sample_times:
-                frame = subclip.get_frame(t)
-                regions = detect_important_regions(frame)
-                all_regions.extend(regions)
-            
-            # If we found important regions, determine optimal crop window
-            if all_regions:
-                # Find left and right boundaries of important content
-                left_bounds = [x for (x, y, w, h) in all_regions]
-                right_bounds = [x + w for (x, y, w, h) in all_regions]
-                
-                # Calculate the content center
-                left_edge = min(left_bounds)
-                right_edge = max(right_bounds)
-                content_width = right_edge - left_edge
-                content_center = left_edge + content_width // 2
-                
-                # Handle different content width scenarios
-                if content_width <= target_w:
-                    # Content fits within target width - center it
-                    crop_left = max(0, content_center - target_w // 2)
-                    crop_right = min(w, crop_left + target_w)
-                    
-                    # Adjust if we're at the frame edges
-                    if crop_left == 0:
-                        crop_right = target_w
-                    elif crop_right == w:
-                        crop_left = w - target_w
-                else:
-                    # Content wider than target - use hybrid approach
-                    if smart_format == "background_extension":
-                        # Use background extension instead of cropping
-                        return create_youtube_short_with_background(
-                            video_path, start_time, end_time, output_path, add_text, add_subtitles)
-                    else:
-                        # Content too wide, prioritize the center of the content
-                        crop_left = max(0, content_center - target_w // 2)
-                        crop_right = min(w, crop_left + target_w)
+                if not content_fits and smart_format == "background_extension":
+                    # Content wider than target - use background extension instead of cropping
+                    return create_youtube_short_with_background(
+                        video_path, start_time, end_time, output_path, add_text, add_subtitles, encoding)
                 
                 # Function to crop frame based on determined boundaries
                 def smart_crop_frame(frame):
@@ -137,14 +264,14 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
                 smart_clip.audio = subclip.audio
                 
                 # Write to output file
-                smart_clip.write_videofile(output_path, fps=24, logger=None)
+                smart_clip.write_videofile(output_path, logger=None, **moviepy_args(encoding, subclip.fps))
                 
                 # Clean up
                 smart_clip.close()
                 formatting_successful = True
                 print(f"Smart formatting successful - content centered from x={crop_left} to x={crop_right}")
             else:
-                print("No significant content regions detected, falling back to other methods.")
+                print("Source is not wider than 9:16, falling back to other methods.")
         except Exception as e:
             print(f"Smart formatting failed: {e}")
             print(traceback.format_exc())
@@ -155,8 +282,8 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
             print("Attempting FFMPEG-based cropping...")
             
             # Write the subclip to a temporary file
-            temp_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
-            subclip.write_videofile(temp_file, fps=24, logger=None)
+            temp_file = scratch_path('.mp4')
+            subclip.write_videofile(temp_file, logger=None, **moviepy_args(encoding, subclip.fps))
             
             # Calculate center crop boundaries
             x_center = w // 2
@@ -169,6 +296,7 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
                 'ffmpeg',
                 '-i', temp_file,
                 '-vf', crop_filter,
+                *video_args(encoding),
                 '-c:a', 'copy',
                 '-y',
                 output_path
@@ -179,11 +307,11 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
             
             # Verify output was created successfully
             if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                os.unlink(temp_file)
+                release(temp_file)
                 formatting_successful = True
                 print(f"FFMPEG cropping successful with dimensions {crop_width}x{h}")
             else:
-                os.unlink(temp_file)
+                release(temp_file)
                 print("FFMPEG cropping failed to create a valid output file.")
         except Exception as e:
             print(f"FFMPEG approach failed: {e}")
@@ -194,7 +322,7 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
         try:
             print("Attempting background extension approach...")
             formatting_successful = create_youtube_short_with_background(
-                video_path, start_time, end_time, output_path, add_text, add_subtitles)
+                video_path, start_time, end_time, output_path, add_text, add_subtitles, encoding)
         except Exception as e:
             print(f"Background extension approach failed: {e}")
             print(traceback.format_exc())
@@ -202,7 +330,7 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
     # If all approaches failed, just write the original subclip
     if not formatting_successful:
         print("All formatting approaches failed. Creating video with original aspect ratio.")
-        subclip.write_videofile(output_path, fps=24, logger=None)
+        subclip.write_videofile(output_path, logger=None, **moviepy_args(encoding, subclip.fps))
     
     # Clean up
     try:
@@ -214,22 +342,25 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
     # Try to add text overlays to the final video if requested
     if add_text and os.path.exists(output_path):
         try:
+            # Wait for deferred ad creatives only now that the video is rendered
+            add_text = resolve_deferred(add_text)
+            
             # Try the enhanced text overlay function
-            overlay_result = add_text_overlay_with_images(output_path, add_text)
+            overlay_result = add_text_overlay_with_images(output_path, add_text, encoding)
             
             if not overlay_result and isinstance(add_text, dict):
                 # If the overlay failed but we have text, try the simple subtitle approach
                 if 'headline' in add_text and add_text['headline']:
                     print("Trying alternative subtitle method with headline text")
-                    add_subtitle_overlay(output_path, add_text['headline'], position='top')
+                    add_subtitle_overlay(output_path, add_text['headline'], position='top', encoding=encoding)
                 elif 'cta' in add_text and add_text['cta']:
                     print("Trying alternative subtitle method with CTA text")
-                    add_subtitle_overlay(output_path, add_text['cta'], position='bottom')
+                    add_subtitle_overlay(output_path, add_text['cta'], position='bottom', encoding=encoding)
             
             # If add_text is a string, treat it as a simple subtitle
             elif isinstance(add_text, str) and add_text.strip():
                 print("Adding subtitle overlay with text string")
-                add_subtitle_overlay(output_path, add_text)
+                add_subtitle_overlay(output_path, add_text, encoding=encoding)
         except Exception as e:
             print(f"Could not add text overlays: {e}")
             print(traceback.format_exc())
@@ -238,104 +369,47 @@ def create_youtube_short(video_path, start_time, end_time, output_path, add_text
     if add_subtitles and os.path.exists(output_path):
         try:
             print("Adding auto-generated subtitles to the video...")
-            add_subtitles_to_shorts(output_path)
+            add_subtitles_to_shorts(output_path, encoding=encoding)
         except Exception as e:
             print(f"Could not add auto-generated subtitles: {e}")
             print(traceback.format_exc())
     
     return output_path
 
-def create_youtube_short_with_background(video_path, start_time, end_time, output_path, add_text=None, add_subtitles=False):
+def create_youtube_short_with_background(video_path, start_time, end_time, output_path, add_text=None, add_subtitles=False,
+                                         encoding=None):
     """
     Creates a YouTube Short by placing the original video on a background
     to preserve 9:16 aspect ratio without cropping content.
+    
+    The blurred background, overlay, text and subtitles are one ffmpeg
+    filtergraph (see blur_fill_graph in modules/render.py), so no frame passes
+    through Python.
     """
-    # Load the video
     clip = VideoFileClip(video_path)
-    subclip = clip.subclipped(start_time, end_time)
+    try:
+        # Make sure timestamps are within video bounds
+        start_time = max(0, min(start_time, clip.duration - 1))
+        end_time = max(start_time + 1, min(end_time, clip.duration))
+        w, h = clip.size
+    finally:
+        clip.close()
     
-    # Calculate dimensions
-    w, h = subclip.size
     target_h = h
     target_w = int(9 * target_h / 16)
     
-    # Create a frame processing function
-    def process_frame(frame):
-        # Create a blurred version of the frame for background
-        blurred = cv2.GaussianBlur(frame, (151, 151), 0)
-        
-        # Create target frame with proper dimensions
-        target_frame = np.zeros((target_h, target_w, 3), dtype=np.uint8)
-        
-        # Fill with blurred background, stretched to fill
-        background = cv2.resize(blurred, (target_w, target_h))
-        target_frame[:] = background
-        
-        # Calculate scaling for original content
-        scale_factor = min(target_w / w, target_h / h) * 0.9  # 90% to leave margins
-        new_w, new_h = int(w * scale_factor), int(h * scale_factor)
-        
-        # Resize original frame
-        resized = cv2.resize(frame, (new_w, new_h))
-        
-        # Center the resized frame in the target
-        y_offset = (target_h - new_h) // 2
-        x_offset = (target_w - new_w) // 2
-        
-        # Place original content on background
-        target_frame[y_offset:y_offset+new_h, x_offset:x_offset+new_w] = resized
-        
-        return target_frame
-    
-    # Create a new clip with the processed frames
-    def make_frame(t):
-        frame = subclip.get_frame(t)
-        return process_frame(frame)
+    subtitles = clip_subtitle_segments(video_path, start_time, end_time) if add_subtitles else None
     
-    # Create and write the new clip
-    final_clip = VideoClip(make_frame, duration=subclip.duration)
-    final_clip.audio = subclip.audio
+    # Wait for deferred ad creatives only now that everything else is known
+    text_data = resolve_deferred(add_text) if add_text else None
     
-    final_clip.write_videofile(output_path, fps=24, logger=None)
-    
-    # Clean up
-    clip.close()
-    subclip.close()
-    final_clip.close()
+    render_clip(video_path, start_time, end_time, output_path, text_data=text_data,
+                subtitles=subtitles, encoding=encoding, fill=(target_w, target_h))
     
     print(f"Created video with background extension to {target_w}x{target_h}")
-    
-    # Add text if provided
-    if add_text and os.path.exists(output_path):
-        try:
-            # Try the enhanced text overlay function
-            overlay_result = add_text_overlay_with_images(output_path, add_text)
-            
-            if not overlay_result and isinstance(add_text, dict):
-                # If the overlay failed but we have text, try the simple subtitle approach
-                if 'headline' in add_text and add_text['headline']:
-                    add_subtitle_overlay(output_path, add_text['headline'], position='top')
-                elif 'cta' in add_text and add_text['cta']:
-                    add_subtitle_overlay(output_path, add_text['cta'], position='bottom')
-            
-            # If add_text is a string, treat it as a simple subtitle
-            elif isinstance(add_text, str) and add_text.strip():
-                add_subtitle_overlay(output_path, add_text)
-        except Exception as e:
-            print(f"Could not add text overlays: {e}")
-    
-    # Add auto-generated subtitles if requested
-    if add_subtitles and os.path.exists(output_path):
-        try:
-            print("Adding auto-generated subtitles to the video...")
-            add_subtitles_to_shorts(output_path)
-        except Exception as e:
-            print(f"Could not add auto-generated subtitles: {e}")
-            print(traceback.format_exc())
-    
     return True
 
-def add_text_overlay_with_images(video_path, text_data):
+def add_text_overlay_with_images(video_path, text_data, encoding=None):
     """
     Creates text overlays on a video by using direct FFmpeg commands.
     Uses improved text processing and error handling.
@@ -343,6 +417,7 @@ def add_text_overlay_with_images(video_path, text_data):
     Parameters:
     - video_path: Path to the video file to modify
     - text_data: Dictionary containing 'headline' and/or 'cta' text to overlay
+    - encoding: Encoding profile for the re-encode (see modules/encoding.py)
     
     Returns:
     - Boolean indicating success or failure
@@ -363,7 +438,7 @@ def add_text_overlay_with_images(video_path, text_data):
             return False
             
         # Create a temporary file for the output
-        temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
+        temp_output = scratch_path('.mp4')
         
         # Process headline text
         headline_filter = None
@@ -412,6 +487,7 @@ def add_text_overlay_with_images(video_path, text_data):
             'ffmpeg',
             '-i', video_path,
             '-vf', filter_complex,
+            *video_args(encoding),
             '-c:a', 'copy',
             '-y',
             temp_output
@@ -428,12 +504,12 @@ def add_text_overlay_with_images(video_path, text_data):
         if process.returncode != 0:
             print(f"FFmpeg error: {stderr.decode('utf-8', errors='ignore')}")
             if os.path.exists(temp_output):
-                os.unlink(temp_output)
+                release(temp_output)
             return False
         
         # Check output
         if os.path.exists(temp_output) and os.path.getsize(temp_output) > 0:
-            os.replace(temp_output, video_path)
+            publish(temp_output, video_path)
             print("Successfully added text overlays using FFmpeg")
             return True
         else:
@@ -448,13 +524,13 @@ def add_text_overlay_with_images(video_path, text_data):
         # Clean up temporary file if it exists
         if 'temp_output' in locals() and os.path.exists(temp_output):
             try:
-                os.unlink(temp_output)
+                release(temp_output)
             except:
                 pass
         
         return False
 
-def add_subtitle_overlay(video_path, subtitle_text, position='bottom'):
+def add_subtitle_overlay(video_path, subtitle_text, position='bottom', encoding=None):
     """
     Adds a single subtitle to a video using FFmpeg.
     Improved version with better error handling and text processing.
@@ -463,6 +539,7 @@ def add_subtitle_overlay(video_path, subtitle_text, position='bottom'):
     - video_path: Path to the video file
     - subtitle_text: Text to display as subtitle
     - position: Position of subtitle ('bottom', 'top', 'center')
+    - encoding: Encoding profile for the re-encode (see modules/encoding.py)
     
     Returns:
     - Boolean indicating success
@@ -475,7 +552,7 @@ def add_subtitle_overlay(video_path, subtitle_text, position='bottom'):
         print(f"Adding subtitle overlay: '{subtitle_text}' at position '{position}'")
         
         # Create a temporary file for output
-        temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
+        temp_output = scratch_path('.mp4')
         
         # Limit text length
         if len(subtitle_text) > 80:
@@ -499,6 +576,7 @@ def add_subtitle_overlay(video_path, subtitle_text, position='bottom'):
             'ffmpeg',
             '-i', video_path,
             '-vf', filter_text,
+            *video_args(encoding),
             '-c:a', 'copy',
             '-y',
             temp_output
@@ -515,12 +593,12 @@ def add_subtitle_overlay(video_path, subtitle_text, position='bottom'):
         if process.returncode != 0:
             print(f"FFmpeg error: {stderr.decode('utf-8', errors='ignore')}")
             if os.path.exists(temp_output):
-                os.unlink(temp_output)
+                release(temp_output)
             return False
         
         # Check output
         if os.path.exists(temp_output) and os.path.getsize(temp_output) > 0:
-            os.replace(temp_output, video_path)
+            publish(temp_output, video_path)
             print(f"Successfully added subtitle: '{subtitle_text}'")
             return True
         else:
@@ -535,7 +613,7 @@ def add_subtitle_overlay(video_path, subtitle_text, position='bottom'):
         # Clean up temp file if it exists
         if 'temp_output' in locals() and os.path.exists(temp_output):
             try:
-                os.unlink(temp_output)
+                release(temp_output)
             except:
                 pass
                 
@@ -545,6 +623,8 @@ def transcribe_with_timestamps(video_path):
     """
     Transcribes a video with timestamps using whisper.
     
+    video_path may also be a 16 kHz mono float32 NumPy array of audio samples.
+    
     Returns a list of segments with start_time, end_time, and text.
     """
     try:
@@ -657,7 +737,7 @@ def process_segments_for_shorts(segments, max_words_per_segment=7, max_chars_per
     
     return processed_segments
 
-def add_subtitles_to_video(video_path, subtitles_data, output_path=None):
+def add_subtitles_to_video(video_path, subtitles_data, output_path=None, encoding=None):
     """
     Adds subtitles to a video with improved styling for short-form content.
     
@@ -665,6 +745,7 @@ def add_subtitles_to_video(video_path, subtitles_data, output_path=None):
     - video_path: Path to the video file
     - subtitles_data: List of dictionaries with 'text', 'start', and 'end' keys
     - output_path: Optional path to save the output video. If None, modifies in place
+    - encoding: Encoding profile for the re-encode (see modules/encoding.py)
     
     Returns:
     - Path to the output video
@@ -674,7 +755,7 @@ def add_subtitles_to_video(video_path, subtitles_data, output_path=None):
         return video_path
     
     if output_path is None:
-        temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
+        temp_output = scratch_path('.mp4')
         final_output = video_path
     else:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -683,42 +764,15 @@ def add_subtitles_to_video(video_path, subtitles_data, output_path=None):
     
     try:
         # Create a temporary subtitle file in ASS format with improved styling
-        subtitle_file = tempfile.NamedTemporaryFile(suffix='.ass', delete=False, mode='w', encoding='utf-8')
-        
-        # Write ASS header with improved styling for short-form content
-        subtitle_file.write("""[Script Info]
-ScriptType: v4.00+
-PlayResX: 384
-PlayResY: 288
-ScaledBorderAndShadow: yes
-
-[V4+ Styles]
-Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,Arial,18,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,1.5,0.5,2,10,10,15,1
-
-[Events]
-Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-""")
-        
-        # Write subtitle events with shorter display times
-        for subtitle in subtitles_data:
-            # Format start and end times as h:mm:ss.cc
-            start = format_time(subtitle['start'])
-            end = format_time(subtitle['end'])
-            
-            # Escape commas in text for ASS format
-            text = subtitle['text'].replace(',', '\\,')
-            
-            # Write the subtitle event line with proper styling
-            subtitle_file.write(f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}\n")
-        
-        subtitle_file.close()
+        subtitle_file = scratch_path('.ass')
+        write_ass_subtitles(subtitles_data, subtitle_file)
         
         # Use FFmpeg to burn subtitles into the video
         cmd = [
             'ffmpeg',
             '-i', video_path,
-            '-vf', f"ass={subtitle_file.name}",
+            '-vf', f"ass={subtitle_file}",
+            *video_args(encoding),
             '-c:a', 'copy',
             '-y',
             temp_output
@@ -737,18 +791,15 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             print(f"FFmpeg error: {stderr.decode('utf-8', errors='ignore')}")
             
             # Try an alternative approach using drawtext if ASS fails
-            return add_subtitles_with_drawtext(video_path, subtitles_data, output_path)
+            return add_subtitles_with_drawtext(video_path, subtitles_data, output_path, encoding)
         
         # Replace original if needed
         if output_path is None and os.path.exists(temp_output):
-            os.replace(temp_output, video_path)
+            publish(temp_output, video_path)
             print("Successfully added subtitles to the video")
             
         # Clean up subtitle file
-        try:
-            os.unlink(subtitle_file.name)
-        except:
-            pass
+        release(subtitle_file)
             
         return final_output
         
@@ -757,25 +808,22 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         print(traceback.format_exc())
         
         # Clean up temp files
-        if 'subtitle_file' in locals() and os.path.exists(subtitle_file.name):
-            try:
-                os.unlink(subtitle_file.name)
-            except:
-                pass
+        if 'subtitle_file' in locals():
+            release(subtitle_file)
                 
         if 'temp_output' in locals() and output_path is None and os.path.exists(temp_output):
             try:
-                os.unlink(temp_output)
+                release(temp_output)
             except:
                 pass
         
         # Try alternative approach for adding subtitles
         try:
-            return add_subtitles_with_drawtext(video_path, subtitles_data, output_path)
+            return add_subtitles_with_drawtext(video_path, subtitles_data, output_path, encoding)
         except:
             return video_path
 
-def add_subtitles_with_drawtext(video_path, subtitles_data, output_path=None):
+def add_subtitles_with_drawtext(video_path, subtitles_data, output_path=None, encoding=None):
     """
     Alternative method to add subtitles using FFmpeg's drawtext filter.
     Used as a fallback if ASS subtitle method fails.
@@ -784,12 +832,13 @@ def add_subtitles_with_drawtext(video_path, subtitles_data, output_path=None):
     - video_path: Path to the video file
     - subtitles_data: List of dictionaries with 'text', 'start', and 'end' keys
     - output_path: Optional path to save the output video
+    - encoding: Encoding profile for the re-encode (see modules/encoding.py)
     
     Returns:
     - Path to the output video
     """
     if output_path is None:
-        temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
+        temp_output = scratch_path('.mp4')
         final_output = video_path
     else:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -835,6 +884,7 @@ def add_subtitles_with_drawtext(video_path, subtitles_data, output_path=None):
                 'ffmpeg',
                 '-i', video_path,
                 '-vf', filter_complex,
+                *video_args(encoding),
                 '-c:a', 'copy',
                 '-y',
                 temp_output
@@ -855,7 +905,7 @@ def add_subtitles_with_drawtext(video_path, subtitles_data, output_path=None):
             
             # Replace original if needed
             if output_path is None and os.path.exists(temp_output):
-                os.replace(temp_output, video_path)
+                publish(temp_output, video_path)
                 print("Successfully added subtitles using drawtext method")
                 return video_path
             else:
@@ -870,27 +920,20 @@ def add_subtitles_with_drawtext(video_path, subtitles_data, output_path=None):
         # Clean up temp file if it exists
         if 'temp_output' in locals() and output_path is None and os.path.exists(temp_output):
             try:
-                os.unlink(temp_output)
+                release(temp_output)
             except:
                 pass
                 
         return video_path
 
-def format_time(seconds):
-    """Converts seconds to h:mm:ss.cc format for ASS subtitles."""
-    h = int(seconds / 3600)
-    m = int((seconds % 3600) / 60)
-    s = int(seconds % 60)
-    cs = int((seconds - int(seconds)) * 100)
-    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
-
-def add_subtitles_to_shorts(video_path, output_path=None):
+def add_subtitles_to_shorts(video_path, output_path=None, encoding=None):
     """
     Adds auto-generated subtitles to a YouTube Short video.
     
     Parameters:
     - video_path: Path to the video
     - output_path: Optional output path (if None, modifies in place)
+    - encoding: Encoding profile for the re-encode (see modules/encoding.py)
     
     Returns:
     - Path to the video with subtitles
@@ -915,7 +958,7 @@ def add_subtitles_to_shorts(video_path, output_path=None):
         print(f"Generated {len(processed_segments)} subtitle segments for the Short")
         
         # Add subtitles to video
-        return add_subtitles_to_video(video_path, processed_segments, output_path)
+        return add_subtitles_to_video(video_path, processed_segments, output_path, encoding)
         
     except Exception as e:
         print(f"Error in subtitle generation: {e}")
@@ -943,37 +986,12 @@ def add_subtitle_to_frame(frame, text, font=None, position='bottom'):
     # Create drawing object
     draw = ImageDraw.Draw(img)
     
-    # Use default font if none provided
+    # Use the resolved system font if none provided
     if font is None:
-        try:
-            # Try common system fonts first
-            font_paths = [
-                "Arial", "Helvetica", "DejaVuSans",
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-                "/Library/Fonts/Arial.ttf",
-                "C:\\Windows\\Fonts\\arial.ttf"
-            ]
-            
-            for path in font_paths:
-                try:
-                    font = ImageFont.truetype(path, 28)
-                    break
-                except:
-                    continue
-                    
-            # Fall back to default if needed
-            if font is None:
-                font = ImageFont.load_default()
-        except:
-            font = ImageFont.load_default()
+        font = get_font(28)
     
     # Measure text dimensions
-    try:
-        text_bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-    except AttributeError:
-        text_width, text_height = draw.textsize(text, font=font)
+    text_width, text_height = text_size(font, text)
     
     # Define background area based on position
     margin = 20
@@ -1003,7 +1021,7 @@ def add_subtitle_to_frame(frame, text, font=None, position='bottom'):
     # Convert back to NumPy array
     return np.array(img)
 
-def add_text_overlay_to_video(video_path, text_data):
+def add_text_overlay_to_video(video_path, text_data, encoding=None):
     """
     DEPRECATED: This function is kept for backwards compatibility.
     Please use add_text_overlay_with_images or add_subtitle_overlay instead.
@@ -1013,7 +1031,7 @@ def add_text_overlay_to_video(video_path, text_data):
     print("Warning: Using deprecated text overlay method. Consider using add_text_overlay_with_images instead.")
     
     # Create temporary file for output
-    temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
+    temp_output = scratch_path('.mp4')
     
     # Build FFMPEG filters for text overlays
     filters = []
@@ -1037,6 +1055,7 @@ def add_text_overlay_to_video(video_path, text_data):
             'ffmpeg',
             '-i', video_path,
             '-vf', filter_complex,
+            *video_args(encoding),
             '-c:a', 'copy',
             '-y',
             temp_output
@@ -1046,16 +1065,132 @@ def add_text_overlay_to_video(video_path, text_data):
         
         # Replace original with the version containing text
         if os.path.exists(temp_output) and os.path.getsize(temp_output) > 0:
-            os.replace(temp_output, video_path)
+            publish(temp_output, video_path)
             return True
         else:
-            os.unlink(temp_output)
+            release(temp_output)
             print("Warning: Text overlay failed to produce valid output")
             return False
     
     return False
 
-def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad_text=None, add_subtitles=False):
+def plan_ad_video(video_path, start_time, duration, ad_format, ad_text=None, add_subtitles=False, encoding=None):
+    """
+    Works out how an ad video should be rendered, without rendering it.
+    
+    Crops to a square for Display Ads and to a 16:9 band for taller sources,
+    positioned by the shared crop analysis (see modules/crop.py); other sources
+    are not cropped.
+    
+    Returns:
+    - Dictionary with start_time, end_time, crop, fill, text_data, subtitles and encoding (see render_clip)
+    """
+    clip = VideoFileClip(video_path)
+    try:
+        # Make sure timestamps are within video bounds
+        start_time, end_time = ad_bounds(clip.duration, start_time, duration)
+        w, h = clip.size
+    finally:
+        clip.close()
+    
+    # Square for Display Ads, a 16:9 band for taller sources, placed where the content is
+    crop = None
+    if ad_format == "display_ads":
+        crop = analyze_crop(video_path, start_time, end_time, "1:1")["crop"]
+    elif h > int(9 * w / 16):
+        crop = analyze_crop(video_path, start_time, end_time, "16:9")["crop"]
+    
+    subtitles = clip_subtitle_segments(video_path, start_time, end_time) if add_subtitles else None
+    
+    # Wait for deferred ad creatives only now that everything else is known
+    text_data = resolve_deferred(ad_text) if ad_text else None
+    
+    return {
+        "start_time": start_time,
+        "end_time": end_time,
+        "crop": crop,
+        "fill": None,
+        "text_data": text_data,
+        "subtitles": subtitles,
+        "encoding": encoding
+    }
+
+def render_ad_video(video_path, start_time, duration, output_path, ad_format, ad_text=None, add_subtitles=False, encoding=None):
+    """
+    Renders an ad video with one ffmpeg encode (see modules/render.py).
+    
+    Returns:
+    - output_path: Path to the created video
+    """
+    plan = plan_ad_video(video_path, start_time, duration, ad_format, ad_text, add_subtitles, encoding)
+    render_planned(video_path, output_path, plan)
+    print(f"Rendered {ad_format} video in a single pass")
+    return output_path
+
+def _plan_job(video_path, job):
+    if job["platform"] == "youtube_shorts":
+        return plan_youtube_short(video_path, job["start_time"], job["start_time"] + job["duration"],
+                                  add_text=job.get("text"), add_subtitles=job.get("subtitles", True),
+                                  smart_format=job.get("smart_format", True), encoding=job.get("encoding"))
+    return plan_ad_video(video_path, job["start_time"], job["duration"], job["platform"],
+                         ad_text=job.get("text"), add_subtitles=job.get("subtitles", False),
+                         encoding=job.get("encoding"))
+
+def _render_and_publish(video_path, jobs, plans):
+    # Rendered in scratch and moved into place, so a preview is replaced in one step
+    def render():
+        outputs = [{**plan, "output_path": scratch_path('.mp4')} for plan in plans]
+        render_outputs(video_path, outputs)
+        return outputs
+    
+    outputs = retry_on_disk(render)
+    published = {}
+    for job, output in zip(jobs, outputs):
+        # A missing output leaves the platform out, so it is rendered on its own later
+        if os.path.exists(output["output_path"]):
+            publish(output["output_path"], job["output_path"])
+            published[job["platform"]] = job["output_path"]
+    return published
+
+def render_platform_outputs(video_path, jobs):
+    """
+    Renders every platform's video from one decode of the source.
+    
+    Parameters:
+    - video_path: Path to the source video
+    - jobs: List of dictionaries with 'platform', 'output_path', 'start_time' and
+      'duration', and optional 'text' (dict or callable), 'subtitles' flag, 'encoding' profile
+      and 'smart_format' (YouTube Shorts only)
+    
+    Returns:
+    - Dictionary mapping each platform whose video was published to its output path
+    """
+    rendered = _render_and_publish(video_path, jobs, [_plan_job(video_path, job) for job in jobs])
+    print(f"Rendered {len(jobs)} platform videos from one decode")
+    return rendered
+
+def render_previews(video_path, jobs):
+    """
+    Renders a low-resolution preview of every platform's video from one decode.
+    
+    Previews use the "preview" encoding profile and the same crop or blur fill
+    as the final render, without text overlays or subtitles, so they need
+    neither the ad creatives nor a transcription pass. Each is published to
+    its job's output path; the final render later replaces it atomically.
+    
+    Parameters:
+    - video_path: Path to the source video
+    - jobs: List of job dictionaries (see render_platform_outputs)
+    
+    Returns:
+    - Dictionary mapping each platform whose video was published to its output path
+    """
+    plans = [_plan_job(video_path, {**job, "text": None, "subtitles": False, "encoding": "preview"})
+             for job in jobs]
+    return _render_and_publish(video_path, jobs, plans)
+
+def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad_text=None, add_subtitles=False, single_pass=True,
+                    encoding=None):
     """
     Creates an ad video in the specified format with intelligent formatting.
     
@@ -1065,8 +1200,11 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
     - duration: Duration in seconds
     - output_path: Path to save the output video
     - ad_format: Format of the ad (youtube_ads, display_ads, performance_max)
-    - ad_text: Optional text to overlay (dict with 'headline' and 'cta' keys)
+    - ad_text: Optional text to overlay (dict with 'headline' and 'cta' keys, or a callable returning one)
     - add_subtitles: Whether to automatically generate and add subtitles
+    - single_pass: Render cut, crop, overlays and subtitles with one encode, falling back
+      to the multi-pass path below if that fails
+    - encoding: Encoding profile name or dictionary (see modules/encoding.py)
     
     Returns:
     - output_path: Path to the created video
@@ -1074,6 +1212,12 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
     # Create the output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
+    if single_pass:
+        try:
+            return render_ad_video(video_path, start_time, duration, output_path, ad_format, ad_text, add_subtitles, encoding)
+        except Exception as e:
+            print(f"Single-pass render failed, falling back to multi-pass rendering: {e}")
+    
     # Load the video
     clip = VideoFileClip(video_path)
     
@@ -1098,8 +1242,8 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
             # Try different approaches to create square format
             try:
                 # Approach 1: Try FFMPEG cropping
-                temp_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
-                subclip.write_videofile(temp_file, fps=24, logger=None)
+                temp_file = scratch_path('.mp4')
+                subclip.write_videofile(temp_file, logger=None, **moviepy_args(encoding, subclip.fps))
                 
                 # Create square crop filter
                 crop_filter = f"crop={size}:{size}:{x_center - size//2}:{y_center - size//2}"
@@ -1109,6 +1253,7 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
                     'ffmpeg',
                     '-i', temp_file,
                     '-vf', crop_filter,
+                    *video_args(encoding),
                     '-c:a', 'copy',
                     '-y',
                     output_path
@@ -1119,11 +1264,11 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
                 
                 # Check success
                 if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                    os.unlink(temp_file)
+                    release(temp_file)
                     formatting_successful = True
                     print(f"Successfully created square format using FFMPEG: {size}x{size}")
                 else:
-                    os.unlink(temp_file)
+                    release(temp_file)
                     print("FFMPEG square crop failed, trying alternative method.")
             except Exception as e:
                 print(f"FFMPEG approach for square format failed: {e}")
@@ -1144,7 +1289,7 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
                     square_clip = VideoClip(make_square_frame, duration=subclip.duration)
                     square_clip.audio = subclip.audio
                     
-                    square_clip.write_videofile(output_path, fps=24, logger=None)
+                    square_clip.write_videofile(output_path, logger=None, **moviepy_args(encoding, subclip.fps))
                     
                     square_clip.close()
                     formatting_successful = True
@@ -1161,8 +1306,8 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
                 # Try FFMPEG approach first
                 try:
                     # Create temporary file
-                    temp_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
-                    subclip.write_videofile(temp_file, fps=24, logger=None)
+                    temp_file = scratch_path('.mp4')
+                    subclip.write_videofile(temp_file, logger=None, **moviepy_args(encoding, subclip.fps))
                     
                     # Calculate crop
                     y_center = h // 2
@@ -1173,6 +1318,7 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
                         'ffmpeg',
                         '-i', temp_file,
                         '-vf', crop_filter,
+                        *video_args(encoding),
                         '-c:a', 'copy',
                         '-y',
                         output_path
@@ -1183,11 +1329,11 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
                     
                     # Check success
                     if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                        os.unlink(temp_file)
+                        release(temp_file)
                         formatting_successful = True
                         print(f"Successfully created 16:9 format using FFMPEG: {w}x{target_h}")
                     else:
-                        os.unlink(temp_file)
+                        release(temp_file)
                         print("FFMPEG 16:9 crop failed, trying alternative method.")
                 except Exception as e:
                     print(f"FFMPEG approach for 16:9 format failed: {e}")
@@ -1209,7 +1355,7 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
                         widescreen_clip = VideoClip(make_16_9_frame, duration=subclip.duration)
                         widescreen_clip.audio = subclip.audio
                         
-                        widescreen_clip.write_videofile(output_path, fps=24, logger=None)
+                        widescreen_clip.write_videofile(output_path, logger=None, **moviepy_args(encoding, subclip.fps))
                         
                         widescreen_clip.close()
                         formatting_successful = True
@@ -1219,8 +1365,13 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
             else:
                 # Video already has correct proportions or needs padding
                 try:
-                    # Just output the subclip as-is if in correct proportion
-                    subclip.write_videofile(output_path, fps=24, logger=None)
+                    # Just output the subclip as-is if in correct proportion,
+                    # copying whole GOPs rather than re-encoding every frame
+                    try:
+                        smart_cut(video_path, start_time, end_time, output_path, encoding=encoding)
+                    except Exception as e:
+                        print(f"Smart cut failed, re-encoding the subclip: {e}")
+                        subclip.write_videofile(output_path, logger=None, **moviepy_args(encoding, subclip.fps))
                     formatting_successful = True
                     print(f"Video already has appropriate dimensions, no formatting needed: {w}x{h}")
                 except Exception as e:
@@ -1233,7 +1384,7 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
     if not formatting_successful:
         print("All formatting approaches failed. Writing original subclip.")
         try:
-            subclip.write_videofile(output_path, fps=24, logger=None)
+            subclip.write_videofile(output_path, logger=None, **moviepy_args(encoding, subclip.fps))
         except Exception as e:
             print(f"Error writing fallback video: {e}")
             return None
@@ -1241,15 +1392,18 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
     # Add text overlays if provided
     if ad_text and os.path.exists(output_path):
         try:
+            # Wait for deferred ad creatives only now that the video is rendered
+            ad_text = resolve_deferred(ad_text)
+            
             # Try enhanced text overlay approach first
-            overlay_result = add_text_overlay_with_images(output_path, ad_text)
+            overlay_result = add_text_overlay_with_images(output_path, ad_text, encoding)
             
             # If that fails, try simpler subtitle approach
             if not overlay_result and isinstance(ad_text, dict):
                 if 'headline' in ad_text and ad_text['headline']:
-                    add_subtitle_overlay(output_path, ad_text['headline'], position='top')
+                    add_subtitle_overlay(output_path, ad_text['headline'], position='top', encoding=encoding)
                 elif 'cta' in ad_text and ad_text['cta']:
-                    add_subtitle_overlay(output_path, ad_text['cta'], position='bottom')
+                    add_subtitle_overlay(output_path, ad_text['cta'], position='bottom', encoding=encoding)
         except Exception as e:
             print(f"Could not add text overlays: {e}")
             print(traceback.format_exc())
@@ -1258,7 +1412,7 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
     if add_subtitles and os.path.exists(output_path):
         try:
             print("Adding auto-generated subtitles to the video...")
-            add_subtitles_to_shorts(output_path)
+            add_subtitles_to_shorts(output_path, encoding=encoding)
         except Exception as e:
             print(f"Could not add auto-generated subtitles: {e}")
             print(traceback.format_exc())
@@ -1272,7 +1426,7 @@ def create_ad_video(video_path, start_time, duration, output_path, ad_format, ad
     
     return output_path
 
-def generate_thumbnail(video_path, timestamp, output_path, headline=None, font_path=None):
+def generate_thumbnail(video_path, timestamp, output_path, headline=None, font_path=None, crop_range=None):
     """
     Generates a thumbnail from a video frame, formatted for vertical display with optional headline overlay.
     
@@ -1280,8 +1434,11 @@ def generate_thumbnail(video_path, timestamp, output_path, headline=None, font_p
     - video_path: Path to the source video
     - timestamp: Timestamp in seconds to extract frame
     - output_path: Path to save the thumbnail
-    - headline: Optional headline text to overlay
+    - headline: Optional headline text to overlay, or a creatives dictionary with
+      'headline' and 'call_to_action'
     - font_path: Optional path to a custom font file (TTF)
+    - crop_range: Optional (start, end) of the clip the thumbnail belongs to, so its
+      crop analysis is reused; defaults to analysing the chosen frame alone
     
     Returns:
     - output_path: Path to the created thumbnail
@@ -1289,222 +1446,64 @@ def generate_thumbnail(video_path, timestamp, output_path, headline=None, font_p
     # Create the output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    # Extract a frame from the video
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_number = int(timestamp * fps)
-    
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-    ret, frame = cap.read()
-    
-    # If frame extraction fails, try an earlier frame
-    if not ret:
-        print(f"Could not extract frame at timestamp {timestamp}, trying earlier timestamp")
-        for earlier_frame in range(frame_number-1, 0, -1):
-            cap.set(cv2.CAP_PROP_POS_FRAMES, earlier_frame)
-            ret, frame = cap.read()
-            if ret:
-                break
-    
-    cap.release()
-    
-    # If still no valid frame, raise error
-    if not ret:
-        raise ValueError("Could not extract any valid frame from the video")
-    
-    # Convert to PIL Image for processing
-    image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    # Pick the sharpest, best-exposed frame around the timestamp
+    frame, choice = select_thumbnail_frame(video_path, timestamp)
+    print(f"Thumbnail frame at {choice['time']:.2f}s (score {choice['score']:.2f} of {choice['candidates']} candidates)")
+    image = Image.fromarray(frame)
     
     # Get original dimensions
     width, height = image.size
     target_width = int(height * 9 / 16)  # For 9:16 ratio
     
-    # Use similar content detection as video function for consistency
-    # Simple edge detection to find important content
-    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray_frame, 100, 200)
-    kernel = np.ones((5, 5), np.uint8)
-    dilated = cv2.dilate(edges, kernel, iterations=2)
-    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    # Get bounding boxes for significant contours
-    boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) > 500]
-    
-    # If we found important content
-    if boxes:
-        # Find content bounds
-        left_bounds = [x for (x, y, w, h) in boxes]
-        right_bounds = [x + w for (x, y, w, h) in boxes]
-        content_left = min(left_bounds)
-        content_right = max(right_bounds)
-        content_center = content_left + (content_right - content_left) // 2
-        
-        # Create crop boundaries centered on content
-        left = max(0, content_center - target_width // 2)
-        right = min(width, left + target_width)
-        
-        # Adjust if at frame edges
-        if left == 0:
-            right = min(width, target_width)
-        elif right == width:
-            left = max(0, width - target_width)
+    # Reuse the crop analysis of the clip this thumbnail belongs to (cached per range)
+    range_start, range_end = crop_range or (choice['time'], choice['time'])
+    window = analyze_crop(video_path, range_start, range_end, "9:16")
+    if window["crop"] and width > target_width:
+        left = window["crop"][2]
     else:
-        # No significant content found, use center crop
-        x_center = width // 2
-        left = max(0, x_center - target_width // 2)
-        right = min(width, left + target_width)
+        left = max(0, width // 2 - target_width // 2)
+    right = min(width, left + target_width)
     
     # Perform the crop
     if width > target_width:  # Only crop if needed
         image = image.crop((left, 0, right, height))
     
+    # A creatives dictionary carries both the headline and the call to action
+    cta_text = None
+    if isinstance(headline, dict):
+        cta_text = headline.get('call_to_action')
+        headline = headline.get('headline')
+    
     # Add headline text if provided
     if headline:
         try:
-            # Try to find a suitable font
             font_size = int(height * 0.08)  # 8% of the image height
-            headline_font = None
-            cta_font = None
-            
-            if font_path and os.path.exists(font_path):
-                try:
-                    headline_font = ImageFont.truetype(font_path, font_size)
-                    cta_font = ImageFont.truetype(font_path, int(font_size * 0.8))
-                except Exception as e:
-                    print(f"Could not load custom font: {e}")
-            
-            # If custom font failed or wasn't provided, try common system fonts
-            if not headline_font:
-                try:
-                    for font_name in ["Arial", "Helvetica", "DejaVuSans", "FreeSans", "Liberation Sans"]:
-                        try:
-                            font_paths = [
-                                f"{font_name}",
-                                f"/usr/share/fonts/truetype/{font_name}.ttf",
-                                f"/Library/Fonts/{font_name}.ttf",
-                                f"C:\\Windows\\Fonts\\{font_name.lower()}.ttf"
-                            ]
-                            
-                            # Try each potential path
-                            for path in font_paths:
-                                try:
-                                    headline_font = ImageFont.truetype(path, font_size)
-                                    cta_font = ImageFont.truetype(path, int(font_size * 0.8))
-                                    if headline_font:
-                                        break
-                                except:
-                                    continue
-                            
-                            if headline_font:
-                                break
-                        except:
-                            continue
-                except:
-                    pass
-            
-            # Fallback to default font if still not found
-            if not headline_font:
-                headline_font = ImageFont.load_default()
-                cta_font = ImageFont.load_default()
+            headline_font = get_font(font_size, font_path)
+            cta_font = get_font(font_size * 0.8, font_path)
             
-            # Create a drawing context
+            # Darken the top 25% of the image so the headline stays readable
+            image = apply_top_gradient(image, image.height * 0.25)
             draw = ImageDraw.Draw(image)
             
-            # Create a gradient overlay at the top for the headline
-            gradient_height = int(image.height * 0.25)  # 25% of the image height
-            
-            # Create a separate image for the gradient overlay
-            overlay = Image.new('RGBA', image.size, (0, 0, 0, 0))
-            overlay_draw = ImageDraw.Draw(overlay)
-            
-            # Draw gradient from top
-            for y in range(gradient_height):
-                alpha = int(180 * (1 - y / gradient_height))  # Fade from 180 to 0
-                overlay_draw.rectangle([(0, y), (image.width, y)], fill=(0, 0, 0, alpha))
-            
-            # Convert overlay to RGB and blend with original image
-            if image.mode == 'RGB':
-                # Create a new image with alpha transparency
-                temp = Image.new('RGBA', image.size)
-                temp.paste(image.convert('RGBA'), (0, 0))
-                # Paste overlay with alpha
-                temp = Image.alpha_composite(temp, overlay)
-                # Convert back to RGB
-                image = temp.convert('RGB')
-            else:
-                # Direct alpha composite if the image already has transparency
-                image = Image.alpha_composite(image.convert('RGBA'), overlay)
-                image = image.convert('RGB')
-            
-            # Calculate text size and position
-            draw = ImageDraw.Draw(image)
-            max_width = image.width * 0.9  # 90% of the image width
-            
-            # Handle long headlines: split into multiple lines if needed
-            words = headline.split()
-            lines = []
-            current_line = words[0]
-            
-            for word in words[1:]:
-                test_line = current_line + " " + word
-                
-                # Get text width (handle different PIL versions)
-                try:
-                    text_bbox = draw.textbbox((0, 0), test_line, font=headline_font)
-                    text_width = text_bbox[2] - text_bbox[0]
-                except AttributeError:
-                    text_width, _ = draw.textsize(test_line, font=headline_font)
-                
-                if text_width <= max_width:
-                    current_line = test_line
-                else:
-                    lines.append(current_line)
-                    current_line = word
-            
-            # Add the last line
-            lines.append(current_line)
+            # Handle long headlines: split into lines of at most 90% of the image width
+            lines = wrap_text(headline, headline_font, image.width * 0.9)
             
             # Draw each line of text for headline
             y_position = image.height * 0.05  # Start at 5% from the top
             line_height = font_size * 1.2
             
-            for line in lines:
-                # Get text dimensions (handle different PIL versions)
-                try:
-                    text_bbox = draw.textbbox((0, 0), line, font=headline_font)
-                    text_width = text_bbox[2] - text_bbox[0]
-                except AttributeError:
-                    text_width, _ = draw.textsize(line, font=headline_font)
-                
-                x_position = (image.width - text_width) / 2  # Center horizontally
-                
-                # Draw text shadow for better visibility
-                draw.text((x_position+2, y_position+2), line, font=headline_font, fill=(0, 0, 0))
-                draw.text((x_position, y_position), line, font=headline_font, fill=(255, 255, 255))
-                
+            for line, line_width in lines:
+                x_position = (image.width - line_width) / 2  # Center horizontally
+                draw_shadowed_text(draw, (x_position, y_position), line, headline_font)
                 y_position += line_height
             
-            # Get call-to-action text from metadata if available
-            # We'll use a dictionary to get the call to action
-            if isinstance(headline, dict) and 'call_to_action' in headline:
-                cta_text = headline['call_to_action']
-                
-                # Draw CTA right below the headline
-                try:
-                    text_bbox = draw.textbbox((0, 0), cta_text, font=cta_font)
-                    text_width = text_bbox[2] - text_bbox[0]
-                except AttributeError:
-                    text_width, _ = draw.textsize(cta_text, font=cta_font)
-                
-                x_position = (image.width - text_width) / 2  # Center horizontally
-                
-                # Draw CTA text with shadow, right below the headline
-                draw.text((x_position+2, y_position+2), cta_text, font=cta_font, fill=(0, 0, 0))
-                draw.text((x_position, y_position), cta_text, font=cta_font, fill=(255, 255, 255))
+            # Draw the call to action right below the headline
+            if cta_text:
+                x_position = (image.width - text_width(cta_font, cta_text)) / 2
+                draw_shadowed_text(draw, (x_position, y_position), cta_text, cta_font)
             
         except Exception as e:
             print(f"Could not add headline to thumbnail: {e}")
-            import traceback
             print(traceback.format_exc())
     
     # Save the thumbnail
@@ -0,0 +1,192 @@
+#backend/modules/crop.py
+import os
+import json
+import hashlib
+import threading
+import subprocess
+import numpy as np
+from modules.render import probe_video
+
+# Crop analysis settings (override with environment variables)
+CROP_CACHE_DIR = os.environ.get(
+    "CROP_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "crop")
+)
+ANALYSIS_WIDTH = 320      # frames are downscaled to this width before analysis
+SAMPLE_FRAMES = 10        # frames sampled across a time range
+EDGE_PERCENTILE = 90      # gradient magnitudes above this percentile count as edges
+MIN_EDGE_STRENGTH = 20    # ...but never weaker than this (flat frames have no edges)
+FIT_COVERAGE = 0.85       # share of the edge density a window must hold for the content to "fit"
+
+_lock = threading.Lock()
+_windows = {}
+_stats = {"hits": 0, "misses": 0}
+
+def parse_aspect(aspect):
+    """Converts an aspect ratio such as "9:16" to a width/height ratio."""
+    w, h = (float(part) for part in str(aspect).split(":"))
+    return w / h
+
+def _sample_frames(video_path, start_time, end_time, width, height):
+    """
+    Decodes downscaled grayscale frames across a time range with one ffmpeg call.
+
+    Returns:
+    - uint8 array of shape (frames, height, width) at analysis resolution
+    """
+    analysis_w = min(ANALYSIS_WIDTH, width)
+    analysis_h = max(2, int(round(height * analysis_w / width / 2)) * 2)
+    duration = end_time - start_time
+
+    cmd = ['ffmpeg', '-v', 'error', '-ss', f"{start_time:.3f}"]
+    if duration > 0:
+        count = SAMPLE_FRAMES
+        cmd += ['-t', f"{duration:.3f}", '-i', video_path,
+                '-vf', f"fps={count / duration:.6f},scale={analysis_w}:{analysis_h}"]
+    else:
+        count = 1
+        cmd += ['-i', video_path, '-vf', f"scale={analysis_w}:{analysis_h}"]
+    cmd += ['-frames:v', str(count), '-pix_fmt', 'gray', '-f', 'rawvideo', '-']
+
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed: {process.stderr.decode('utf-8', errors='ignore').strip()}")
+
+    frame_size = analysis_w * analysis_h
+    frames = np.frombuffer(process.stdout, dtype=np.uint8)
+    frames = frames[:len(frames) // frame_size * frame_size]
+    return frames.reshape(-1, analysis_h, analysis_w)
+
+def edge_profiles(frames):
+    """
+    Computes edge-density profiles of a stack of grayscale frames.
+
+    Returns:
+    - (column_profile, row_profile): share of edge pixels in each column and row
+    """
+    frames = frames.astype(np.float32)
+    magnitude = np.zeros_like(frames)
+    magnitude[:, :, 1:] += np.abs(np.diff(frames, axis=2))
+    magnitude[:, 1:, :] += np.abs(np.diff(frames, axis=1))
+
+    threshold = max(np.percentile(magnitude, EDGE_PERCENTILE), MIN_EDGE_STRENGTH)
+    edges = magnitude > threshold
+    return edges.mean(axis=(0, 1)), edges.mean(axis=(0, 2))
+
+def best_window(profile, length):
+    """
+    Finds where a window of `length` bins holds the most of a profile.
+
+    Ties go to the most central position, so flat profiles give a centered window.
+
+    Returns:
+    - (offset, coverage) with coverage the share of the profile inside the window
+    """
+    total = profile.sum()
+    length = max(1, min(length, len(profile)))
+    sums = np.convolve(profile, np.ones(length), mode='valid')
+    if total <= 0:
+        return (len(profile) - length) // 2, 1.0
+
+    center = (len(profile) - length) / 2
+    distance = np.abs(np.arange(len(sums)) - center)
+    # Prefer central windows among those within a hair of the best
+    candidates = np.flatnonzero(sums >= sums.max() - 1e-9)
+    offset = int(candidates[np.argmin(distance[candidates])])
+    return offset, float(sums[offset] / total)
+
+def _analyze(video_path, start_time, end_time, aspect):
+    info = probe_video(video_path)
+    width, height = info["width"], info["height"]
+    ratio = parse_aspect(aspect)
+
+    if abs(width / height - ratio) < 0.01:
+        return {"crop": None, "content_fits": True, "coverage": 1.0}
+
+    frames = _sample_frames(video_path, start_time, end_time, width, height)
+    columns, rows = edge_profiles(frames)
+
+    if width / height > ratio:
+        # Wider than the target: slide a full-height window horizontally
+        crop_w, crop_h = int(height * ratio), height
+        scale = width / len(columns)
+        offset, coverage = best_window(columns, int(round(crop_w / scale)))
+        x, y = min(int(round(offset * scale)), width - crop_w), 0
+    else:
+        # Taller than the target: slide a full-width window vertically
+        crop_w, crop_h = width, int(width / ratio)
+        scale = height / len(rows)
+        offset, coverage = best_window(rows, int(round(crop_h / scale)))
+        x, y = 0, min(int(round(offset * scale)), height - crop_h)
+
+    return {
+        "crop": (crop_w, crop_h, x, y),
+        "content_fits": coverage >= FIT_COVERAGE,
+        "coverage": round(coverage, 3)
+    }
+
+def analyze_crop(video_path, start_time, end_time, aspect):
+    """
+    Chooses the crop window for an aspect ratio over a time range of a source.
+
+    Frames sampled across the range are downscaled and reduced to column and
+    row edge-density profiles; the window holding the most edge density wins.
+    Results are cached per (source, time range, aspect ratio) in memory and on
+    disk, so every renderer of a job (and every worker process) reuses one
+    analysis.
+
+    Parameters:
+    - video_path: Path to the source video
+    - start_time: Start of the range in seconds
+    - end_time: End of the range in seconds (equal to start_time for a single frame)
+    - aspect: Target aspect ratio such as "9:16", "1:1" or "16:9"
+
+    Returns:
+    - Dictionary with 'crop' ((width, height, x, y) in source pixels, or None when the
+      source already has the aspect ratio), 'content_fits' (False when the detailed
+      content is wider than the window) and 'coverage'
+    """
+    stat = os.stat(video_path)
+    key_data = [os.path.abspath(video_path), stat.st_mtime, stat.st_size,
+                round(start_time, 2), round(end_time, 2), str(aspect)]
+    key = hashlib.sha256(json.dumps(key_data).encode('utf-8')).hexdigest()
+    path = os.path.join(CROP_CACHE_DIR, f"{key}.json")
+
+    with _lock:
+        window = _windows.get(key)
+    if window is None and os.path.exists(path):
+        try:
+            with open(path) as f:
+                window = json.load(f)
+            window["crop"] = tuple(window["crop"]) if window["crop"] else None
+        except (OSError, json.JSONDecodeError, KeyError):
+            window = None
+
+    if window is not None:
+        with _lock:
+            _windows[key] = window
+            _stats["hits"] += 1
+        return window
+
+    window = _analyze(video_path, start_time, end_time, aspect)
+    with _lock:
+        _windows[key] = window
+        _stats["misses"] += 1
+    try:
+        os.makedirs(CROP_CACHE_DIR, exist_ok=True)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(window, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Could not store crop analysis in cache: {e}")
+    return window
+
+def get_crop_stats(reset=False):
+    """
+    Returns crop analysis cache hit/miss counts for this process.
+    """
+    with _lock:
+        stats = dict(_stats)
+        if reset:
+            _stats.update({"hits": 0, "misses": 0})
+    return stats
@@ -0,0 +1,165 @@
+#backend/modules/encoding.py
+import os
+
+# Encoding profiles, from quickest to best quality per byte. Platforms pick one
+# through the "encoding" key of PLATFORM_SETTINGS; "max_height" (optional) scales
+# larger outputs down.
+ENCODING_PROFILES = {
+    "preview": {
+        # Low-resolution draft published while the final render runs
+        "codec": "libx264",
+        "preset": "ultrafast",
+        "crf": 30,
+        "gop_seconds": 2,
+        "max_fps": 30,
+        "max_height": 480,
+        "audio_codec": "aac",
+        "audio_bitrate": "96k"
+    },
+    "fast": {
+        "codec": "libx264",
+        "preset": "veryfast",
+        "crf": 26,
+        "gop_seconds": 2,       # keyframe interval
+        "max_fps": 30,
+        "audio_codec": "aac",
+        "audio_bitrate": "128k"
+    },
+    "balanced": {
+        "codec": "libx264",
+        "preset": "medium",
+        "crf": 23,
+        "gop_seconds": 2,
+        "max_fps": 60,
+        "audio_codec": "aac",
+        "audio_bitrate": "160k"
+    },
+    "archival": {
+        "codec": "libx264",
+        "preset": "slow",
+        "crf": 18,
+        "gop_seconds": 4,
+        "max_fps": 60,
+        "audio_codec": "aac",
+        "audio_bitrate": "192k"
+    }
+}
+
+# Profile used when a render does not name one (override with ENCODING_PROFILE)
+DEFAULT_PROFILE = os.environ.get("ENCODING_PROFILE", "balanced")
+
+# Frame rates passed through unchanged; anything else is resampled to FALLBACK_FPS
+STANDARD_FPS = (23.976, 24, 25, 29.97, 30, 48, 50, 59.94, 60)
+FALLBACK_FPS = 24
+
+def configure_encoding(default_profile=None):
+    """
+    Overrides the encoding settings at runtime.
+
+    Parameters:
+    - default_profile: Name of the profile used when a render does not name one
+    """
+    global DEFAULT_PROFILE
+
+    if default_profile is not None:
+        get_profile(default_profile)
+        DEFAULT_PROFILE = default_profile
+
+def get_profile(profile=None):
+    """
+    Looks up an encoding profile.
+
+    Parameters:
+    - profile: Profile name, a profile dictionary, or None for the default profile
+
+    Returns:
+    - Profile dictionary
+
+    Raises:
+    - ValueError for an unknown profile name
+    """
+    if isinstance(profile, dict):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile '{name}' (expected one of {', '.join(ENCODING_PROFILES)})")
+    return ENCODING_PROFILES[name]
+
+def _is_standard(fps):
+    return any(abs(fps - rate) < 0.01 for rate in STANDARD_FPS)
+
+def output_fps(source_fps, profile=None):
+    """
+    Picks the output frame rate for a source.
+
+    A standard source rate within the profile's limit is kept; a standard rate
+    above it is halved (e.g. 59.94 -> 29.97) when that fits, and anything else
+    falls back to FALLBACK_FPS.
+    """
+    max_fps = get_profile(profile)["max_fps"]
+    if source_fps and _is_standard(source_fps):
+        if source_fps <= max_fps + 0.01:
+            return source_fps
+        if _is_standard(source_fps / 2) and source_fps / 2 <= max_fps + 0.01:
+            return source_fps / 2
+    return FALLBACK_FPS
+
+def output_size(width, height, profile=None):
+    """
+    Applies a profile's max_height to an output frame size.
+
+    Returns:
+    - Scaled (width, height), both even, or None when the frame already fits
+    """
+    max_height = get_profile(profile).get("max_height")
+    if not max_height or height <= max_height:
+        return None
+    return max(2, int(width * max_height / height) // 2 * 2), max_height - max_height % 2
+
+def same_fps(a, b):
+    """Returns True when two frame rates match closely enough to skip resampling."""
+    return bool(a and b) and abs(a - b) < 0.01
+
+def _keyframe_expr(profile):
+    # Time-based, so the keyframe interval holds whatever the frame rate
+    return f"expr:gte(t,n_forced*{profile['gop_seconds']})"
+
+def video_args(profile=None):
+    """
+    Returns the ffmpeg video encoder options for a profile.
+    """
+    profile = get_profile(profile)
+    return [
+        '-c:v', profile["codec"],
+        '-preset', profile["preset"],
+        '-crf', str(profile["crf"]),
+        '-force_key_frames', _keyframe_expr(profile)
+    ]
+
+def audio_args(profile=None):
+    """
+    Returns the ffmpeg audio encoder options for a profile.
+    """
+    profile = get_profile(profile)
+    return ['-c:a', profile["audio_codec"], '-b:a', profile["audio_bitrate"]]
+
+def moviepy_args(profile=None, fps=None):
+    """
+    Returns write_videofile keyword arguments for a profile.
+
+    Parameters:
+    - profile: Profile name or dictionary (default: DEFAULT_PROFILE)
+    - fps: Frame rate of the clip being written; passed through when compatible
+
+    Returns:
+    - Dictionary of keyword arguments for VideoClip.write_videofile
+    """
+    profile = get_profile(profile)
+    return {
+        "fps": output_fps(fps, profile),
+        "codec": profile["codec"],
+        "preset": profile["preset"],
+        "audio_codec": profile["audio_codec"],
+        "audio_bitrate": profile["audio_bitrate"],
+        "ffmpeg_params": ['-crf', str(profile["crf"]), '-force_key_frames', _keyframe_expr(profile)]
+    }
@@ -1,75 +1,187 @@
 #backend/modules/engagement.py
+import os
+import json
 import cv2
+import numpy as np
 import torch
 from PIL import Image
 from transformers import CLIPProcessor, CLIPModel
 
-def find_engaging_moments(video_path, top_n=3):
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+
+# Hand-written prompts used when no learned engagement head is available
+DEFAULT_TEXT_QUERIES = ["exciting moment", "visually stunning scene", "emotionally powerful moment"]
+
+# Learned engagement head produced by train_engagement_head.py
+DEFAULT_HEAD_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "engagement_head.npz"
+)
+
+# Per-job artifacts written next to the other job outputs
+EMBEDDINGS_FILENAME = "clip_embeddings.npz"
+ANALYSIS_FILENAME = "engagement_analysis.json"
+
+def load_engagement_head(head_path=None):
+    """
+    Loads a learned engagement scoring head.
+
+    Parameters:
+    - head_path: Path to the .npz head file (default: models/engagement_head.npz)
+
+    Returns:
+    - Dictionary with 'weights', 'bias', 'version' and 'clip_model', or None if unavailable
+    """
+    head_path = head_path or os.environ.get("ENGAGEMENT_HEAD_PATH", DEFAULT_HEAD_PATH)
+    if not os.path.exists(head_path):
+        return None
+
+    try:
+        data = np.load(head_path, allow_pickle=False)
+        head = {
+            "weights": data["weights"].astype(np.float32),
+            "bias": float(data["bias"]),
+            "version": str(data["version"]),
+            "clip_model": str(data["clip_model"]),
+            "path": head_path
+        }
+    except Exception as e:
+        print(f"Could not load engagement head from {head_path}: {e}")
+        return None
+
+    if head["clip_model"] != CLIP_MODEL_NAME:
+        print(f"Engagement head was trained on {head['clip_model']}, expected {CLIP_MODEL_NAME}; ignoring it")
+        return None
+
+    return head
+
+def load_embeddings(output_dir):
+    """
+    Loads the cached CLIP embeddings for a job.
+
+    Parameters:
+    - output_dir: Job output directory containing clip_embeddings.npz
+
+    Returns:
+    - (embeddings, sample_times) tuple of NumPy arrays, or (None, None) if not cached
+    """
+    path = os.path.join(output_dir, EMBEDDINGS_FILENAME)
+    if not os.path.exists(path):
+        return None, None
+
+    data = np.load(path, allow_pickle=False)
+    return data["embeddings"], data["sample_times"]
+
+def find_engaging_moments(video_path, top_n=3, output_dir=None, head_path=None):
     """
     Analyzes video frames using CLIP to identify the most engaging moments.
-    
+
+    Frames are embedded once with the CLIP image encoder. If a learned engagement
+    head is available the scores are a single matmul over those embeddings, otherwise
+    the embeddings are compared against the default text prompts.
+
     Parameters:
     - video_path: Path to the video file
     - top_n: Number of top moments to return
-    
+    - output_dir: Optional job output directory to cache embeddings and scores in
+    - head_path: Optional path to a learned engagement head
+
     Returns:
-    - top_moments: List of frame indices for the most engaging moments
+    - top_moments: List of timestamps in seconds of the most engaging moments
     """
     # Load the CLIP model and processor
-    model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+    model = CLIPModel.from_pretrained(CLIP_MODEL_NAME)
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+    model.eval()
 
     # Extract frames from the video
     def extract_frames(video_path, fps=1):
         cap = cv2.VideoCapture(video_path)
+        video_fps = cap.get(cv2.CAP_PROP_FPS)
+        step = max(1, int(video_fps / fps))
         frames = []
+        sample_times = []
         frame_count = 0
 
         while True:
             ret, frame = cap.read()
             if not ret:
                 break
-            if frame_count % int(cap.get(cv2.CAP_PROP_FPS) / fps) == 0:
+            if frame_count % step == 0:
                 frames.append(frame)
+                sample_times.append(frame_count / video_fps if video_fps else 0.0)
             frame_count += 1
 
         cap.release()
-        return frames
+        return frames, np.array(sample_times, dtype=np.float32)
+
+    # Embed frames with the CLIP image encoder in batches
+    def embed_frames(frames, batch_size=32):
+        embeddings = []
+        with torch.no_grad():
+            for i in range(0, len(frames), batch_size):
+                images = [Image.fromarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)) for f in frames[i:i + batch_size]]
+                inputs = processor(images=images, return_tensors="pt")
+                features = model.get_image_features(**inputs)
+                features = features / features.norm(dim=-1, keepdim=True)
+                embeddings.append(features.cpu().numpy().astype(np.float32))
+
+        if not embeddings:
+            return np.zeros((0, model.config.projection_dim), dtype=np.float32)
+        return np.concatenate(embeddings, axis=0)
 
-    # Score frames based on engagement
-    def score_frames(frames, text_queries=None):
+    # Score frames based on engagement using the text prompts
+    def score_frames_with_prompts(embeddings, text_queries=None):
         if text_queries is None:
-            text_queries = ["exciting moment", "visually stunning scene", "emotionally powerful moment"]
-        
-        all_scores = []
-        
-        for frame in frames:
-            # Convert frame to PIL image
-            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            
-            frame_scores = []
-            for query in text_queries:
-                # Process the image and text
-                inputs = processor(text=[query], images=image, return_tensors="pt", padding=True)
-                outputs = model(**inputs)
-                score = outputs.logits_per_image.item()
-                frame_scores.append(score)
-            
-            # Average the scores for different queries
-            all_scores.append(sum(frame_scores) / len(frame_scores))
-
-        return all_scores
+            text_queries = DEFAULT_TEXT_QUERIES
+
+        with torch.no_grad():
+            inputs = processor(text=text_queries, return_tensors="pt", padding=True)
+            text_features = model.get_text_features(**inputs)
+            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+            logit_scale = model.logit_scale.exp().item()
+
+        # Same as averaging logits_per_image over the queries
+        logits = logit_scale * embeddings @ text_features.cpu().numpy().T
+        return logits.mean(axis=1)
 
     # Extract frames
-    frames = extract_frames(video_path)
+    frames, sample_times = extract_frames(video_path)
     print(f"Extracted {len(frames)} frames for analysis")
 
+    # Embed frames once and drop the raw frames
+    embeddings = embed_frames(frames)
+    del frames
+
     # Score frames
-    scores = score_frames(frames)
+    head = load_engagement_head(head_path)
+    if head is not None:
+        print(f"Scoring frames with learned engagement head {head['version']}")
+        scores = embeddings @ head["weights"] + head["bias"]
+    else:
+        scores = score_frames_with_prompts(embeddings)
+
+    # Cache embeddings and scores alongside the job artifacts
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        np.savez_compressed(
+            os.path.join(output_dir, EMBEDDINGS_FILENAME),
+            embeddings=embeddings,
+            sample_times=sample_times,
+            clip_model=CLIP_MODEL_NAME
+        )
+        with open(os.path.join(output_dir, ANALYSIS_FILENAME), 'w') as f:
+            json.dump({
+                "clip_model": CLIP_MODEL_NAME,
+                "scoring": "learned_head" if head is not None else "text_prompts",
+                "head_version": head["version"] if head is not None else None,
+                "sample_times": [round(float(t), 3) for t in sample_times],
+                "scores": [round(float(s), 4) for s in scores]
+            }, f, indent=2)
 
-    # Get the top N engaging moments
-    top_moments = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_n]
-    return top_moments
+    # Get the top N engaging moments, as the times the scored samples were taken
+    # (positions in the scores are sample indices, one per sampling step)
+    top_samples = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_n]
+    return [float(sample_times[i]) for i in top_samples]
 
 def frames_to_timestamps(frame_indices, video_path):
     """
@@ -1,17 +1,98 @@
 #backend/modules/insights.py
-import requests
+import os
 import json
+import datetime
+from jsonschema import Draft7Validator
+from modules.llm_client import DEFAULT_MODEL, generate_stream, run_concurrently
+from modules.llm_cache import cached_generation
+from modules.condense import condense_transcript
 
-def generate_insights(transcript):
+# Per-format creative requirements used in the prompts
+AD_FORMAT_DETAILS = {
+    "YouTube Ads": """
+        - Compelling headline (max 60 characters)
+        - Engaging description (max 90 characters)
+        - Call-to-action that drives clicks
+        """,
+    "Display Ads": """
+        - Short, attention-grabbing headline (max 30 characters)
+        - Visually descriptive text (max 90 characters)
+        - Clear call-to-action
+        """,
+    "Performance Max": """
+        - Conversion-focused headline (max 30 characters)
+        - Benefit-driven description (max 90 characters)
+        - Strong call-to-action that drives immediate response
+        """
+}
+
+DEFAULT_FORMAT_DETAILS = """
+        - Headline
+        - Description
+        - Call-to-action
+        """
+
+CREATIVE_TEXT_FIELDS = ("headline", "description", "call_to_action")
+
+# Character limits per ad format, matching the prompt details above
+CREATIVE_LIMITS = {
+    "YouTube Ads": {"headline": 60, "description": 90, "call_to_action": 40},
+    "Display Ads": {"headline": 30, "description": 90, "call_to_action": 40},
+    "Performance Max": {"headline": 30, "description": 90, "call_to_action": 40}
+}
+DEFAULT_CREATIVE_LIMITS = {"headline": 60, "description": 90, "call_to_action": 40}
+MAX_VIDEO_SNIPPETS = 5
+
+# How the server is asked for JSON: "schema" (structured outputs), "json" (JSON mode) or "off"
+STRUCTURED_OUTPUT = os.environ.get("LLM_STRUCTURED_OUTPUT", "schema")
+
+# Job artifacts used to generate insights on demand after a job has finished
+TRANSCRIPT_FILENAME = "transcript.txt"
+INSIGHTS_FILENAME = "insights.json"
+INSIGHTS_ERROR_MESSAGE = "Could not generate insights. Make sure Zephyr is running and accessible."
+
+def transcript_section(transcript, session=None):
+    """
+    Returns the transcript block for a prompt.
+    
+    With a prefilled LLMSession the transcript is already in the model context,
+    so the prompt only refers to it.
+    """
+    if session is not None:
+        return session.transcript_section()
+    return f"Transcript:\n    {transcript}"
+
+def session_generate(session, prompt, **kwargs):
+    """
+    Streams a generation through the session's reused context when there is one.
+    """
+    if session is not None:
+        return session.generate_stream(prompt, **kwargs)
+    return generate_stream(prompt, **kwargs)
+
+def cache_options(session, options=None):
+    """
+    Returns the cache-key options for a prompt, tied to the transcript when the
+    prompt itself only refers to it.
+    """
+    if session is not None and session.ready:
+        return session.cache_options(options)
+    return options
+
+def generate_insights(transcript, session=None):
     """
     Generates insights from the video transcript using Zephyr.
     
     Parameters:
     - transcript: The video transcript text
+    - session: Optional LLMSession whose prefilled context already holds the transcript
     
     Returns:
     - insights: Generated insights text
     """
+    # Long transcripts are condensed to the model's token budget
+    transcript = condense_transcript(transcript)
+
     prompt = f"""
     Analyze the following video transcript and generate insights:
     - Key themes
@@ -19,60 +100,104 @@ def generate_insights(transcript):
     - Audience engagement points
     - Content performance predictions
 
-    Transcript:
-    {transcript}
+    {transcript_section(transcript, session)}
     """
 
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "zephyr",
-                "prompt": prompt,
-                "stream": False
-            }
+        return cached_generation(
+            "insights", DEFAULT_MODEL, cache_options(session), prompt,
+            lambda: session_generate(session, prompt)["response"]
         )
-        return response.json()["response"]
     except Exception as e:
         print(f"Error generating insights: {e}")
-        return "Could not generate insights. Make sure Zephyr is running and accessible."
+        return INSIGHTS_ERROR_MESSAGE
+
+def save_transcript(transcript, output_dir):
+    """
+    Saves a job's transcript so insights can be generated for it later.
 
-def generate_ad_creatives(transcript, ad_format="YouTube Ads"):
+    Returns:
+    - Path to the saved transcript
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    transcript_path = os.path.join(output_dir, TRANSCRIPT_FILENAME)
+    with open(transcript_path, 'w', encoding='utf-8') as f:
+        f.write(transcript)
+    return transcript_path
+
+def load_insights(output_dir):
+    """
+    Loads previously generated insights from a job's output directory.
+
+    Returns:
+    - Insights dictionary, or None if they have not been generated
+    """
+    insights_path = os.path.join(output_dir, INSIGHTS_FILENAME)
+    if not os.path.exists(insights_path):
+        return None
+    with open(insights_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def load_or_generate_insights(output_dir, transcript=None, session=None, force=False, generate=None):
+    """
+    Returns a job's insights, generating and saving them on first request.
+
+    Insights are not produced by the main pipeline; they are computed lazily the
+    first time a consumer asks for them and stored as insights.json next to the
+    job's other outputs.
+
+    Parameters:
+    - output_dir: The job's output directory
+    - transcript: Optional transcript text (default: the job's saved transcript.txt)
+    - session: Optional LLMSession whose prefilled context already holds the transcript
+    - force: Regenerate even if insights were already saved
+    - generate: Optional callable returning the insights text (e.g. a pending future's result)
+
+    Returns:
+    - Dictionary with the insights text and when it was generated
+    """
+    if not force:
+        saved = load_insights(output_dir)
+        if saved is not None:
+            return saved
+
+    if generate is None and transcript is None:
+        transcript_path = os.path.join(output_dir, TRANSCRIPT_FILENAME)
+        if not os.path.exists(transcript_path):
+            raise FileNotFoundError(f"No transcript found at {transcript_path}")
+        with open(transcript_path, encoding='utf-8') as f:
+            transcript = f.read()
+
+    text = generate() if generate is not None else generate_insights(transcript, session)
+    insights = {
+        "insights": text,
+        "model": DEFAULT_MODEL,
+        "generation_time": datetime.datetime.now().isoformat(timespec="seconds")
+    }
+
+    # Failed generations are returned but not saved, so the next request retries
+    if text != INSIGHTS_ERROR_MESSAGE:
+        with open(os.path.join(output_dir, INSIGHTS_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(insights, f, indent=2)
+    return insights
+
+def generate_ad_creatives(transcript, ad_format="YouTube Ads", session=None):
     """
     Generates ad creatives (headlines, descriptions, and video snippets) using Zephyr.
     
     Parameters:
     - transcript: The video transcript text
     - ad_format: The target ad format (YouTube Ads, Display Ads, Performance Max)
+    - session: Optional LLMSession whose prefilled context already holds the transcript
     
     Returns:
     - ad_creatives: Generated ad creative text
     """
+    # Long transcripts are condensed to the model's token budget
+    transcript = condense_transcript(transcript)
+
     # Customize prompt based on ad format
-    if ad_format == "YouTube Ads":
-        prompt_details = """
-        - Compelling headline (max 60 characters)
-        - Engaging description (max 90 characters)
-        - Call-to-action that drives clicks
-        """
-    elif ad_format == "Display Ads":
-        prompt_details = """
-        - Short, attention-grabbing headline (max 30 characters)
-        - Visually descriptive text (max 90 characters)
-        - Clear call-to-action
-        """
-    elif ad_format == "Performance Max":
-        prompt_details = """
-        - Conversion-focused headline (max 30 characters)
-        - Benefit-driven description (max 90 characters)
-        - Strong call-to-action that drives immediate response
-        """
-    else:
-        prompt_details = """
-        - Headline
-        - Description
-        - Call-to-action
-        """
+    prompt_details = AD_FORMAT_DETAILS.get(ad_format, DEFAULT_FORMAT_DETAILS)
 
     prompt = f"""
     Generate ad creatives for the following video transcript:
@@ -80,8 +205,7 @@ def generate_ad_creatives(transcript, ad_format="YouTube Ads"):
     - Video snippet suggestions (what moments to highlight)
 
     Ad Format: {ad_format}
-    Transcript:
-    {transcript}
+    {transcript_section(transcript, session)}
     
     Format the response as JSON with the following structure:
     {{
@@ -92,29 +216,359 @@ def generate_ad_creatives(transcript, ad_format="YouTube Ads"):
     }}
     """
 
+    schema = creative_schema(ad_format)
+
+    outcome = {"used_fallback": False}
+
+    def request_creatives():
+        # Stream the response and stop as soon as a complete, schema-valid object arrives
+        result = session_generate(
+            session,
+            prompt,
+            stop_when=lambda obj: validate_creatives(obj, ad_format),
+            **structured_output_params(schema)
+        )
+        parsed = result["parsed"] or extract_json_object(result["response"])
+        creatives, outcome["used_fallback"] = finalize_creatives(parsed, transcript, ad_format, session=session)
+        return creatives
+
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "zephyr",
-                "prompt": prompt,
-                "stream": False
-            }
+        # Creatives padded with fallback fields are not cached, so a bad generation is retried next time
+        return cached_generation(
+            "creatives", DEFAULT_MODEL, cache_options(session, {"format": STRUCTURED_OUTPUT}), prompt,
+            request_creatives,
+            cache_if=lambda creatives: not outcome["used_fallback"]
         )
-        response_text = response.json()["response"]
-        
-        # Try to parse as JSON, but handle cases where the model doesn't return valid JSON
-        try:
-            creatives = json.loads(response_text)
-            return creatives
-        except json.JSONDecodeError:
-            # If not valid JSON, return the raw text
-            return {"raw_text": response_text}
-            
     except Exception as e:
         print(f"Error generating ad creatives: {e}")
-        return {
-            "headline": f"Engaging {ad_format} Content",
-            "description": "Discover what makes this content special",
-            "call_to_action": "Learn More"
-        }
\ No newline at end of file
+        return fallback_creatives(ad_format)
+
+def generate_ad_creatives_concurrently(transcript, ad_formats, session=None):
+    """
+    Generates ad creatives for several ad formats at once.
+    
+    Requests are dispatched on the shared LLM pool, which caps how many are in
+    flight against the server at the same time.
+    
+    Parameters:
+    - transcript: The video transcript text
+    - ad_formats: List of target ad formats
+    - session: Optional LLMSession whose prefilled context already holds the transcript
+    
+    Returns:
+    - Dictionary mapping each ad format to its creatives
+    """
+    return run_concurrently({
+        ad_format: (lambda ad_format=ad_format: generate_ad_creatives(transcript, ad_format=ad_format,
+                                                                      session=session))
+        for ad_format in ad_formats
+    })
+
+def creative_schema(ad_format):
+    """
+    Builds the JSON schema for one ad format's creatives, including its character limits.
+    
+    Parameters:
+    - ad_format: The target ad format
+    
+    Returns:
+    - JSON schema dict
+    """
+    limits = CREATIVE_LIMITS.get(ad_format, DEFAULT_CREATIVE_LIMITS)
+    properties = {
+        field: {"type": "string", "minLength": 1, "maxLength": limits[field]}
+        for field in CREATIVE_TEXT_FIELDS
+    }
+    properties["video_snippets"] = {
+        "type": "array",
+        "items": {"type": "string"},
+        "maxItems": MAX_VIDEO_SNIPPETS
+    }
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(CREATIVE_TEXT_FIELDS) + ["video_snippets"]
+    }
+
+def structured_output_params(schema):
+    """
+    Returns the /api/generate fields that constrain the response to a schema.
+    """
+    if STRUCTURED_OUTPUT == "schema":
+        return {"format": schema}
+    if STRUCTURED_OUTPUT == "json":
+        return {"format": "json"}
+    return {}
+
+def creative_errors(creatives, ad_format=None):
+    """
+    Lists the creative fields that fail the ad format's schema.
+    
+    Parameters:
+    - creatives: Parsed creative dict for one ad format
+    - ad_format: The target ad format (default limits if not given)
+    
+    Returns:
+    - Set of failing field names (contains None if the value is not an object at all)
+    """
+    if not isinstance(creatives, dict):
+        return {None}
+
+    schema = creative_schema(ad_format)
+    failing = {field for field in schema["required"] if field not in creatives}
+    for error in Draft7Validator(schema).iter_errors(creatives):
+        if error.absolute_path:
+            failing.add(error.absolute_path[0])
+    return failing
+
+def validate_creatives(creatives, ad_format=None):
+    """
+    Checks that a creative dict matches the ad format's schema.
+    
+    Parameters:
+    - creatives: Parsed creative dict for one ad format
+    - ad_format: The target ad format (default limits if not given)
+    
+    Returns:
+    - Boolean indicating whether the creatives are usable
+    """
+    return not creative_errors(creatives, ad_format)
+
+def trim_text(text, limit):
+    """
+    Shortens text to at most limit characters, cutting at a word boundary when possible.
+    """
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit + 1].rsplit(" ", 1)[0] if " " in text[:limit + 1] else text[:limit]
+    return cut[:limit].rstrip(" ,;:-")
+
+def repair_creatives(creatives, ad_format=None):
+    """
+    Fixes creative fields locally where possible.
+    
+    Text fields are coerced to strings and trimmed to the format's character
+    limits, and snippets are coerced to a short list of strings. Fields that are
+    missing or empty are left out so they can be regenerated.
+    
+    Returns:
+    - Repaired creative dict
+    """
+    limits = CREATIVE_LIMITS.get(ad_format, DEFAULT_CREATIVE_LIMITS)
+    repaired = {}
+
+    for field in CREATIVE_TEXT_FIELDS:
+        value = creatives.get(field)
+        if isinstance(value, (int, float)):
+            value = str(value)
+        if isinstance(value, str) and value.strip():
+            repaired[field] = trim_text(value.strip().strip('"'), limits[field])
+
+    snippets = creatives.get("video_snippets", [])
+    if isinstance(snippets, str):
+        snippets = [snippets]
+    if not isinstance(snippets, list):
+        snippets = []
+    repaired["video_snippets"] = [str(s).strip() for s in snippets if str(s).strip()][:MAX_VIDEO_SNIPPETS]
+
+    return repaired
+
+def regenerate_fields(transcript, ad_format, creatives, fields, session=None):
+    """
+    Re-prompts only the creative fields that failed validation.
+    
+    Parameters:
+    - transcript: The (condensed) video transcript text
+    - ad_format: The target ad format
+    - creatives: Creatives that passed validation so far
+    - fields: Field names to regenerate
+    - session: Optional LLMSession whose prefilled context already holds the transcript
+    
+    Returns:
+    - Dictionary with the regenerated fields (possibly incomplete)
+    """
+    limits = CREATIVE_LIMITS.get(ad_format, DEFAULT_CREATIVE_LIMITS)
+    full_schema = creative_schema(ad_format)
+    schema = {
+        "type": "object",
+        "properties": {field: full_schema["properties"][field] for field in fields},
+        "required": list(fields)
+    }
+    field_list = "\n".join(f"    - {field} (max {limits[field]} characters)" for field in fields)
+
+    prompt = f"""
+    These ad creatives for {ad_format} are missing some fields:
+    {json.dumps(creatives)}
+
+    Write only the following fields so they fit the existing creatives and the transcript:
+{field_list}
+
+    {transcript_section(transcript, session)}
+    
+    Respond with a JSON object containing only these fields.
+    """
+
+    try:
+        result = session_generate(
+            session,
+            prompt,
+            stop_when=lambda obj: isinstance(obj, dict) and all(f in obj for f in fields),
+            **structured_output_params(schema)
+        )
+        parsed = result["parsed"] or extract_json_object(result["response"]) or {}
+        return {field: parsed[field] for field in fields if field in parsed}
+    except Exception as e:
+        print(f"Error regenerating creative fields {list(fields)}: {e}")
+        return {}
+
+def fallback_creatives(ad_format):
+    """
+    Returns generic creatives used when the LLM cannot produce valid ones.
+    """
+    return {
+        "headline": trim_text(f"Engaging {ad_format} Content",
+                              CREATIVE_LIMITS.get(ad_format, DEFAULT_CREATIVE_LIMITS)["headline"]),
+        "description": "Discover what makes this content special",
+        "call_to_action": "Learn More",
+        "video_snippets": []
+    }
+
+def finalize_creatives(parsed, transcript, ad_format, session=None):
+    """
+    Turns a parsed model response into schema-valid creatives.
+    
+    The response is repaired locally first; only fields that are still invalid
+    are re-prompted, and anything the model still cannot produce is filled from
+    the generic fallback creatives.
+    
+    Returns:
+    - Tuple of (creative dict that passes validate_creatives, True if any field
+      came from the fallback creatives)
+    """
+    if not isinstance(parsed, dict):
+        parsed = {}
+
+    creatives = repair_creatives(parsed, ad_format)
+    failing = [field for field in CREATIVE_TEXT_FIELDS if field in creative_errors(creatives, ad_format)]
+
+    if failing:
+        print(f"Regenerating invalid {ad_format} creative fields: {failing}")
+        regenerated = repair_creatives({**creatives, **regenerate_fields(transcript, ad_format, creatives, failing,
+                                                                           session=session)},
+                                       ad_format)
+        creatives.update({field: regenerated[field] for field in failing if field in regenerated})
+
+    missing = [field for field in CREATIVE_TEXT_FIELDS if field not in creatives]
+    fallback = fallback_creatives(ad_format)
+    for field in missing:
+        creatives[field] = fallback[field]
+
+    return creatives, bool(missing)
+
+def extract_json_object(text):
+    """
+    Parses the outermost JSON object in a model response, ignoring surrounding prose.
+    
+    Returns:
+    - Parsed object, or None if no valid JSON object was found
+    """
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+
+def generate_ad_creatives_batch(transcript, ad_formats, session=None):
+    """
+    Generates ad creatives for every requested ad format in a single LLM call.
+    
+    The transcript is sent once and the model returns one JSON object keyed by
+    ad format. Invalid entries are repaired and only their failing fields are
+    re-prompted; formats missing from the response get individual per-format calls.
+    
+    Parameters:
+    - transcript: The video transcript text
+    - ad_formats: List of target ad formats
+    - session: Optional LLMSession whose prefilled context already holds the transcript
+    
+    Returns:
+    - Dictionary mapping each ad format to its creatives
+    """
+    # Long transcripts are condensed to the model's token budget
+    transcript = condense_transcript(transcript)
+
+    format_sections = "\n".join(
+        f"    {ad_format}:{AD_FORMAT_DETAILS.get(ad_format, DEFAULT_FORMAT_DETAILS)}"
+        f"    - Video snippet suggestions (what moments to highlight)\n"
+        for ad_format in ad_formats
+    )
+    example = {
+        ad_format: {
+            "headline": "Your headline here",
+            "description": "Your description here",
+            "call_to_action": "Your CTA here",
+            "video_snippets": ["Snippet 1", "Snippet 2"]
+        }
+        for ad_format in ad_formats
+    }
+
+    prompt = f"""
+    Generate ad creatives for each of the following ad formats from the video transcript.
+
+{format_sections}
+    {transcript_section(transcript, session)}
+    
+    Format the response as a single JSON object with one entry per ad format, using exactly these keys:
+    {json.dumps(example, indent=4)}
+    """
+
+    schema = {
+        "type": "object",
+        "properties": {ad_format: creative_schema(ad_format) for ad_format in ad_formats},
+        "required": list(ad_formats)
+    }
+
+    def all_formats_valid(obj):
+        return isinstance(obj, dict) and all(validate_creatives(obj.get(f), f) for f in ad_formats)
+
+    outcome = {"used_fallback": False}
+
+    def request_batch():
+        result = session_generate(session, prompt, stop_when=all_formats_valid,
+                                  **structured_output_params(schema))
+        parsed = result["parsed"] or extract_json_object(result["response"]) or {}
+
+        # Entries that came back at all are repaired field by field
+        finalized = {}
+        for ad_format in ad_formats:
+            if isinstance(parsed.get(ad_format), dict):
+                finalized[ad_format], used_fallback = finalize_creatives(parsed[ad_format], transcript, ad_format,
+                                                                         session=session)
+                outcome["used_fallback"] = outcome["used_fallback"] or used_fallback
+        return finalized
+
+    results = {}
+    try:
+        # Cached only when every format came back without fallback fields
+        finalized = cached_generation(
+            "creatives_batch", DEFAULT_MODEL, cache_options(session, {"format": STRUCTURED_OUTPUT}), prompt,
+            request_batch,
+            cache_if=lambda finalized: len(finalized) == len(ad_formats) and not outcome["used_fallback"]
+        )
+        results = {ad_format: finalized[ad_format] for ad_format in ad_formats
+                   if isinstance(finalized.get(ad_format), dict)}
+    except Exception as e:
+        print(f"Error generating batched ad creatives: {e}")
+
+    # Only formats with no usable entry are regenerated with their own call
+
+    failed = [ad_format for ad_format in ad_formats if ad_format not in results]
+    if failed:
+        print(f"Batched creatives missing for {failed}, falling back to per-format calls")
+        results.update(generate_ad_creatives_concurrently(transcript, failed, session=session))
+
+    return results
\ No newline at end of file
@@ -0,0 +1,210 @@
+#backend/modules/llm_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from modules.llm_dispatch import Coalescer
+
+# Cache settings (override with environment variables)
+CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "llm_cache.sqlite")
+)
+CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))  # seconds
+CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_BYPASS = os.environ.get("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "time_saved": 0.0}
+
+def configure_cache(path=None, ttl=None, max_bytes=None, bypass=None):
+    """
+    Overrides the cache settings at runtime.
+
+    Parameters:
+    - path: SQLite database path
+    - ttl: Seconds before an entry expires
+    - max_bytes: Size bound of all stored values; least recently used entries are evicted first
+    - bypass: When True, neither read from nor write to the cache
+    """
+    global CACHE_PATH, CACHE_TTL, CACHE_MAX_BYTES, CACHE_BYPASS
+
+    if path:
+        CACHE_PATH = path
+    if ttl is not None:
+        CACHE_TTL = float(ttl)
+    if max_bytes is not None:
+        CACHE_MAX_BYTES = int(max_bytes)
+    if bypass is not None:
+        CACHE_BYPASS = bool(bypass)
+
+def _connect():
+    os.makedirs(os.path.dirname(os.path.abspath(CACHE_PATH)), exist_ok=True)
+    conn = sqlite3.connect(CACHE_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses ("
+        " key TEXT PRIMARY KEY,"
+        " value TEXT NOT NULL,"
+        " size INTEGER NOT NULL,"
+        " generation_time REAL NOT NULL,"
+        " created_at REAL NOT NULL,"
+        " last_access REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+    return conn
+
+def make_key(model, options, prompt, kind=""):
+    """
+    Builds the cache key for one generation.
+
+    Parameters:
+    - model: Model name
+    - options: Model options dict (or None)
+    - prompt: Full prompt text
+    - kind: Namespace for how the response is parsed (e.g. "insights", "creatives")
+
+    Returns:
+    - Hex digest string
+    """
+    material = json.dumps({
+        "kind": kind,
+        "model": model,
+        "options": options or {},
+        "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def cache_get(key):
+    """
+    Looks up a cached value, refreshing its LRU position.
+
+    Returns:
+    - (value, generation_time) tuple, or (None, None) on a miss
+    """
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT value, generation_time, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            if now - row[2] > CACHE_TTL:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                return None, None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return json.loads(row[0]), row[1]
+        finally:
+            conn.close()
+
+def cache_put(key, value, generation_time):
+    """
+    Stores a parsed value and evicts expired and least recently used entries.
+    """
+    now = time.time()
+    data = json.dumps(value)
+    with _lock:
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, generation_time, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, data, len(data), generation_time, now, now)
+            )
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - CACHE_TTL,))
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > CACHE_MAX_BYTES:
+                for old_key, size in conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access ASC"
+                ).fetchall():
+                    if total <= CACHE_MAX_BYTES:
+                        break
+                    conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= size
+            conn.commit()
+        finally:
+            conn.close()
+
+def cached_generation(kind, model, options, prompt, compute, cache_if=None):
+    """
+    Returns a cached parsed result for a prompt, computing and storing it on a miss.
+
+    Identical prompts already being generated by another job or thread are not
+    sent again: the caller waits for that generation and reads its stored result.
+
+    Parameters:
+    - kind: Namespace for how the response is parsed
+    - model: Model name
+    - options: Model options dict (or None)
+    - prompt: Full prompt text
+    - compute: Zero-argument callable producing the parsed result
+    - cache_if: Optional predicate; results it rejects are returned but not stored
+
+    Returns:
+    - Parsed result
+    """
+    if CACHE_BYPASS:
+        return compute()
+
+    key = make_key(model, options, prompt, kind)
+    try:
+        value, generation_time = cache_get(key)
+    except sqlite3.Error as e:
+        print(f"LLM cache unavailable: {e}")
+        return compute()
+
+    if value is not None:
+        return _record_hit(value, generation_time)
+
+    with Coalescer(key) as inflight:
+        if inflight.waited:
+            try:
+                value, generation_time = cache_get(key)
+            except sqlite3.Error:
+                value = None
+            if value is not None:
+                return _record_hit(value, generation_time)
+
+        started = time.time()
+        value = compute()
+        generation_time = time.time() - started
+        with _lock:
+            _stats["misses"] += 1
+
+        if cache_if is None or cache_if(value):
+            try:
+                cache_put(key, value, generation_time)
+            except sqlite3.Error as e:
+                print(f"Could not store LLM response in cache: {e}")
+
+    return value
+
+def _record_hit(value, generation_time):
+    with _lock:
+        _stats["hits"] += 1
+        _stats["time_saved"] += generation_time
+    return value
+
+def get_cache_stats(reset=False):
+    """
+    Returns hit/miss counts and the generation time saved by cache hits in this process.
+    """
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        stats = {
+            "bypassed": CACHE_BYPASS,
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else None,
+            "time_saved": round(_stats["time_saved"], 2)
+        }
+        if reset:
+            _stats.update({"hits": 0, "misses": 0, "time_saved": 0.0})
+    return stats
@@ -0,0 +1,407 @@
+#backend/modules/llm_client.py
+import os
+import json
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from modules import llm_health
+from modules.llm_dispatch import GlobalSlot
+
+# Connection settings for the local Ollama server (override with environment variables)
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+DEFAULT_MODEL = os.environ.get("LLM_MODEL", "zephyr")
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", 300))
+MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", 2))
+# Total seconds a request may take, including waiting for a slot and streaming the response
+REQUEST_DEADLINE = float(os.environ.get("LLM_REQUEST_DEADLINE", 600))
+# How long the server keeps the model loaded after a request, so it stays resident between jobs
+KEEP_ALIVE = os.environ.get("LLM_KEEP_ALIVE", "30m")
+
+# Worker threads for dispatching LLM work; the in-flight semaphore does the throttling
+_EXECUTOR_WORKERS = 16
+
+_lock = threading.Lock()
+_session = None
+_executor = None
+_in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+_metrics = []
+
+def configure(base_url=None, max_in_flight=None, connect_timeout=None, read_timeout=None, deadline=None):
+    """
+    Overrides the client settings at runtime.
+
+    Parameters:
+    - base_url: Base URL of the Ollama server
+    - max_in_flight: Maximum number of concurrent requests sent to the server
+    - connect_timeout: Seconds to wait for a connection
+    - read_timeout: Seconds to wait between bytes of the response
+    - deadline: Total seconds a request may take before it is abandoned
+    """
+    global OLLAMA_URL, MAX_IN_FLIGHT, CONNECT_TIMEOUT, READ_TIMEOUT, REQUEST_DEADLINE, _session, _in_flight
+
+    with _lock:
+        if base_url:
+            OLLAMA_URL = base_url.rstrip("/")
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = float(connect_timeout)
+        if read_timeout is not None:
+            READ_TIMEOUT = float(read_timeout)
+        if deadline is not None:
+            REQUEST_DEADLINE = float(deadline)
+        if max_in_flight is not None and int(max_in_flight) != MAX_IN_FLIGHT:
+            MAX_IN_FLIGHT = max(1, int(max_in_flight))
+            _in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+            # Rebuild the session so the pool matches the new limit
+            if _session is not None:
+                _session.close()
+                _session = None
+
+def get_session():
+    """
+    Returns the shared keep-alive session, creating it on first use.
+    """
+    global _session
+
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_IN_FLIGHT)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+def submit(fn, *args, **kwargs):
+    """
+    Runs a function on the shared LLM dispatch pool.
+
+    Returns:
+    - concurrent.futures.Future for the result
+    """
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_EXECUTOR_WORKERS, thread_name_prefix="llm")
+    return _executor.submit(fn, *args, **kwargs)
+
+def check_health():
+    """
+    Probes the LLM server; an unreachable server opens the circuit breaker.
+
+    Returns:
+    - Boolean indicating whether the server is healthy
+    """
+    return llm_health.probe(OLLAMA_URL)
+
+def is_backend_failure(error):
+    """
+    Returns True for errors that indicate the LLM server is down or stalled.
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, TimeoutError)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+class _Guarded:
+    """
+    Holds an in-flight slot for one request and reports its outcome to the circuit breaker.
+
+    The per-process semaphore limits this job's requests; the global slot from
+    llm_dispatch limits requests across all job processes on the machine.
+    """
+
+    def __init__(self, deadline, timeout):
+        self.deadline = time.time() + (deadline or REQUEST_DEADLINE)
+        self.timeout = timeout
+        self.slots = _in_flight
+
+    def remaining(self):
+        return self.deadline - time.time()
+
+    def request_timeout(self):
+        """
+        Returns the (connect, read) timeout, capped by the time left before the deadline.
+        """
+        if self.timeout:
+            return self.timeout
+        return (CONNECT_TIMEOUT, max(0.1, min(READ_TIMEOUT, self.remaining())))
+
+    def check_deadline(self):
+        if self.remaining() <= 0:
+            raise TimeoutError("LLM request exceeded its deadline")
+
+    def __enter__(self):
+        # Fail fast while the circuit is open instead of queueing behind stalled requests
+        llm_health.before_request()
+        if not self.slots.acquire(timeout=max(0, self.remaining())):
+            raise TimeoutError("Timed out waiting for an LLM request slot")
+        self.global_slot = GlobalSlot(timeout=max(0, self.remaining()))
+        try:
+            self.global_slot.acquire()
+            llm_health.claim_trial()
+        except BaseException:
+            self.global_slot.release()
+            self.slots.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.global_slot.release()
+        self.slots.release()
+        if exc is not None and is_backend_failure(exc):
+            llm_health.record_failure(exc)
+        else:
+            # The server answered, even if the response was unusable
+            llm_health.record_success()
+        return False
+
+def generate(prompt, model=None, options=None, timeout=None, deadline=None, **extra):
+    """
+    Sends a non-streaming request to /api/generate.
+
+    Parameters:
+    - prompt: Prompt text
+    - model: Model name (default: LLM_MODEL or "zephyr")
+    - options: Optional Ollama model options (temperature, num_predict, ...)
+    - timeout: Optional (connect, read) timeout tuple or single number of seconds
+    - deadline: Optional total seconds for the request (default: LLM_REQUEST_DEADLINE)
+    - extra: Any other /api/generate fields (format, context, keep_alive, ...)
+
+    Returns:
+    - Parsed JSON body of the response
+
+    Raises:
+    - llm_health.CircuitOpenError immediately while the server is considered down
+    """
+    payload = {
+        "model": model or DEFAULT_MODEL,
+        "prompt": prompt,
+        "stream": False
+    }
+    if options:
+        payload["options"] = options
+    payload["keep_alive"] = KEEP_ALIVE
+    payload.update(extra)
+
+    started = time.time()
+    with _Guarded(deadline, timeout) as guard:
+        response = get_session().post(
+            f"{OLLAMA_URL}/api/generate",
+            json=payload,
+            timeout=guard.request_timeout()
+        )
+        response.raise_for_status()
+    body = response.json()
+    record_metric({
+        "model": payload["model"],
+        "stream": False,
+        "total_latency": time.time() - started,
+        "ttft": None,
+        "stopped_early": False,
+        "eval_count": body.get("eval_count"),
+        "prompt_eval_count": body.get("prompt_eval_count")
+    })
+    return body
+
+class JsonObjectScanner:
+    """
+    Incrementally finds complete top-level JSON objects in streamed text.
+
+    Only the newly fed characters are scanned on each call, so the cost over a
+    whole stream is linear in its length.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_start = None
+
+    def feed(self, text):
+        """
+        Adds streamed text and returns a list of newly completed object strings.
+        """
+        completed = []
+        offset = len(self.buffer)
+        self.buffer += text
+
+        for i, char in enumerate(text, start=offset):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.depth > 0:
+                    self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.object_start = i
+                self.depth += 1
+            elif char == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    completed.append(self.buffer[self.object_start:i + 1])
+                    self.object_start = None
+
+        return completed
+
+def generate_stream(prompt, model=None, options=None, timeout=None, stop_when=None, deadline=None, **extra):
+    """
+    Streams a response from /api/generate, optionally stopping early.
+
+    The NDJSON stream is parsed as it arrives. When stop_when is given, every
+    complete JSON object in the response text is parsed and passed to it; the
+    first object it accepts ends the request, which closes the connection so the
+    server stops generating.
+
+    Parameters:
+    - prompt: Prompt text
+    - model: Model name (default: LLM_MODEL or "zephyr")
+    - options: Optional Ollama model options
+    - timeout: Optional (connect, read) timeout tuple or single number of seconds
+    - stop_when: Optional callable taking a parsed JSON object and returning True to stop
+    - deadline: Optional total seconds for the request (default: LLM_REQUEST_DEADLINE);
+      a stream still running at the deadline is abandoned
+    - extra: Any other /api/generate fields (format, context, keep_alive, ...)
+
+    Returns:
+    - Dictionary with 'response' text, 'parsed' object (if stopped early), 'metrics',
+      and the server's final statistics when the stream completed
+
+    Raises:
+    - llm_health.CircuitOpenError immediately while the server is considered down
+    """
+    payload = {
+        "model": model or DEFAULT_MODEL,
+        "prompt": prompt,
+        "stream": True
+    }
+    if options:
+        payload["options"] = options
+    payload["keep_alive"] = KEEP_ALIVE
+    payload.update(extra)
+
+    started = time.time()
+    first_token_at = None
+    chunks = []
+    parsed = None
+    final = {}
+    scanner = JsonObjectScanner() if stop_when else None
+
+    with _Guarded(deadline, timeout) as guard:
+        response = get_session().post(
+            f"{OLLAMA_URL}/api/generate",
+            json=payload,
+            timeout=guard.request_timeout(),
+            stream=True
+        )
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                guard.check_deadline()
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise RuntimeError(f"LLM server error: {message['error']}")
+
+                text = message.get("response", "")
+                if text:
+                    if first_token_at is None:
+                        first_token_at = time.time()
+                    chunks.append(text)
+
+                    if scanner:
+                        for candidate in scanner.feed(text):
+                            try:
+                                obj = json.loads(candidate)
+                            except json.JSONDecodeError:
+                                continue
+                            if stop_when(obj):
+                                parsed = obj
+                                break
+                        if parsed is not None:
+                            break
+
+                if message.get("done"):
+                    final = message
+                    break
+        finally:
+            response.close()
+
+    metrics = {
+        "model": payload["model"],
+        "stream": True,
+        "total_latency": time.time() - started,
+        "ttft": first_token_at - started if first_token_at else None,
+        "stopped_early": parsed is not None,
+        "eval_count": final.get("eval_count", len(chunks)),
+        "prompt_eval_count": final.get("prompt_eval_count")
+    }
+    record_metric(metrics)
+
+    result = dict(final)
+    result.update({"response": "".join(chunks), "parsed": parsed, "metrics": metrics})
+    return result
+
+def record_metric(metric):
+    """
+    Records the latency metrics of one LLM call.
+    """
+    with _lock:
+        _metrics.append(metric)
+
+def get_metrics_summary(reset=False):
+    """
+    Summarises the recorded LLM call metrics.
+
+    Parameters:
+    - reset: Clear the recorded metrics after summarising
+
+    Returns:
+    - Dictionary with call counts and latency statistics in seconds
+    """
+    with _lock:
+        metrics = list(_metrics)
+        if reset:
+            _metrics.clear()
+
+    if not metrics:
+        return {"calls": 0}
+
+    def mean(values):
+        return round(sum(values) / len(values), 3) if values else None
+
+    latencies = [m["total_latency"] for m in metrics]
+    ttfts = [m["ttft"] for m in metrics if m["ttft"] is not None]
+    return {
+        "calls": len(metrics),
+        "streamed_calls": sum(1 for m in metrics if m["stream"]),
+        "stopped_early": sum(1 for m in metrics if m["stopped_early"]),
+        "mean_latency": mean(latencies),
+        "max_latency": round(max(latencies), 3),
+        "mean_ttft": mean(ttfts),
+        "max_ttft": round(max(ttfts), 3) if ttfts else None
+    }
+
+def run_concurrently(tasks):
+    """
+    Runs several LLM-bound callables at once on the dispatch pool.
+
+    Parameters:
+    - tasks: Dictionary mapping a key to a zero-argument callable
+
+    Returns:
+    - Dictionary mapping each key to its callable's result
+    """
+    futures = {key: submit(task) for key, task in tasks.items()}
+    return {key: future.result() for key, future in futures.items()}
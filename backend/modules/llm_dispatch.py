@@ -0,0 +1,221 @@
+#backend/modules/llm_dispatch.py
+import os
+import json
+import time
+import threading
+import itertools
+import psutil
+from filelock import FileLock, Timeout
+
+# Shared dispatcher settings (override with environment variables).
+# Every job process on the machine coordinates through files in DISPATCH_DIR.
+DISPATCH_DIR = os.environ.get(
+    "LLM_DISPATCH_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "llm_dispatch")
+)
+# Requests in flight across all jobs; match the server's parallel slots (OLLAMA_NUM_PARALLEL)
+GLOBAL_IN_FLIGHT = int(os.environ.get("LLM_GLOBAL_IN_FLIGHT", 2))
+DISPATCH_ENABLED = os.environ.get("LLM_DISPATCH", "1").lower() not in ("0", "false", "no")
+POLL_INTERVAL = 0.05  # seconds between checks while waiting for a slot
+
+_lock = threading.Lock()
+_job_id = f"pid-{os.getpid()}"
+_tickets = itertools.count()
+_stats = {"granted": 0, "waited": 0, "wait_seconds": 0.0, "max_wait": 0.0, "coalesced": 0}
+
+def configure_dispatcher(job_id=None, global_in_flight=None, directory=None, enabled=None):
+    """
+    Overrides the dispatcher settings at runtime.
+
+    Parameters:
+    - job_id: Identifier used to share slots fairly between jobs (default: the process id)
+    - global_in_flight: Maximum requests in flight across all job processes
+    - directory: Shared directory holding the queue and lock files
+    - enabled: When False, only the per-process limit in llm_client applies
+    """
+    global _job_id, GLOBAL_IN_FLIGHT, DISPATCH_DIR, DISPATCH_ENABLED
+
+    if job_id:
+        _job_id = str(job_id)
+    if global_in_flight is not None:
+        GLOBAL_IN_FLIGHT = max(1, int(global_in_flight))
+    if directory:
+        DISPATCH_DIR = directory
+    if enabled is not None:
+        DISPATCH_ENABLED = bool(enabled)
+
+def _queue_lock():
+    os.makedirs(DISPATCH_DIR, exist_ok=True)
+    return FileLock(os.path.join(DISPATCH_DIR, "queue.lock"))
+
+def _load_queue():
+    path = os.path.join(DISPATCH_DIR, "queue.json")
+    try:
+        with open(path) as f:
+            queue = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        queue = {}
+    queue.setdefault("waiting", [])
+    queue.setdefault("active", [])
+
+    # Entries left behind by crashed job processes would hold slots forever
+    for name in ("waiting", "active"):
+        queue[name] = [entry for entry in queue[name] if psutil.pid_exists(entry["pid"])]
+    return queue
+
+def _save_queue(queue):
+    path = os.path.join(DISPATCH_DIR, "queue.json")
+    with open(path + ".tmp", 'w') as f:
+        json.dump(queue, f)
+    os.replace(path + ".tmp", path)
+
+def _next_tickets(queue, free_slots):
+    """
+    Picks the waiting tickets to start, interleaving jobs fairly.
+
+    A job with fewer requests in flight goes first; ties go to the oldest ticket,
+    so one job's burst cannot starve the others.
+    """
+    in_flight = {}
+    for entry in queue["active"]:
+        in_flight[entry["job"]] = in_flight.get(entry["job"], 0) + 1
+
+    chosen = []
+    waiting = sorted(queue["waiting"], key=lambda entry: entry["queued_at"])
+    for _ in range(free_slots):
+        if not waiting:
+            break
+        entry = min(waiting, key=lambda e: (in_flight.get(e["job"], 0), e["queued_at"]))
+        waiting.remove(entry)
+        in_flight[entry["job"]] = in_flight.get(entry["job"], 0) + 1
+        chosen.append(entry["ticket"])
+    return chosen
+
+class GlobalSlot:
+    """
+    Holds one of the machine-wide LLM request slots.
+
+    Waiting requests from all job processes are queued in a shared JSON file
+    guarded by a file lock; a slot is granted when fewer than GLOBAL_IN_FLIGHT
+    requests are active and the ticket is next in the fair order.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.ticket = f"{os.getpid()}-{threading.get_ident()}-{next(_tickets)}"
+        self.acquired = False
+
+    def acquire(self):
+        if not DISPATCH_ENABLED:
+            return self
+
+        started = time.time()
+        entry = {"ticket": self.ticket, "job": _job_id, "pid": os.getpid(), "queued_at": started}
+        lock = _queue_lock()
+
+        try:
+            while True:
+                with lock:
+                    queue = _load_queue()
+                    queued = any(e["ticket"] == self.ticket for e in queue["waiting"])
+                    if not queued:
+                        queue["waiting"].append(entry)
+
+                    free_slots = GLOBAL_IN_FLIGHT - len(queue["active"])
+                    if free_slots > 0 and self.ticket in _next_tickets(queue, free_slots):
+                        queue["waiting"] = [e for e in queue["waiting"] if e["ticket"] != self.ticket]
+                        queue["active"].append({**entry, "started_at": time.time()})
+                        _save_queue(queue)
+                        self.acquired = True
+                        break
+                    if not queued:
+                        _save_queue(queue)
+
+                if self.timeout is not None and time.time() - started >= self.timeout:
+                    raise TimeoutError("Timed out waiting for a global LLM request slot")
+                time.sleep(POLL_INTERVAL)
+        except BaseException:
+            self._remove("waiting")
+            raise
+
+        waited = time.time() - started
+        with _lock:
+            _stats["granted"] += 1
+            if waited > POLL_INTERVAL:
+                _stats["waited"] += 1
+            _stats["wait_seconds"] += waited
+            _stats["max_wait"] = max(_stats["max_wait"], waited)
+        return self
+
+    def _remove(self, name):
+        with _queue_lock():
+            queue = _load_queue()
+            queue[name] = [e for e in queue[name] if e["ticket"] != self.ticket]
+            _save_queue(queue)
+
+    def release(self):
+        if self.acquired:
+            self._remove("active")
+            self.acquired = False
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+class Coalescer:
+    """
+    Lets one process compute a prompt while identical requests elsewhere wait.
+
+    The first caller for a key takes its in-flight lock and generates; callers
+    that find the lock taken wait for it and then read the stored result from
+    the shared LLM cache instead of sending the same prompt again.
+    """
+
+    def __init__(self, key, timeout=None):
+        os.makedirs(os.path.join(DISPATCH_DIR, "inflight"), exist_ok=True)
+        self.lock = FileLock(os.path.join(DISPATCH_DIR, "inflight", f"{key}.lock"))
+        self.timeout = timeout
+        self.waited = False
+
+    def __enter__(self):
+        if not DISPATCH_ENABLED:
+            return self
+        try:
+            self.lock.acquire(timeout=0)
+        except Timeout:
+            self.waited = True
+            with _lock:
+                _stats["coalesced"] += 1
+            try:
+                self.lock.acquire(timeout=-1 if self.timeout is None else self.timeout)
+            except Timeout:
+                # The other request is taking too long; generate independently
+                return self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.lock.is_locked:
+            self.lock.release()
+        return False
+
+def get_dispatch_stats(reset=False):
+    """
+    Returns slot wait and coalescing statistics for this process.
+    """
+    with _lock:
+        stats = {
+            "enabled": DISPATCH_ENABLED,
+            "job_id": _job_id,
+            "global_in_flight": GLOBAL_IN_FLIGHT,
+            "granted": _stats["granted"],
+            "waited": _stats["waited"],
+            "mean_wait": round(_stats["wait_seconds"] / _stats["granted"], 3) if _stats["granted"] else None,
+            "max_wait": round(_stats["max_wait"], 3),
+            "coalesced": _stats["coalesced"]
+        }
+        if reset:
+            _stats.update({"granted": 0, "waited": 0, "wait_seconds": 0.0, "max_wait": 0.0, "coalesced": 0})
+    return stats
@@ -0,0 +1,173 @@
+#backend/modules/llm_health.py
+import os
+import time
+import threading
+import requests
+
+# Circuit breaker settings (override with environment variables)
+FAILURE_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAILURES", 3))     # consecutive failures before opening
+RESET_TIMEOUT = float(os.environ.get("LLM_BREAKER_RESET", 30))         # seconds open before a trial request
+PROBE_TIMEOUT = float(os.environ.get("LLM_PROBE_TIMEOUT", 2))          # seconds for a /api/tags health probe
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of sending a request while the LLM backend is considered down.
+    """
+
+_lock = threading.Lock()
+_state = {
+    "state": CLOSED,
+    "consecutive_failures": 0,
+    "opened_at": None,
+    "trial_in_flight": False,
+    "last_error": None,
+    "last_probe": None
+}
+_stats = {"failures": 0, "successes": 0, "rejected": 0, "times_opened": 0, "probes": 0}
+
+def configure_breaker(failure_threshold=None, reset_timeout=None, probe_timeout=None):
+    """
+    Overrides the circuit breaker settings at runtime.
+
+    Parameters:
+    - failure_threshold: Consecutive failures that open the circuit
+    - reset_timeout: Seconds the circuit stays open before a half-open trial request
+    - probe_timeout: Seconds to wait for a health probe
+    """
+    global FAILURE_THRESHOLD, RESET_TIMEOUT, PROBE_TIMEOUT
+
+    if failure_threshold is not None:
+        FAILURE_THRESHOLD = max(1, int(failure_threshold))
+    if reset_timeout is not None:
+        RESET_TIMEOUT = float(reset_timeout)
+    if probe_timeout is not None:
+        PROBE_TIMEOUT = float(probe_timeout)
+
+def _open(error):
+    if _state["state"] != OPEN:
+        _stats["times_opened"] += 1
+        print(f"LLM circuit opened, using fallbacks for {RESET_TIMEOUT:.0f} seconds: {error}")
+    _state.update(state=OPEN, opened_at=time.time(), trial_in_flight=False, last_error=str(error))
+
+def _reject():
+    _stats["rejected"] += 1
+    raise CircuitOpenError(f"LLM backend unavailable ({_state['last_error']})")
+
+def before_request():
+    """
+    Checks whether a request may be sent to the LLM backend, without waiting for a slot.
+
+    While the circuit is open requests are rejected immediately. Once the reset
+    timeout has passed the circuit goes half-open and a request may go on to
+    claim the single trial with claim_trial.
+
+    Raises:
+    - CircuitOpenError when the request must not be sent
+    """
+    with _lock:
+        if _state["state"] == OPEN and time.time() - _state["opened_at"] >= RESET_TIMEOUT:
+            _state["state"] = HALF_OPEN
+
+        if _state["state"] == CLOSED:
+            return
+        if _state["state"] == HALF_OPEN and not _state["trial_in_flight"]:
+            return
+        _reject()
+
+def claim_trial():
+    """
+    Claims the half-open trial request, once the caller holds its request slot.
+
+    The trial's outcome closes or re-opens the circuit. A closed circuit needs
+    no claim.
+
+    Raises:
+    - CircuitOpenError when the circuit is open or another request holds the trial
+    """
+    with _lock:
+        if _state["state"] == CLOSED:
+            return
+        if _state["state"] == HALF_OPEN and not _state["trial_in_flight"]:
+            _state["trial_in_flight"] = True
+            return
+        _reject()
+
+def record_success():
+    """
+    Records a successful request; a half-open circuit closes again.
+    """
+    with _lock:
+        _stats["successes"] += 1
+        _state["consecutive_failures"] = 0
+        if _state["state"] != CLOSED:
+            print("LLM circuit closed, backend recovered")
+        _state.update(state=CLOSED, opened_at=None, trial_in_flight=False)
+
+def record_failure(error):
+    """
+    Records a failed request (connection error, timeout or server error).
+    """
+    with _lock:
+        _stats["failures"] += 1
+        _state["consecutive_failures"] += 1
+        _state["last_error"] = str(error)
+        if _state["state"] == HALF_OPEN or _state["consecutive_failures"] >= FAILURE_THRESHOLD:
+            _open(error)
+
+def probe(base_url):
+    """
+    Checks that the backend answers /api/tags within the probe timeout.
+
+    A failed probe opens the circuit right away, so a job started while the
+    server is down uses fallbacks without waiting on any generation request.
+
+    Returns:
+    - Boolean indicating whether the backend is healthy
+    """
+    started = time.time()
+    try:
+        response = requests.get(f"{base_url}/api/tags", timeout=PROBE_TIMEOUT)
+        response.raise_for_status()
+        healthy, error = True, None
+    except requests.RequestException as e:
+        healthy, error = False, e
+
+    with _lock:
+        _stats["probes"] += 1
+        _state["last_probe"] = {
+            "healthy": healthy,
+            "latency": round(time.time() - started, 3),
+            "at": round(started, 3)
+        }
+        if healthy:
+            if _state["state"] == OPEN:
+                # Let the next request through as a trial instead of waiting out the reset timeout
+                _state.update(state=HALF_OPEN, trial_in_flight=False)
+        else:
+            _state["last_error"] = str(error)
+            _open(error)
+    return healthy
+
+def get_breaker_state():
+    """
+    Returns the current circuit state: "closed", "open" or "half_open".
+    """
+    with _lock:
+        return _state["state"]
+
+def get_breaker_stats():
+    """
+    Returns the circuit state and counters for job metrics.
+    """
+    with _lock:
+        return {
+            "state": _state["state"],
+            "consecutive_failures": _state["consecutive_failures"],
+            "last_error": _state["last_error"],
+            "last_probe": _state["last_probe"],
+            **_stats
+        }
@@ -0,0 +1,91 @@
+#backend/modules/llm_pipeline.py
+import os
+import asyncio
+import threading
+from modules.condense import condense_transcript
+from modules.insights import generate_insights, generate_ad_creatives_batch
+from modules.llm_session import LLMSession
+from modules.llm_client import check_health
+
+# Prefill the transcript once and reuse the server's context for every prompt
+REUSE_CONTEXT = os.environ.get("LLM_REUSE_CONTEXT", "1").lower() not in ("0", "false", "no")
+
+class LLMPipeline:
+    """
+    Runs a job's LLM work on a background asyncio event loop.
+
+    Requests are started as soon as the transcript exists and the results are
+    exposed as concurrent.futures.Future objects, so the rendering code on the
+    main thread only blocks on them when it actually needs the text.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="llm-pipeline", daemon=True)
+        self.thread.start()
+        self.session = None
+
+    def submit(self, coro):
+        """
+        Schedules a coroutine on the pipeline loop.
+
+        Returns:
+        - concurrent.futures.Future for the coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def start(self, transcript, ad_formats, with_insights=True):
+        """
+        Starts insights and creative generation for a transcript.
+
+        Parameters:
+        - transcript: The video transcript text
+        - ad_formats: List of target ad formats
+        - with_insights: Whether to generate insights as well
+
+        Returns:
+        - Dictionary with an 'insights' future (or None) and a 'creatives' dict
+          mapping each ad format to a future for its creatives
+        """
+        async def prepare():
+            # An unreachable server opens the circuit, so every request below falls back at once
+            await asyncio.to_thread(check_health)
+            text = await asyncio.to_thread(condense_transcript, transcript)
+            if not REUSE_CONTEXT:
+                return text, None
+            self.session = LLMSession(text)
+            await asyncio.to_thread(self.session.prefill)
+            return text, self.session
+
+        prepared = self.submit(prepare())
+
+        async def all_creatives():
+            text, session = await asyncio.wrap_future(prepared)
+            return await asyncio.to_thread(generate_ad_creatives_batch, text, ad_formats, session)
+
+        async def insights():
+            text, session = await asyncio.wrap_future(prepared)
+            return await asyncio.to_thread(generate_insights, text, session)
+
+        batch = self.submit(all_creatives())
+
+        async def creatives_for(ad_format):
+            return (await asyncio.wrap_future(batch))[ad_format]
+
+        return {
+            "insights": self.submit(insights()) if with_insights else None,
+            "creatives": {ad_format: self.submit(creatives_for(ad_format)) for ad_format in ad_formats}
+        }
+
+    def session_stats(self):
+        """
+        Returns the context-reuse statistics of the job's LLM session, if any.
+        """
+        return self.session.stats() if self.session is not None else None
+
+    def close(self):
+        """
+        Stops the event loop once pending callbacks have run.
+        """
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
@@ -0,0 +1,120 @@
+#backend/modules/llm_session.py
+import hashlib
+import threading
+from modules.llm_client import DEFAULT_MODEL, generate, generate_stream
+
+PREFILL_PROMPT = """
+    You will be asked several questions about the following video transcript.
+    Read it carefully and reply only with "OK".
+
+    Transcript:
+    {transcript}
+    """
+
+# How follow-up prompts refer to the transcript once it is in the model context
+TRANSCRIPT_REFERENCE = "Transcript: (the video transcript provided above)"
+
+class LLMSession:
+    """
+    Prefills a transcript once and reuses the server's context for later prompts.
+
+    Ollama returns the evaluated token context with every /api/generate response.
+    Passing it back with the next request lets follow-up prompts skip re-reading
+    the transcript, which is most of the prefill cost on CPU inference.
+    """
+
+    def __init__(self, transcript, model=None):
+        self.transcript = transcript
+        self.model = model or DEFAULT_MODEL
+        self.transcript_sha = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+        self.context = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "prefill_tokens": 0,
+            "prefill_seconds": 0.0,
+            "reused_calls": 0,
+            "followup_prompt_tokens": 0,
+            "followup_prompt_seconds": 0.0,
+            "prefill_tokens_skipped": 0
+        }
+
+    @property
+    def ready(self):
+        return self.context is not None
+
+    def prefill(self):
+        """
+        Evaluates the transcript once and stores the returned context.
+
+        Returns:
+        - Boolean indicating whether the context can be reused
+        """
+        try:
+            body = generate(
+                PREFILL_PROMPT.format(transcript=self.transcript),
+                model=self.model,
+                options={"num_predict": 1}
+            )
+        except Exception as e:
+            print(f"Could not prefill LLM session, prompts will include the transcript: {e}")
+            return False
+
+        self.context = body.get("context")
+        with self._lock:
+            self._stats["prefill_tokens"] = body.get("prompt_eval_count") or 0
+            self._stats["prefill_seconds"] = (body.get("prompt_eval_duration") or 0) / 1e9
+        if self.ready:
+            print(f"Prefilled transcript into LLM context ({self._stats['prefill_tokens']} tokens, "
+                  f"{self._stats['prefill_seconds']:.1f} seconds)")
+        return self.ready
+
+    def transcript_section(self):
+        """
+        Returns the transcript block for a prompt: a short reference when the
+        context is reused, otherwise the full transcript.
+        """
+        if self.ready:
+            return TRANSCRIPT_REFERENCE
+        return f"Transcript:\n    {self.transcript}"
+
+    def cache_options(self, options=None):
+        """
+        Returns cache-key options that tie a reference-only prompt to its transcript.
+        """
+        return {**(options or {}), "transcript_sha256": self.transcript_sha}
+
+    def generate_stream(self, prompt, **kwargs):
+        """
+        Streams a generation that continues from the prefilled context.
+
+        Accepts the same arguments as llm_client.generate_stream.
+        """
+        if not self.ready:
+            return generate_stream(prompt, model=self.model, **kwargs)
+
+        result = generate_stream(prompt, model=self.model, context=self.context, **kwargs)
+        evaluated = result.get("prompt_eval_count") or 0
+        with self._lock:
+            self._stats["reused_calls"] += 1
+            self._stats["followup_prompt_tokens"] += evaluated
+            self._stats["followup_prompt_seconds"] += (result.get("prompt_eval_duration") or 0) / 1e9
+            # The server reports the tokens it actually evaluated: about the whole context
+            # when it had to re-read it, only the new prompt when the context was reused
+            self._stats["prefill_tokens_skipped"] += max(0, len(self.context) - evaluated)
+        return result
+
+    def stats(self):
+        """
+        Returns prefill and reuse statistics.
+
+        'prefill_seconds_saved' is the prefill tokens follow-up calls did not have to
+        evaluate, as reported by the server, at the prefill's measured seconds per token.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["context_reused"] = self.ready
+        seconds_per_token = stats["prefill_seconds"] / stats["prefill_tokens"] if stats["prefill_tokens"] else 0.0
+        stats["prefill_seconds_saved"] = round(stats["prefill_tokens_skipped"] * seconds_per_token, 2)
+        stats["prefill_seconds"] = round(stats["prefill_seconds"], 2)
+        stats["followup_prompt_seconds"] = round(stats["followup_prompt_seconds"], 2)
+        return stats
@@ -0,0 +1,523 @@
+#backend/modules/render.py
+import os
+import json
+import errno
+import subprocess
+from functools import lru_cache
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from modules.encoding import get_profile, output_fps, output_size, same_fps, video_args, audio_args
+from modules.scratch import scratch_path, scratch_dir, release
+
+# Threads each ffmpeg process may use; 0 lets ffmpeg decide (override with FFMPEG_THREADS)
+FFMPEG_THREADS = int(os.environ.get("FFMPEG_THREADS", 0))
+
+# Encoders able to re-encode the edges of a smart cut so they splice onto copied GOPs
+SMART_CUT_ENCODERS = {
+    "h264": ("libx264", "h264_mp4toannexb"),
+    "hevc": ("libx265", "hevc_mp4toannexb")
+}
+
+# ASS styling for burned-in subtitles on short-form content
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 384
+PlayResY: 288
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,18,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,1.5,0.5,2,10,10,15,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def configure_render(threads=None):
+    """
+    Overrides the render settings at runtime.
+
+    Parameters:
+    - threads: Threads per ffmpeg process (0 lets ffmpeg decide), used to share
+      cores between renders running in parallel
+    """
+    global FFMPEG_THREADS
+
+    if threads is not None:
+        FFMPEG_THREADS = max(0, int(threads))
+
+def thread_args():
+    """
+    Returns the ffmpeg options capping the threads of one encode.
+    """
+    if not FFMPEG_THREADS:
+        return []
+    return ['-threads', str(FFMPEG_THREADS), '-filter_threads', str(FFMPEG_THREADS)]
+
+def probe_video(video_path):
+    """
+    Reads the basic stream properties of a video.
+
+    Returns:
+    - Dictionary with width, height, fps, duration and has_audio
+    """
+    infos = ffmpeg_parse_infos(video_path)
+    width, height = infos["video_size"]
+    return {
+        "width": width,
+        "height": height,
+        "fps": infos.get("video_fps"),
+        "duration": infos["duration"],
+        "has_audio": infos.get("audio_found", False)
+    }
+
+def format_time(seconds):
+    """Converts seconds to h:mm:ss.cc format for ASS subtitles."""
+    h = int(seconds / 3600)
+    m = int((seconds % 3600) / 60)
+    s = int(seconds % 60)
+    cs = int((seconds - int(seconds)) * 100)
+    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
+
+def write_ass_subtitles(subtitles_data, path):
+    """
+    Writes timed subtitle segments to an ASS file.
+
+    Parameters:
+    - subtitles_data: List of dictionaries with 'text', 'start', and 'end' keys
+    - path: Path of the .ass file to write
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(ASS_HEADER)
+        for subtitle in subtitles_data:
+            # Escape commas in text for ASS format
+            text = subtitle['text'].replace(',', '\\,')
+            f.write(f"Dialogue: 0,{format_time(subtitle['start'])},{format_time(subtitle['end'])},Default,,0,0,0,,{text}\n")
+
+def escape_drawtext(text):
+    """
+    Escapes text for use inside a drawtext filter.
+    """
+    return text.replace("'", "'\\''").replace(":", "\\:").replace(",", "\\,")
+
+def escape_filter_path(path):
+    """
+    Escapes a file path for use as a filter argument (e.g. ass=...).
+    """
+    return path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+def text_overlay_filters(text_data):
+    """
+    Builds drawtext filters matching add_text_overlay_with_images and add_subtitle_overlay.
+
+    Parameters:
+    - text_data: Dictionary with 'headline' and/or 'cta' text, or a string shown as a bottom subtitle
+
+    Returns:
+    - List of drawtext filter strings
+    """
+    if isinstance(text_data, str):
+        text = text_data.strip()
+        if not text:
+            return []
+        if len(text) > 80:
+            text = text[:77] + "..."
+        return [f"drawtext=text='{escape_drawtext(text)}':fontcolor=white:fontsize=24:box=1:boxcolor=black@0.8:x=20:y=h-70"]
+
+    if not isinstance(text_data, dict):
+        return []
+
+    filters = []
+    headline = text_data.get('headline')
+    if headline:
+        if len(headline) > 60:
+            headline = headline[:57] + "..."
+        filters.append(f"drawtext=text='{escape_drawtext(headline)}':fontcolor=white:fontsize=24:box=1:boxcolor=black@0.8:x=20:y=30")
+
+    cta = text_data.get('cta')
+    if cta:
+        if len(cta) > 80:
+            cta = cta[:77] + "..."
+        filters.append(f"drawtext=text='{escape_drawtext(cta)}':fontcolor=white:fontsize=20:box=1:boxcolor=black@0.8:x=20:y=70")
+    return filters
+
+def build_video_filters(crop=None, fps=None, text_data=None, subtitles_path=None, size=None):
+    """
+    Compiles the per-output video filter chain: frame rate, crop, scale, text overlays, subtitles.
+
+    Parameters:
+    - crop: Optional (width, height, x, y) crop window in source pixels
+    - fps: Output frame rate, or None to keep the source rate
+    - text_data: Optional overlay text (see text_overlay_filters)
+    - subtitles_path: Optional ASS file to burn in
+    - size: Optional (width, height) to scale to after cropping
+
+    Returns:
+    - Filter chain string for -vf
+    """
+    filters = []
+    if fps:
+        filters.append(f"fps={fps}")
+    if crop:
+        crop_w, crop_h, x, y = crop
+        # x264 with yuv420p needs even dimensions
+        filters.append(f"crop={crop_w - crop_w % 2}:{crop_h - crop_h % 2}:{x}:{y}")
+    if size:
+        filters.append(f"scale={size[0]}:{size[1]}")
+    filters.extend(text_overlay_filters(text_data))
+    if subtitles_path:
+        filters.append(f"ass='{escape_filter_path(subtitles_path)}'")
+    filters.append("format=yuv420p")
+    return ",".join(filters)
+
+def blur_fill_graph(in_label, out_label, source_size, fill, tail):
+    """
+    Builds filtergraph statements that letterbox a video onto a blurred copy of itself.
+
+    The background is downscaled, box-blurred and scaled back up to fill the
+    output; the foreground is scaled to fit 90% of it and overlaid centered.
+    Blurring at low resolution keeps the cost far below a full-size blur.
+
+    Parameters:
+    - in_label: Input pad label
+    - out_label: Output pad label
+    - source_size: (width, height) of the input video
+    - fill: (width, height) of the output frame
+    - tail: Filter chain applied after the overlay (text, subtitles, pixel format)
+
+    Returns:
+    - List of filtergraph statements
+    """
+    src_w, src_h = source_size
+    out_w, out_h = (size - size % 2 for size in fill)
+    small_w, small_h = max(2, out_w // 16 * 2), max(2, out_h // 16 * 2)
+    radius = max(2, min(small_w, small_h) // 6)
+    scale = min(out_w / src_w, out_h / src_h) * 0.9  # 90% to leave margins
+    fg_w, fg_h = int(src_w * scale) // 2 * 2, int(src_h * scale) // 2 * 2
+    return [
+        f"[{in_label}]split=2[{out_label}_bg][{out_label}_fg]",
+        f"[{out_label}_bg]scale={small_w}:{small_h}:force_original_aspect_ratio=increase,"
+        f"crop={small_w}:{small_h},boxblur={radius}:2,scale={out_w}:{out_h},setsar=1[{out_label}_blur]",
+        f"[{out_label}_fg]scale={fg_w}:{fg_h},setsar=1[{out_label}_scaled]",
+        f"[{out_label}_blur][{out_label}_scaled]overlay=(W-w)/2:(H-h)/2,{tail}[{out_label}]"
+    ]
+
+def build_video_graph(in_label, out_label, source_size, crop=None, fps=None, text_data=None,
+                      subtitles_path=None, fill=None, head=None, encoding=None):
+    """
+    Compiles one output's video filters into filtergraph statements.
+
+    Parameters:
+    - in_label: Input pad label
+    - out_label: Output pad label
+    - source_size: (width, height) of the input video
+    - crop, fps, text_data, subtitles_path: See build_video_filters
+    - fill: Optional (width, height) output frame to fill with a blurred background
+      instead of cropping (see blur_fill_graph)
+    - head: Optional filters applied first (e.g. a trim)
+    - encoding: Encoding profile; its max_height scales the output down
+
+    Returns:
+    - List of filtergraph statements
+    """
+    head = list(head or [])
+    if not fill:
+        size = output_size(*(crop[:2] if crop else source_size), encoding)
+        chain = ",".join(head + [build_video_filters(crop, fps, text_data, subtitles_path, size)])
+        return [f"[{in_label}]{chain}[{out_label}]"]
+
+    # A smaller fill frame scales the background and the foreground alike
+    fill = output_size(*fill, encoding) or fill
+    statements = []
+    if fps:
+        head.append(f"fps={fps}")
+    if head:
+        statements.append(f"[{in_label}]{','.join(head)}[{out_label}_in]")
+        in_label = f"{out_label}_in"
+    tail = build_video_filters(None, None, text_data, subtitles_path)
+    return statements + blur_fill_graph(in_label, out_label, source_size, fill, tail)
+
+def run_ffmpeg(cmd):
+    """
+    Runs an ffmpeg command.
+
+    Raises:
+    - OSError (ENOSPC) if an output filled its disk or tmpfs
+    - RuntimeError with the end of ffmpeg's error output if it fails otherwise
+    """
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        error = process.stderr.decode('utf-8', errors='ignore').strip().splitlines()
+        if any("No space left on device" in line for line in error):
+            raise OSError(errno.ENOSPC, "FFmpeg failed: No space left on device")
+        raise RuntimeError("FFmpeg failed: " + " | ".join(error[-5:]))
+
+def render_clip(video_path, start_time, end_time, output_path, crop=None, text_data=None,
+                subtitles=None, fps=None, encoding=None, fill=None):
+    """
+    Renders one output with a single ffmpeg encode.
+
+    The cut, crop, text overlays and burned-in subtitles are compiled into one
+    filtergraph, replacing the MoviePy write followed by separate crop, drawtext
+    and subtitle re-encodes.
+
+    Parameters:
+    - video_path: Path to the source video
+    - start_time: Start timestamp in seconds
+    - end_time: End timestamp in seconds
+    - output_path: Path to save the output video
+    - crop: Optional (width, height, x, y) crop window in source pixels
+    - text_data: Optional overlay text (dict with 'headline' and 'cta' keys, or a string)
+    - subtitles: Optional list of subtitle segments timed relative to start_time
+    - fps: Output frame rate (default: the source rate when the profile allows it)
+    - encoding: Encoding profile name or dictionary (see modules/encoding.py)
+    - fill: Optional (width, height) frame to fill with a blurred background instead of cropping
+
+    Returns:
+    - output_path: Path to the created video
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    source = probe_video(video_path)
+    source_fps = source["fps"]
+    fps = fps or output_fps(source_fps, encoding)
+
+    subtitle_file = None
+    if subtitles:
+        subtitle_file = scratch_path('.ass')
+        write_ass_subtitles(subtitles, subtitle_file)
+
+    cmd = [
+        'ffmpeg',
+        '-ss', f"{start_time:.3f}",
+        '-t', f"{end_time - start_time:.3f}",
+        '-i', video_path,
+        '-filter_complex', ";".join(build_video_graph(
+            "0:v", "v", (source["width"], source["height"]), crop,
+            None if same_fps(fps, source_fps) else fps, text_data, subtitle_file, fill, encoding=encoding
+        )),
+        '-map', '[v]', '-map', '0:a?'
+    ] + video_args(encoding) + audio_args(encoding) + [
+        '-movflags', '+faststart'
+    ] + thread_args() + [
+        '-y',
+        output_path
+    ]
+
+    try:
+        run_ffmpeg(cmd)
+    except Exception:
+        if os.path.exists(output_path):
+            os.unlink(output_path)
+        raise
+    finally:
+        if subtitle_file:
+            release(subtitle_file)
+
+    return output_path
+
+@lru_cache(maxsize=32)
+def _gop_index(video_path, mtime, size):
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,pix_fmt:packet=pts_time,flags',
+        '-of', 'json',
+        video_path
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {process.stderr.decode('utf-8', errors='ignore').strip()}")
+
+    info = json.loads(process.stdout)
+    stream = info["streams"][0]
+    packets = [p for p in info.get("packets", []) if p.get("pts_time") not in (None, "N/A")]
+    return {
+        "codec": stream.get("codec_name"),
+        "pix_fmt": stream.get("pix_fmt"),
+        "keyframes": tuple(sorted(float(p["pts_time"]) for p in packets if "K" in p.get("flags", ""))),
+        "frames": tuple(sorted(float(p["pts_time"]) for p in packets))
+    }
+
+def gop_index(video_path):
+    """
+    Builds (and caches) the keyframe index of a video's first video stream.
+
+    Only packet headers are read, so this is fast even for long sources.
+
+    Returns:
+    - Dictionary with the video codec, pixel format, and sorted keyframe and frame timestamps
+    """
+    stat = os.stat(video_path)
+    return _gop_index(os.path.abspath(video_path), stat.st_mtime, stat.st_size)
+
+def smart_cut(video_path, start_time, end_time, output_path, index=None, encoding=None):
+    """
+    Cuts a clip frame-accurately while re-encoding only its partial GOPs.
+
+    Whole GOPs between the first and last keyframe inside the range are stream
+    copied; the partial GOPs before and after them are re-encoded with the
+    source's codec and pixel format and spliced on with the concat demuxer.
+    Audio is encoded once for the whole range. Clips without a complete GOP,
+    or sources whose codec cannot be matched, are re-encoded in full.
+
+    Parameters:
+    - video_path: Path to the source video
+    - start_time: Start timestamp in seconds
+    - end_time: End timestamp in seconds
+    - output_path: Path to save the output video
+    - index: Optional precomputed gop_index result
+    - encoding: Encoding profile for the re-encoded edges and the audio
+
+    Returns:
+    - output_path: Path to the created video
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    index = index or gop_index(video_path)
+    encoders = SMART_CUT_ENCODERS.get(index["codec"])
+
+    inner = [k for k in index["keyframes"] if start_time <= k <= end_time]
+    if not encoders or len(inner) < 2:
+        return render_clip(video_path, start_time, end_time, output_path, encoding=encoding)
+
+    encoder, annexb = encoders
+    profile = get_profile(encoding)
+    first_key, last_key = inner[0], inner[-1]
+    work_dir = scratch_dir("smart_cut")
+
+    def encode_edge(edge_start, edge_end, path):
+        run_ffmpeg([
+            'ffmpeg',
+            '-ss', f"{edge_start:.6f}", '-t', f"{edge_end - edge_start:.6f}",
+            '-i', video_path,
+            '-an', '-c:v', encoder, '-preset', profile["preset"], '-crf', str(profile["crf"]),
+            '-pix_fmt', index["pix_fmt"] or 'yuv420p',
+            '-bsf:v', annexb
+        ] + thread_args() + ['-y', path])
+
+    try:
+        segments = []
+        if first_key - start_time > 0.001:
+            segments.append(os.path.join(work_dir, "head.mkv"))
+            encode_edge(start_time, first_key, segments[-1])
+
+        # A copy cut with -t keeps packets decoded before the next keyframe but
+        # shown after it, so the copied GOPs are bounded by their frame count
+        frame_count = sum(1 for t in index["frames"] if first_key <= t < last_key)
+        segments.append(os.path.join(work_dir, "middle.mkv"))
+        run_ffmpeg([
+            'ffmpeg',
+            '-ss', f"{first_key:.6f}",
+            '-i', video_path,
+            '-frames:v', str(frame_count),
+            '-an', '-c:v', 'copy', '-bsf:v', annexb,
+            '-y', segments[-1]
+        ])
+
+        if end_time - last_key > 0.001:
+            segments.append(os.path.join(work_dir, "tail.mkv"))
+            encode_edge(last_key, end_time, segments[-1])
+
+        concat_list = os.path.join(work_dir, "segments.txt")
+        with open(concat_list, 'w') as f:
+            for segment in segments:
+                f.write(f"file '{escape_filter_path(segment)}'\n")
+
+        run_ffmpeg([
+            'ffmpeg',
+            '-f', 'concat', '-safe', '0', '-i', concat_list,
+            '-ss', f"{start_time:.6f}", '-t', f"{end_time - start_time:.6f}",
+            '-i', video_path,
+            '-map', '0:v:0', '-map', '1:a:0?',
+            '-c:v', 'copy'
+        ] + audio_args(encoding) + ['-movflags', '+faststart'] + thread_args() + ['-y', output_path])
+    finally:
+        release(work_dir)
+
+    print(f"Smart cut copied {last_key - first_key:.1f}s of {end_time - start_time:.1f}s without re-encoding")
+    return output_path
+
+def render_outputs(video_path, outputs):
+    """
+    Renders several outputs from one decode of the source.
+
+    The union of the requested ranges is decoded once and fanned out with
+    split/asplit; each branch gets its own trim, crop, text overlays and
+    subtitles, and every output file is written by the same ffmpeg process.
+
+    Parameters:
+    - video_path: Path to the source video
+    - outputs: List of dictionaries with 'output_path', 'start_time' and 'end_time',
+      and optional 'crop', 'text_data', 'subtitles', 'encoding' and 'fill' (see render_clip)
+
+    Returns:
+    - List of output paths, in the order given
+    """
+    if not outputs:
+        return []
+
+    union_start = min(output["start_time"] for output in outputs)
+    union_end = max(output["end_time"] for output in outputs)
+    source = probe_video(video_path)
+    has_audio = source["has_audio"]
+
+    # Frame rate conversion happens once, before the split, when every output shares a rate.
+    # Each branch still restates its rate: setpts drops it, and ffmpeg would fall back to 25 fps.
+    rates = [output_fps(source["fps"], output.get("encoding")) for output in outputs]
+    resample = [None if same_fps(rate, source["fps"]) else rate for rate in rates]
+    shared_rate = resample[0] if len(set(resample)) == 1 else None
+
+    count = len(outputs)
+    labels = "".join(f"[v{i}]" for i in range(count))
+    graph = [f"[0:v]{f'fps={shared_rate},' if shared_rate else ''}split={count}{labels}"]
+    if has_audio:
+        graph.append(f"[0:a]asplit={count}" + "".join(f"[a{i}]" for i in range(count)))
+
+    subtitle_files = []
+    output_args = []
+    try:
+        for i, output in enumerate(outputs):
+            os.makedirs(os.path.dirname(output["output_path"]) or ".", exist_ok=True)
+            trim_start = output["start_time"] - union_start
+            trim_end = output["end_time"] - union_start
+
+            subtitle_file = None
+            if output.get("subtitles"):
+                subtitle_file = scratch_path('.ass')
+                subtitle_files.append(subtitle_file)
+                write_ass_subtitles(output["subtitles"], subtitle_file)
+
+            graph += build_video_graph(
+                f"v{i}", f"vout{i}", (source["width"], source["height"]), output.get("crop"), rates[i],
+                output.get("text_data"), subtitle_file, output.get("fill"),
+                head=[f"trim=start={trim_start:.3f}:end={trim_end:.3f}", "setpts=PTS-STARTPTS"],
+                encoding=output.get("encoding")
+            )
+            output_args += ['-map', f"[vout{i}]"]
+
+            if has_audio:
+                graph.append(f"[a{i}]atrim=start={trim_start:.3f}:end={trim_end:.3f},asetpts=PTS-STARTPTS[aout{i}]")
+                output_args += ['-map', f"[aout{i}]"] + audio_args(output.get("encoding"))
+
+            output_args += video_args(output.get("encoding")) + ['-movflags', '+faststart'] + thread_args()
+            output_args += ['-y', output["output_path"]]
+
+        cmd = [
+            'ffmpeg',
+            '-ss', f"{union_start:.3f}",
+            '-t', f"{union_end - union_start:.3f}",
+            '-i', video_path,
+            '-filter_complex', ";".join(graph)
+        ] + output_args
+
+        try:
+            run_ffmpeg(cmd)
+        except Exception:
+            for output in outputs:
+                if os.path.exists(output["output_path"]):
+                    os.unlink(output["output_path"])
+            raise
+    finally:
+        for subtitle_file in subtitle_files:
+            release(subtitle_file)
+
+    return [output["output_path"] for output in outputs]
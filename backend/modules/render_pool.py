@@ -0,0 +1,246 @@
+#backend/modules/render_pool.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from modules.content import (create_youtube_short, create_ad_video, generate_thumbnail, resolve_deferred,
+                             clip_subtitle_segments, clip_bounds)
+from modules.captions import mux_soft_captions, write_sidecars
+from modules.render import configure_render
+from modules.scratch import (open_scratch, get_scratch, get_scratch_stats, add_scratch_bytes, scratch_path, publish,
+                             retry_on_disk)
+from modules.utils import save_metadata, generate_output_filename, predict_engagement
+
+# Worker processes for per-platform rendering (override with RENDER_WORKERS)
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", 1))
+
+def render_platform(task):
+    """
+    Creates one platform's video, thumbnail and metadata.
+
+    Parameters:
+    - task: Dictionary with 'platform', 'video_path', 'timestamp', 'settings',
+      'output_dir', 'output_filename' and 'job_id'; 'creatives' (dict, or a callable
+      returning one when running in-process); and optionally 'rendered' when the
+      video was already written by a multi-output render and 'font_path' for thumbnails
+
+    Returns:
+    - Dictionary with video, thumbnail and metadata paths, metadata, engagement prediction
+      and 'status': "rendered", "preview_only" (the final render failed and the published
+      preview was kept) or "failed"
+    """
+    platform = task["platform"]
+    settings = task["settings"]
+    output_dir = task["output_dir"]
+    video_path = task["video_path"]
+    timestamp = task["timestamp"]
+    creatives = task["creatives"]
+
+    start_time = time.time()
+    output_filename = task["output_filename"]
+    output_path = os.path.join(output_dir, output_filename)
+
+    # Only burned-in captions go through the encode; the others are added afterwards
+    captions = settings.get("captions", "none")
+    duration = min(settings["duration"], 60)  # Max 60 seconds for Shorts
+
+    def render():
+        # Rendered in scratch and moved into place, so a published preview is replaced in one step
+        path = scratch_path('.mp4')
+        if platform == "youtube_shorts":
+            # Create a YouTube Short
+            create_youtube_short(
+                video_path,
+                timestamp,
+                timestamp + duration,
+                path,
+                add_text=lambda: {
+                    'headline': resolve_deferred(creatives).get('headline', ''),
+                    'cta': resolve_deferred(creatives).get('call_to_action', '')
+                },
+                smart_format=settings.get("smart_format", True),
+                add_subtitles=captions == "burn_in",
+                encoding=settings.get("encoding")
+            )
+        else:
+            # Create an ad video
+            create_ad_video(
+                video_path,
+                timestamp,
+                settings["duration"],
+                path,
+                platform,
+                ad_text=creatives,
+                add_subtitles=captions == "burn_in",
+                encoding=settings.get("encoding")
+            )
+        return path
+
+    render_path = None
+    render_status = "rendered"
+    if not task.get("rendered"):
+        try:
+            render_path = retry_on_disk(render)
+        except Exception as e:
+            print(f"Rendering {platform} failed: {e}")
+        if not render_path or not os.path.exists(render_path) or os.path.getsize(render_path) == 0:
+            # Keep a published preview in place rather than replacing it with nothing
+            render_path = None
+            render_status = "preview_only" if os.path.exists(output_path) else "failed"
+            print(f"Warning: no final video for {platform} ({render_status})")
+
+    # The clamped range the clip was rendered from, so captions line up with it and
+    # the thumbnail finds the crop analysis the renderer cached under the same range
+    clip_start, clip_end = clip_bounds(video_path, platform, timestamp, duration)
+
+    caption_segments = None
+    if captions in ("sidecar", "soft") and render_status == "rendered":
+        try:
+            caption_segments = clip_subtitle_segments(video_path, clip_start, clip_end)
+            if captions == "soft" and caption_segments:
+                mux_soft_captions(render_path or output_path, caption_segments)
+        except Exception as e:
+            print(f"Could not create captions for {platform}: {e}")
+
+    if render_path:
+        publish(render_path, output_path)
+
+    caption_files = write_sidecars(output_path, caption_segments) if caption_segments else None
+
+    # The overlay step has already waited for the creatives
+    ad_creatives = resolve_deferred(creatives)
+
+    # Generate a thumbnail with headline overlay
+    thumbnail_filename = generate_output_filename(platform, "jpg")
+    thumbnail_path = os.path.join(output_dir, thumbnail_filename)
+
+    # Pass both headline and call to action to the thumbnail generator
+    generate_thumbnail(
+        video_path,
+        timestamp,
+        thumbnail_path,
+        headline=ad_creatives,
+        font_path=task.get("font_path"),
+        crop_range=(clip_start, clip_end)
+    )
+
+    # Create metadata
+    metadata = {
+        "platform": platform,
+        "timestamp": timestamp,
+        "duration": settings["duration"],
+        "aspect_ratio": settings["aspect_ratio"],
+        "encoding": settings.get("encoding"),
+        "render_status": render_status,
+        "captions": {"mode": captions, **(caption_files or {})},
+        "video_file": output_filename,
+        "thumbnail_file": thumbnail_filename,
+        "creatives": ad_creatives,
+        "job_id": task["job_id"]  # Include job_id in metadata
+    }
+
+    # Add engagement prediction
+    metadata["engagement_prediction"] = predict_engagement(
+        {**metadata, **ad_creatives},
+        platform
+    )
+
+    # Save metadata
+    metadata_filename = generate_output_filename(platform, "json")
+    metadata_path = os.path.join(output_dir, metadata_filename)
+    save_metadata(metadata, metadata_path)
+
+    # Changed Unicode checkmark to "+" to avoid encoding issues
+    print(f"{'+' if render_status == 'rendered' else '!'} {platform} content created in "
+          f"{time.time() - start_time:.1f} seconds ({render_status})")
+    print(f"  - Video: {output_filename}")
+    print(f"  - Thumbnail: {thumbnail_filename}")
+    print(f"  - Metadata: {metadata_filename}")
+    if caption_files:
+        print(f"  - Captions: {caption_files['srt']}, {caption_files['vtt']}")
+
+    return {
+        "video_path": output_path,
+        "thumbnail_path": thumbnail_path,
+        "metadata_path": metadata_path,
+        "metadata": metadata,
+        "status": render_status,
+        "engagement_prediction": metadata["engagement_prediction"]
+    }
+
+def _init_worker(ffmpeg_threads, scratch_root):
+    configure_render(threads=ffmpeg_threads)
+    # Inside the job's scratch directory, so the parent's cleanup covers it too
+    open_scratch(root=scratch_root)
+
+def _render_pooled(task):
+    # Scratch bytes are reported back so the job total includes the workers
+    before = get_scratch_stats()["bytes_written"]
+    result = render_platform(task)
+    return result, get_scratch_stats()["bytes_written"] - before
+
+def _cpu_seconds():
+    times = os.times()
+    # Children count once they have been waited for: ffmpeg runs and finished pool workers
+    return times.user + times.system + times.children_user + times.children_system
+
+def render_platforms(tasks, workers=None, ffmpeg_threads=None):
+    """
+    Runs render_platform for every task, serially or on a process pool.
+
+    With more than one worker each task runs in its own process and its ffmpeg
+    encodes are capped at ffmpeg_threads, so the encodes share the machine's
+    cores instead of each x264 encode leaving some idle. Futures cannot cross
+    processes, so each pooled task is submitted once its own creatives have
+    resolved; tasks whose creatives are ready start while the rest are still
+    generating.
+
+    Parameters:
+    - tasks: List of task dictionaries (see render_platform)
+    - workers: Number of worker processes (default: RENDER_WORKERS; 1 renders in-process)
+    - ffmpeg_threads: Threads per ffmpeg process in the workers
+      (default: the cores divided evenly between the workers)
+
+    Returns:
+    - Tuple of (dictionary mapping each platform to its render_platform result, stats dictionary)
+    """
+    workers = max(1, min(workers or RENDER_WORKERS, len(tasks) or 1))
+    cpu_count = os.cpu_count() or 1
+    if ffmpeg_threads is None and workers > 1:
+        ffmpeg_threads = max(1, cpu_count // workers)
+
+    started = time.time()
+    cpu_started = _cpu_seconds()
+    results = {}
+
+    if workers == 1:
+        for task in tasks:
+            print(f"\n4. Creating content for {task['platform']}...")
+            results[task["platform"]] = render_platform(task)
+    else:
+        print(f"\n4. Creating content for {len(tasks)} platforms on {workers} worker processes...")
+        # Spawned workers do not inherit the LLM pipeline's threads and locks
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(ffmpeg_threads, get_scratch().directory)) as pool:
+            def submit_when_ready(task):
+                return pool.submit(_render_pooled, {**task, "creatives": resolve_deferred(task["creatives"])})
+
+            with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="render-submit") as waiters:
+                submissions = {task["platform"]: waiters.submit(submit_when_ready, task) for task in tasks}
+                for platform, submission in submissions.items():
+                    results[platform], scratch_bytes = submission.result().result()
+                    add_scratch_bytes(scratch_bytes)
+
+    wall_time = time.time() - started
+    cpu_time = _cpu_seconds() - cpu_started
+    stats = {
+        "mode": "serial" if workers == 1 else "process_pool",
+        "workers": workers,
+        "ffmpeg_threads": ffmpeg_threads,
+        "wall_time": round(wall_time, 2),
+        "cpu_time": round(cpu_time, 2),
+        # Share of all cores kept busy while rendering
+        "cpu_utilization": round(cpu_time / (wall_time * cpu_count), 3) if wall_time else None
+    }
+    return results, stats
@@ -0,0 +1,215 @@
+#backend/modules/scratch.py
+import os
+import uuid
+import errno
+import shutil
+import atexit
+import tempfile
+import threading
+
+# Where job scratch directories are created (override with SCRATCH_DIR; default: tmpfs when it has room)
+SCRATCH_ROOT = os.environ.get("SCRATCH_DIR")
+# Free space /dev/shm needs to be used for a job (Docker's default /dev/shm is only 64 MB)
+MIN_SHM_FREE = int(os.environ.get("SCRATCH_MIN_SHM_MB", 1024)) * 1024 * 1024
+
+def _default_root():
+    # RAM-backed tmpfs where the container has one with enough room, otherwise the system temp dir
+    shm = "/dev/shm"
+    try:
+        if os.access(shm, os.W_OK) and shutil.disk_usage(shm).free >= MIN_SHM_FREE:
+            return shm
+    except OSError:
+        pass
+    return tempfile.gettempdir()
+
+def is_out_of_space(error):
+    """Returns True when an exception (OSError or ffmpeg failure) means a disk or tmpfs is full."""
+    if isinstance(error, OSError) and error.errno == errno.ENOSPC:
+        return True
+    return "No space left on device" in str(error)
+
+_lock = threading.Lock()
+_current = None
+
+class ScratchSpace:
+    """
+    A job's scratch directory for render intermediates.
+
+    Every intermediate file gets a path inside one directory, so whatever a
+    failed step leaves behind is removed by close(). Bytes are counted when a
+    file is released or when the directory is closed.
+    """
+
+    def __init__(self, job_id=None, root=None):
+        self.name = f"scratch-{job_id or os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.directory = os.path.join(root or SCRATCH_ROOT or _default_root(), self.name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.directories = [self.directory]
+        self.stats = {"files": 0, "bytes_written": 0, "spilled_to_disk": False}
+
+    def spill(self):
+        """
+        Moves new scratch files to a directory in the system temp dir, after the current one filled up.
+
+        Returns:
+        - False if the scratch space already is in the system temp dir
+        """
+        disk_root = tempfile.gettempdir()
+        if os.path.dirname(self.directory) == disk_root:
+            return False
+        directory = os.path.join(disk_root, self.name)
+        os.makedirs(directory, exist_ok=True)
+        print(f"Scratch space {self.directory} is full, continuing in {directory}")
+        with _lock:
+            self.directory = directory
+            self.directories.append(directory)
+            self.stats["spilled_to_disk"] = True
+        return True
+
+    def path(self, suffix="", prefix="tmp"):
+        """Returns a new unused file path in the scratch directory."""
+        with _lock:
+            self.stats["files"] += 1
+        return os.path.join(self.directory, f"{prefix}-{uuid.uuid4().hex[:12]}{suffix}")
+
+    def mkdir(self, prefix="tmp"):
+        """Creates and returns a new subdirectory of the scratch directory."""
+        path = os.path.join(self.directory, f"{prefix}-{uuid.uuid4().hex[:12]}")
+        os.makedirs(path)
+        return path
+
+    def _count(self, nbytes):
+        with _lock:
+            self.stats["bytes_written"] += nbytes
+
+    def release(self, path):
+        """Deletes a scratch file or directory, counting its bytes."""
+        if os.path.isdir(path):
+            self._count(_tree_size(path))
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            self._count(os.path.getsize(path))
+            os.unlink(path)
+
+    def close(self):
+        """Deletes the scratch directories and everything left in them."""
+        for directory in self.directories:
+            if os.path.isdir(directory):
+                self._count(_tree_size(directory))
+                shutil.rmtree(directory, ignore_errors=True)
+
+def _tree_size(directory):
+    total = 0
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+def open_scratch(job_id=None, root=None):
+    """
+    Starts the scratch space used by this process's renders for a job.
+
+    Parameters:
+    - job_id: Job identifier, used in the directory name
+    - root: Parent directory (default: SCRATCH_ROOT, or tmpfs when it has MIN_SHM_FREE bytes free)
+
+    Returns:
+    - The ScratchSpace
+    """
+    global _current
+
+    with _lock:
+        previous, _current = _current, ScratchSpace(job_id, root)
+        scratch = _current
+    if previous:
+        previous.close()
+    return scratch
+
+def close_scratch():
+    """
+    Removes the current scratch space.
+
+    Returns:
+    - Its final statistics, or None if no scratch space was open
+    """
+    global _current
+
+    with _lock:
+        scratch, _current = _current, None
+    if scratch is None:
+        return None
+    scratch.close()
+    return _stats_of(scratch)
+
+def get_scratch():
+    """Returns the current scratch space, opening one if needed."""
+    with _lock:
+        scratch = _current
+    return scratch or open_scratch()
+
+def scratch_path(suffix="", prefix="tmp"):
+    """Returns a new file path in the current scratch space."""
+    return get_scratch().path(suffix, prefix)
+
+def scratch_dir(prefix="tmp"):
+    """Creates a new directory in the current scratch space."""
+    return get_scratch().mkdir(prefix)
+
+def release(path):
+    """Deletes a scratch file or directory, counting the bytes written to it."""
+    get_scratch().release(path)
+
+def publish(path, destination):
+    """
+    Moves a finished scratch file to its destination, atomically replacing any file there.
+
+    Scratch usually lives on another filesystem (tmpfs), where os.replace
+    cannot be used, so the file is copied next to the destination first and
+    renamed over it; readers see either the old file or the whole new one.
+    """
+    get_scratch()._count(os.path.getsize(path))
+    try:
+        os.replace(path, destination)
+    except OSError:
+        partial = f"{destination}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            shutil.copyfile(path, partial)
+            os.replace(partial, destination)
+        finally:
+            if os.path.exists(partial):
+                os.unlink(partial)
+        os.unlink(path)
+
+def retry_on_disk(work):
+    """
+    Runs work(), and runs it again with scratch moved to disk if it failed because scratch is full.
+
+    work must take its scratch paths inside the call, so the retry gets paths on disk.
+    """
+    try:
+        return work()
+    except Exception as e:
+        if not is_out_of_space(e) or not get_scratch().spill():
+            raise
+    return work()
+
+def add_scratch_bytes(nbytes):
+    """Counts bytes written by scratch spaces in other processes (pool workers)."""
+    get_scratch()._count(nbytes)
+
+def _stats_of(scratch):
+    with _lock:
+        return {"directory": scratch.directory, **scratch.stats}
+
+def get_scratch_stats():
+    """
+    Returns the current scratch directory, file count and bytes written.
+    """
+    return _stats_of(get_scratch())
+
+@atexit.register
+def _cleanup():
+    close_scratch()
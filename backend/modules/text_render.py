@@ -0,0 +1,119 @@
+#backend/modules/text_render.py
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageFont
+
+# Fonts tried in order when no custom font is given (names are looked up by PIL)
+FONT_CANDIDATES = [
+    "Arial", "Helvetica", "DejaVuSans", "FreeSans", "Liberation Sans",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/DejaVuSans.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf"
+]
+
+@lru_cache(maxsize=None)
+def resolve_font_path(font_path=None):
+    """
+    Finds the font file to use, probing the candidates once per process.
+
+    Parameters:
+    - font_path: Optional path to a custom font file (TTF), tried first
+
+    Returns:
+    - A path or font name PIL can load, or None when only PIL's default font is available
+    """
+    candidates = ([font_path] if font_path else []) + FONT_CANDIDATES
+    for path in candidates:
+        try:
+            ImageFont.truetype(path, 12)
+            return path
+        except (OSError, ValueError):
+            if path == font_path:
+                print(f"Could not load custom font: {font_path}")
+    return None
+
+@lru_cache(maxsize=64)
+def load_font(path, size):
+    """Loads a font at a size, cached per (path, size); None gives PIL's default font."""
+    if path is None:
+        return ImageFont.load_default(size)
+    return ImageFont.truetype(path, size)
+
+def get_font(size, font_path=None):
+    """
+    Returns the resolved font at a size.
+
+    Parameters:
+    - size: Font size in pixels
+    - font_path: Optional path to a custom font file (TTF)
+    """
+    return load_font(resolve_font_path(font_path), int(size))
+
+def text_width(font, text):
+    """Returns the rendered width of a single line of text in pixels."""
+    left, _, right, _ = font.getbbox(text)
+    return right - left
+
+def text_size(font, text):
+    """Returns the (width, height) of a single line of text in pixels."""
+    left, top, right, bottom = font.getbbox(text)
+    return right - left, bottom - top
+
+def wrap_text(text, font, max_width):
+    """
+    Breaks text into lines no wider than max_width.
+
+    Each word and the space are measured once, and line widths are summed from
+    those measurements, so the cost grows with the number of words rather than
+    re-measuring every growing line.
+
+    Returns:
+    - List of (line, width) tuples
+    """
+    words = text.split()
+    if not words:
+        return []
+
+    space = font.getlength(" ")
+    lines = []
+    line, width = [words[0]], font.getlength(words[0])
+    for word in words[1:]:
+        word_width = font.getlength(word)
+        if width + space + word_width <= max_width:
+            line.append(word)
+            width += space + word_width
+        else:
+            lines.append((" ".join(line), width))
+            line, width = [word], word_width
+    lines.append((" ".join(line), width))
+    return lines
+
+def apply_top_gradient(image, height, max_alpha=180):
+    """
+    Darkens the top of an image with a black gradient fading from max_alpha to 0.
+
+    The gradient is a NumPy alpha ramp blended into the affected rows only.
+
+    Parameters:
+    - image: PIL image
+    - height: Height of the gradient in pixels
+    - max_alpha: Opacity (0-255) at the top edge
+
+    Returns:
+    - New RGB PIL image
+    """
+    pixels = np.array(image.convert('RGB'))
+    height = max(0, min(int(height), pixels.shape[0]))
+    if height:
+        # Same ramp as alpha = max_alpha * (1 - y / height) per row
+        alpha = max_alpha * (1 - np.arange(height, dtype=np.float32) / height) / 255.0
+        rows = pixels[:height].astype(np.float32) * (1 - alpha)[:, None, None]
+        pixels[:height] = np.round(rows).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+def draw_shadowed_text(draw, position, text, font, offset=2, fill=(255, 255, 255), shadow=(0, 0, 0)):
+    """Draws text with a drop shadow for readability over video frames."""
+    x, y = position
+    draw.text((x + offset, y + offset), text, font=font, fill=shadow)
+    draw.text((x, y), text, font=font, fill=fill)
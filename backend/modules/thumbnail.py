@@ -0,0 +1,108 @@
+#backend/modules/thumbnail.py
+import subprocess
+import numpy as np
+from modules.render import probe_video
+
+# Thumbnail candidate settings (the cost per thumbnail is bounded by these)
+CANDIDATE_WINDOW = 1.0    # seconds of video around the moment searched for a frame
+CANDIDATE_FRAMES = 8      # frames decoded and scored within the window
+SCORING_WIDTH = 480       # candidates are scored at roughly this width
+CLIP_LEVEL = 0.02         # share of 0-255 range counted as crushed blacks / blown highlights
+
+def _decode_window(video_path, start_time, duration, width, height):
+    """
+    Decodes up to CANDIDATE_FRAMES evenly spaced RGB frames from a time range in one ffmpeg call.
+
+    Returns:
+    - uint8 array of shape (frames, height, width, 3)
+    """
+    cmd = [
+        'ffmpeg', '-v', 'error',
+        '-ss', f"{start_time:.3f}", '-t', f"{duration:.3f}",
+        '-i', video_path,
+        '-an', '-sn',
+        '-vf', f"fps={CANDIDATE_FRAMES / duration:.6f}",
+        '-frames:v', str(CANDIDATE_FRAMES),
+        '-pix_fmt', 'rgb24', '-f', 'rawvideo', '-'
+    ]
+    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed: {process.stderr.decode('utf-8', errors='ignore').strip()}")
+
+    frame_size = width * height * 3
+    frames = np.frombuffer(process.stdout, dtype=np.uint8)
+    frames = frames[:len(frames) // frame_size * frame_size]
+    return frames.reshape(-1, height, width, 3)
+
+def score_frames(frames):
+    """
+    Scores candidate frames on sharpness and exposure.
+
+    Sharpness is the variance of the Laplacian of each frame's luma, relative to
+    the sharpest candidate. Exposure favours mid-range brightness and penalises
+    pixels clipped to black or white.
+
+    Parameters:
+    - frames: uint8 array of shape (frames, height, width, 3)
+
+    Returns:
+    - Dictionary of float arrays 'score', 'sharpness' and 'exposure', one value per frame
+    """
+    # Score a strided view: the ranking does not need full resolution
+    step = max(1, frames.shape[2] // SCORING_WIDTH)
+    rgb = frames[:, ::step, ::step].astype(np.float32) / 255.0
+    luma = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    laplacian = (
+        luma[:, :-2, 1:-1] + luma[:, 2:, 1:-1] + luma[:, 1:-1, :-2] + luma[:, 1:-1, 2:]
+        - 4 * luma[:, 1:-1, 1:-1]
+    )
+    sharpness = laplacian.reshape(len(frames), -1).var(axis=1)
+
+    flat = luma.reshape(len(frames), -1)
+    clipped = ((flat <= CLIP_LEVEL) | (flat >= 1 - CLIP_LEVEL)).mean(axis=1)
+    exposure = np.clip(1 - 2 * np.abs(flat.mean(axis=1) - 0.5), 0, 1) * (1 - clipped)
+
+    relative = sharpness / sharpness.max() if sharpness.max() > 0 else np.ones_like(sharpness)
+    return {"score": relative * exposure, "sharpness": sharpness, "exposure": exposure}
+
+def select_thumbnail_frame(video_path, timestamp):
+    """
+    Picks the best frame for a thumbnail near a timestamp.
+
+    Candidates across CANDIDATE_WINDOW seconds around the timestamp come from one
+    sequential decode (fast input seek, then a short read) and the sharpest,
+    best-exposed one wins. If the timestamp is past the end of the video, the
+    last window of the video is used instead, so the worst case is two decodes.
+
+    Parameters:
+    - video_path: Path to the source video
+    - timestamp: Moment in seconds the thumbnail should show
+
+    Returns:
+    - (frame, info): RGB uint8 array of the chosen frame, and a dictionary with
+      its 'time', 'score' and the number of 'candidates' scored
+
+    Raises:
+    - ValueError if no frame can be decoded
+    """
+    info = probe_video(video_path)
+    width, height = info["width"], info["height"]
+    duration = min(CANDIDATE_WINDOW, info["duration"]) if info.get("duration") else CANDIDATE_WINDOW
+    start_time = max(0.0, timestamp - duration / 2)
+
+    frames = _decode_window(video_path, start_time, duration, width, height)
+    if len(frames) == 0 and info.get("duration"):
+        print(f"Could not extract frames at timestamp {timestamp}, using the end of the video")
+        start_time = max(0.0, info["duration"] - duration)
+        frames = _decode_window(video_path, start_time, duration, width, height)
+    if len(frames) == 0:
+        raise ValueError("Could not extract any valid frame from the video")
+
+    scores = score_frames(frames)
+    best = int(np.argmax(scores["score"]))
+    return frames[best], {
+        "time": round(start_time + best * duration / CANDIDATE_FRAMES, 3),
+        "score": round(float(scores["score"][best]), 3),
+        "candidates": len(frames)
+    }
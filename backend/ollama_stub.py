@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Ollama server.
+
+Implements /api/generate (streaming and non-streaming), /api/tags and
+/api/version with configurable latency, token rates and failure injection, so
+the LLM path can be exercised and load-tested without a live Zephyr model.
+
+Usage:
+    python ollama_stub.py --port 11435 --tokens-per-second 20 --failure-rate 0.05
+    OLLAMA_URL=http://localhost:11435 python enhanced_app.py video.mp4
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_CONFIG = {
+    "latency_dist": "lognormal",     # fixed, uniform, exponential or lognormal
+    "latency_mean": 0.2,             # seconds before the first token
+    "latency_sigma": 0.5,
+    "tokens_per_second": 25.0,       # generation rate
+    "prefill_tokens_per_second": 400.0,
+    "response_tokens": 120,          # length of free-text responses
+    "failure_rate": 0.0,             # fraction of requests answered with HTTP 500
+    "stall_rate": 0.0,               # fraction of requests that hang before answering
+    "stall_seconds": 30.0,
+    "parallel": 1                    # concurrent generation slots, like OLLAMA_NUM_PARALLEL
+}
+
+WORDS = ("video content audience moment highlight story product launch engaging creator brand "
+         "discover watch learn share viewers scene energy message").split()
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+def sample_latency(config, rng):
+    """
+    Draws the time-to-first-token delay from the configured distribution.
+    """
+    mean = config["latency_mean"]
+    dist = config["latency_dist"]
+    if dist == "fixed":
+        return mean
+    if dist == "uniform":
+        return rng.uniform(0, 2 * mean)
+    if dist == "exponential":
+        return rng.expovariate(1 / mean) if mean > 0 else 0.0
+    sigma = config["latency_sigma"]
+    # Lognormal with the requested mean
+    return rng.lognormvariate(-(sigma ** 2) / 2, sigma) * mean
+
+def sample_from_schema(schema, rng, name="value"):
+    """
+    Builds a value matching a JSON schema (the subset used by modules/insights.py).
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: sample_from_schema(sub, rng, key) for key, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        count = min(2, schema.get("maxItems", 2))
+        return [sample_from_schema(schema.get("items", {"type": "string"}), rng, name) for _ in range(count)]
+    if kind in ("integer", "number"):
+        return rng.randint(1, 100)
+    text = f"{name.replace('_', ' ').title()} " + " ".join(rng.choice(WORDS) for _ in range(8))
+    return text[:schema.get("maxLength", len(text))].strip()
+
+def build_response(payload, rng, config):
+    """
+    Chooses the response text for a request.
+    """
+    response_format = payload.get("format")
+    prompt = payload.get("prompt", "")
+
+    if isinstance(response_format, dict):
+        return json.dumps(sample_from_schema(response_format, rng))
+    if response_format == "json" or "JSON" in prompt:
+        # Creative-shaped JSON; batched prompts list one entry per ad format
+        formats = re.findall(r'^\s*"([A-Z][\w ]+)": \{', prompt, flags=re.MULTILINE)
+        creative_schema = {"type": "object", "properties": {
+            "headline": {"type": "string", "maxLength": 30},
+            "description": {"type": "string", "maxLength": 90},
+            "call_to_action": {"type": "string", "maxLength": 20},
+            "video_snippets": {"type": "array", "items": {"type": "string"}}
+        }}
+        if formats:
+            return json.dumps({f: sample_from_schema(creative_schema, rng) for f in formats})
+        return json.dumps(sample_from_schema(creative_schema, rng))
+    if payload.get("options", {}).get("num_predict") == 1:
+        return "OK"
+    return " ".join(rng.choice(WORDS) for _ in range(config["response_tokens"])) + "."
+
+def tokenize(text):
+    """
+    Splits response text into roughly token-sized pieces for streaming.
+    """
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive or streaming connections are expected
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+def make_handler(config, slots, rng_lock, rng):
+
+    class OllamaStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self.send_json(200, {"models": [{"name": "zephyr:latest", "model": "zephyr:latest"}]})
+            elif self.path == "/api/version":
+                self.send_json(200, {"version": "0.0.0-stub"})
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self.send_json(400, {"error": "invalid JSON body"})
+                return
+
+            if self.path != "/api/generate":
+                self.send_json(404, {"error": "not found"})
+                return
+
+            with rng_lock:
+                fail = rng.random() < config["failure_rate"]
+                stall = rng.random() < config["stall_rate"]
+                latency = sample_latency(config, rng)
+                text = build_response(payload, rng, config)
+
+            if stall:
+                time.sleep(config["stall_seconds"])
+            if fail:
+                self.send_json(500, {"error": "injected failure"})
+                return
+
+            with slots:
+                self.generate(payload, text, latency)
+
+        def generate(self, payload, text, latency):
+            started = time.time()
+            # Prompts continuing from a context only pay for their own tokens
+            prompt_tokens = estimate_tokens(payload.get("prompt", ""))
+            prefill = prompt_tokens / config["prefill_tokens_per_second"]
+            time.sleep(latency + prefill)
+
+            pieces = tokenize(text)
+            context = list(payload.get("context") or []) + list(range(prompt_tokens + len(pieces)))
+            final = {
+                "model": payload.get("model", "zephyr"),
+                "done": True,
+                "done_reason": "stop",
+                "context": context,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": len(pieces),
+            }
+
+            if not payload.get("stream", True):
+                time.sleep(len(pieces) / config["tokens_per_second"])
+                final["eval_duration"] = int(len(pieces) / config["tokens_per_second"] * 1e9)
+                final["total_duration"] = int((time.time() - started) * 1e9)
+                final["response"] = text
+                self.send_json(200, final)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for piece in pieces:
+                    time.sleep(1 / config["tokens_per_second"])
+                    self.write_chunk({"model": final["model"], "response": piece, "done": False})
+                final["eval_duration"] = int(len(pieces) / config["tokens_per_second"] * 1e9)
+                final["total_duration"] = int((time.time() - started) * 1e9)
+                final["response"] = ""
+                self.write_chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client stopped reading (early termination); stop generating like Ollama does
+                self.close_connection = True
+
+        def write_chunk(self, message):
+            data = (json.dumps(message) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return OllamaStubHandler
+
+def make_server(host="127.0.0.1", port=11435, seed=None, **overrides):
+    """
+    Creates a stub server; call serve_forever() on it (optionally in a thread).
+
+    Parameters:
+    - host, port: Address to bind (port 0 picks a free port)
+    - seed: Optional random seed for reproducible latency and failures
+    - overrides: Any DEFAULT_CONFIG keys
+
+    Returns:
+    - ThreadingHTTPServer instance
+    """
+    config = {**DEFAULT_CONFIG, **{k: v for k, v in overrides.items() if v is not None}}
+    slots = threading.BoundedSemaphore(max(1, int(config["parallel"])))
+    handler = make_handler(config, slots, threading.Lock(), random.Random(seed))
+    return StubServer((host, port), handler)
+
+def start_in_thread(**kwargs):
+    """
+    Starts a stub server on a background thread.
+
+    Returns:
+    - (server, base_url) tuple
+    """
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama /api/generate endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--latency-mean", type=float, help="Mean seconds before the first token")
+    parser.add_argument("--latency-sigma", type=float, help="Sigma of the lognormal latency")
+    parser.add_argument("--tokens-per-second", type=float)
+    parser.add_argument("--prefill-tokens-per-second", type=float)
+    parser.add_argument("--response-tokens", type=int, help="Length of free-text responses")
+    parser.add_argument("--failure-rate", type=float, help="Fraction of requests that fail with HTTP 500")
+    parser.add_argument("--stall-rate", type=float, help="Fraction of requests that stall before answering")
+    parser.add_argument("--stall-seconds", type=float)
+    parser.add_argument("--parallel", type=int, help="Concurrent generation slots")
+
+    args = parser.parse_args()
+    overrides = {k: v for k, v in vars(args).items() if k not in ("host", "port", "seed")}
+
+    server = make_server(args.host, args.port, seed=args.seed, **overrides)
+    print(f"Ollama stub listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
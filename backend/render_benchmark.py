@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Render benchmark: single-pass ffmpeg filtergraph versus the multi-pass path.
+
+Renders the same clip for each platform both ways and reports wall time and
+output size. With --multi-output, also compares rendering the platforms one by
+one against rendering them all from one decode; with --workers, compares the
+serial platform loop against the process pool; with --profiles, reports size
+and bitrate against encode time for each encoding profile.
+
+Usage:
+    python render_benchmark.py video.mp4 --start 10 --platforms youtube_shorts display_ads
+    python render_benchmark.py video.mp4 --headline "New trail camera" --cta "Shop now" --subtitles
+    python render_benchmark.py video.mp4 --platforms youtube_shorts youtube_ads display_ads --multi-output
+    python render_benchmark.py video.mp4 --workers 4 --ffmpeg-threads 2
+    python render_benchmark.py video.mp4 --profiles fast balanced archival
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+# Ensure the script can find modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.content import create_youtube_short, create_ad_video, render_platform_outputs
+from modules.render_pool import render_platforms
+from modules.render import render_clip, probe_video
+from modules.encoding import ENCODING_PROFILES
+
+PLATFORM_DURATIONS = {
+    "youtube_shorts": 60,
+    "youtube_ads": 15,
+    "display_ads": 6,
+    "performance_max": 20
+}
+
+def render(platform, video_path, start, output_path, text, subtitles, single_pass):
+    if platform == "youtube_shorts":
+        create_youtube_short(video_path, start, start + PLATFORM_DURATIONS[platform], output_path,
+                             add_text=text, add_subtitles=subtitles, single_pass=single_pass)
+    else:
+        create_ad_video(video_path, start, PLATFORM_DURATIONS[platform], output_path, platform,
+                        ad_text=text, add_subtitles=subtitles, single_pass=single_pass)
+
+def benchmark(video_path, platforms, start, text, subtitles, repeat):
+    """
+    Runs both render paths for each platform.
+
+    Returns:
+    - Dictionary mapping each platform to the timings and sizes of both paths
+    """
+    report = {}
+    work_dir = tempfile.mkdtemp(prefix="render_benchmark_")
+    try:
+        for platform in platforms:
+            report[platform] = {}
+            for mode, single_pass in (("multi_pass", False), ("single_pass", True)):
+                output_path = os.path.join(work_dir, f"{platform}_{mode}.mp4")
+                timings = []
+                for _ in range(repeat):
+                    started = time.time()
+                    render(platform, video_path, start, output_path, text, subtitles, single_pass)
+                    timings.append(time.time() - started)
+                report[platform][mode] = {
+                    "wall_time": round(min(timings), 2),
+                    "output_bytes": os.path.getsize(output_path) if os.path.exists(output_path) else None
+                }
+            multi = report[platform]["multi_pass"]["wall_time"]
+            single = report[platform]["single_pass"]["wall_time"]
+            report[platform]["speedup"] = round(multi / single, 2) if single else None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+def benchmark_multi_output(video_path, platforms, start, text, subtitles, repeat):
+    """
+    Renders all platforms one by one (single pass each) and then from one shared decode.
+
+    Returns:
+    - Dictionary with the wall time of both approaches
+    """
+    work_dir = tempfile.mkdtemp(prefix="render_benchmark_")
+    try:
+        def separate():
+            for platform in platforms:
+                render(platform, video_path, start, os.path.join(work_dir, f"{platform}_separate.mp4"),
+                       text, subtitles, True)
+
+        def shared():
+            render_platform_outputs(video_path, [{
+                "platform": platform,
+                "output_path": os.path.join(work_dir, f"{platform}_shared.mp4"),
+                "start_time": start,
+                "duration": PLATFORM_DURATIONS[platform],
+                "text": text,
+                "subtitles": subtitles
+            } for platform in platforms])
+
+        report = {}
+        for mode, run in (("separate", separate), ("multi_output", shared)):
+            timings = []
+            for _ in range(repeat):
+                started = time.time()
+                run()
+                timings.append(time.time() - started)
+            report[mode] = {"wall_time": round(min(timings), 2)}
+        separate_time = report["separate"]["wall_time"]
+        shared_time = report["multi_output"]["wall_time"]
+        report["speedup"] = round(separate_time / shared_time, 2) if shared_time else None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+def benchmark_parallel(video_path, platforms, start, text, workers, ffmpeg_threads):
+    """
+    Runs the full per-platform step (video, thumbnail, metadata) serially and on a process pool.
+
+    Returns:
+    - Dictionary with the render stats of both paths
+    """
+    report = {}
+    work_dir = tempfile.mkdtemp(prefix="render_benchmark_")
+    try:
+        for mode, pool_workers in (("serial", 1), ("process_pool", workers)):
+            tasks = [{
+                "platform": platform,
+                "video_path": video_path,
+                "timestamp": start,
+                "settings": {"duration": PLATFORM_DURATIONS[platform], "aspect_ratio": None},
+                "output_dir": os.path.join(work_dir, mode, platform),
+                "output_filename": f"{platform}.mp4",
+                "creatives": text or {},
+                "job_id": None
+            } for platform in platforms]
+            _, report[mode] = render_platforms(tasks, workers=pool_workers, ffmpeg_threads=ffmpeg_threads)
+        serial = report["serial"]["wall_time"]
+        pooled = report["process_pool"]["wall_time"]
+        report["speedup"] = round(serial / pooled, 2) if pooled else None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+def benchmark_profiles(video_path, profiles, start, duration, repeat):
+    """
+    Encodes the same clip (no crop or overlays) with each encoding profile.
+
+    Returns:
+    - Dictionary mapping each profile to its encode time, output size and bitrate
+    """
+    report = {}
+    work_dir = tempfile.mkdtemp(prefix="render_benchmark_")
+    try:
+        for profile in profiles:
+            output_path = os.path.join(work_dir, f"{profile}.mp4")
+            timings = []
+            for _ in range(repeat):
+                started = time.time()
+                render_clip(video_path, start, start + duration, output_path, encoding=profile)
+                timings.append(time.time() - started)
+            size = os.path.getsize(output_path)
+            # A clip running past the end of the source comes out shorter than requested
+            output_duration = probe_video(output_path)["duration"]
+            report[profile] = {
+                "encode_time": round(min(timings), 2),
+                "output_bytes": size,
+                "output_duration": round(output_duration, 2),
+                "bitrate_kbps": round(size * 8 / output_duration / 1000, 1) if output_duration else None
+            }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-pass and multi-pass rendering")
+    parser.add_argument("video", help="Path to the input video file")
+    parser.add_argument("--start", type=float, default=0.0, help="Clip start in seconds")
+    parser.add_argument("--platforms", nargs="+", choices=list(PLATFORM_DURATIONS.keys()),
+                        default=["youtube_shorts", "youtube_ads"])
+    parser.add_argument("--headline", help="Headline overlay text")
+    parser.add_argument("--cta", help="Call-to-action overlay text")
+    parser.add_argument("--subtitles", action="store_true", help="Burn in auto-generated subtitles")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per path; the fastest is reported")
+    parser.add_argument("--multi-output", action="store_true",
+                        help="Also compare separate renders with one shared-decode render of all platforms")
+    parser.add_argument("--workers", type=int,
+                        help="Also compare the serial platform loop with a process pool of this size")
+    parser.add_argument("--ffmpeg-threads", type=int, help="Threads per ffmpeg encode in the pool")
+    parser.add_argument("--profiles", nargs="+", choices=list(ENCODING_PROFILES.keys()),
+                        help="Also compare encoding profiles on a clip of --profile-duration seconds")
+    parser.add_argument("--profile-duration", type=float, default=15.0,
+                        help="Clip length for the profile comparison (default: 15)")
+    parser.add_argument("--output", help="Optional path to write the JSON report")
+
+    args = parser.parse_args()
+    text = {"headline": args.headline, "cta": args.cta} if (args.headline or args.cta) else None
+
+    report = benchmark(args.video, args.platforms, args.start, text, args.subtitles, args.repeat)
+    if args.multi_output:
+        report["all_platforms"] = benchmark_multi_output(
+            args.video, args.platforms, args.start, text, args.subtitles, args.repeat
+        )
+    if args.workers:
+        report["parallel"] = benchmark_parallel(
+            args.video, args.platforms, args.start, text, args.workers, args.ffmpeg_threads
+        )
+    if args.profiles:
+        report["profiles"] = benchmark_profiles(
+            args.video, args.profiles, args.start, args.profile_duration, args.repeat
+        )
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
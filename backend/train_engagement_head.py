@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Fits the learned engagement head used by modules/engagement.py.
+
+The head is a ridge-regression layer over the CLIP embeddings cached in each
+job's outputs (clip_embeddings.npz). Targets come from exported ContentMetric
+rows, one JSON object per content item, for example:
+
+    {"job_id": "...", "start_timestamp": 12.0, "duration": 15,
+     "views": 1200, "likes": 80, "shares": 5, "comments": 12,
+     "click_through_rate": 0.031, "conversion_rate": null}
+
+Usage:
+    python train_engagement_head.py metrics.json --jobs-dir ../frontend/jobs
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import datetime
+import numpy as np
+
+# Ensure the script can find modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.engagement import CLIP_MODEL_NAME, DEFAULT_HEAD_PATH, load_embeddings
+
+def load_metrics(metrics_path):
+    """
+    Loads exported ContentMetric rows from a JSON array or JSON-lines file.
+    """
+    with open(metrics_path) as f:
+        text = f.read().strip()
+
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def engagement_target(row):
+    """
+    Turns the raw performance numbers of one content item into a scalar target.
+
+    Returns None when the row has no usable performance data.
+    """
+    views = row.get("views") or 0
+    interactions = (row.get("likes") or 0) + 2 * (row.get("shares") or 0) + (row.get("comments") or 0)
+    ctr = row.get("click_through_rate")
+    conversion = row.get("conversion_rate")
+
+    if views <= 0 and ctr is None and conversion is None:
+        return None
+
+    target = 0.0
+    if views > 0:
+        target += np.log1p(interactions) - np.log1p(views) + 0.1 * np.log1p(views)
+    if ctr is not None:
+        target += 10.0 * ctr
+    if conversion is not None:
+        target += 10.0 * conversion
+    return float(target)
+
+def build_dataset(rows, jobs_dir):
+    """
+    Pairs each metric row with the mean CLIP embedding of its clip window.
+
+    Returns:
+    - (features, targets) NumPy arrays
+    """
+    features = []
+    targets = []
+    embedding_cache = {}
+
+    for row in rows:
+        target = engagement_target(row)
+        job_id = row.get("job_id")
+        if target is None or not job_id:
+            continue
+
+        if job_id not in embedding_cache:
+            embedding_cache[job_id] = load_embeddings(os.path.join(jobs_dir, job_id, "outputs"))
+        embeddings, sample_times = embedding_cache[job_id]
+        if embeddings is None or len(embeddings) == 0:
+            print(f"Skipping job {job_id}: no cached embeddings")
+            continue
+
+        start = float(row.get("start_timestamp") or 0)
+        end = start + float(row.get("duration") or 0)
+        mask = (sample_times >= start) & (sample_times <= end)
+        if not mask.any():
+            # Fall back to the sample closest to the start of the clip
+            mask = np.zeros(len(sample_times), dtype=bool)
+            mask[int(np.argmin(np.abs(sample_times - start)))] = True
+
+        features.append(embeddings[mask].mean(axis=0))
+        targets.append(target)
+
+    if not features:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    return np.stack(features).astype(np.float32), np.array(targets, dtype=np.float32)
+
+def fit_ridge(features, targets, l2=1.0):
+    """
+    Fits a ridge-regression head in closed form.
+
+    Targets are standardised so scores from different heads stay comparable.
+
+    Returns:
+    - (weights, bias) tuple
+    """
+    target_std = targets.std() or 1.0
+    y = (targets - targets.mean()) / target_std
+
+    x_mean = features.mean(axis=0)
+    x = features - x_mean
+
+    dim = x.shape[1]
+    weights = np.linalg.solve(x.T @ x + l2 * np.eye(dim, dtype=np.float32), x.T @ y)
+    bias = -float(x_mean @ weights)
+    return weights.astype(np.float32), bias
+
+def save_head(weights, bias, output_path, n_samples, l2):
+    """
+    Saves the head with a content-derived version string.
+
+    Returns:
+    - version string
+    """
+    digest = hashlib.sha1(weights.tobytes() + np.float32(bias).tobytes()).hexdigest()[:12]
+    version = f"{datetime.datetime.now().strftime('%Y%m%d')}-{digest}"
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    np.savez(
+        output_path,
+        weights=weights,
+        bias=np.float32(bias),
+        version=version,
+        clip_model=CLIP_MODEL_NAME,
+        n_samples=n_samples,
+        l2=l2
+    )
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the learned engagement head from exported metrics")
+    parser.add_argument("metrics", help="Exported ContentMetric rows (JSON array or JSON lines)")
+    parser.add_argument("--jobs-dir", default=os.path.join("..", "frontend", "jobs"),
+                        help="Directory containing <job_id>/outputs folders")
+    parser.add_argument("--output", default=DEFAULT_HEAD_PATH,
+                        help=f"Where to write the head (default: {DEFAULT_HEAD_PATH})")
+    parser.add_argument("--l2", type=float, default=1.0, help="Ridge regularisation strength")
+    parser.add_argument("--min-samples", type=int, default=10,
+                        help="Refuse to train on fewer labelled clips than this")
+
+    args = parser.parse_args()
+
+    rows = load_metrics(args.metrics)
+    features, targets = build_dataset(rows, args.jobs_dir)
+    print(f"Built dataset with {len(targets)} labelled clips from {len(rows)} metric rows")
+
+    if len(targets) < args.min_samples:
+        print(f"Not enough labelled clips to train (need at least {args.min_samples})")
+        sys.exit(1)
+
+    weights, bias = fit_ridge(features, targets, l2=args.l2)
+
+    predictions = features @ weights + bias
+    correlation = np.corrcoef(predictions, targets)[0, 1] if targets.std() > 0 else 0.0
+    print(f"Training correlation: {correlation:.3f}")
+
+    version = save_head(weights, bias, args.output, len(targets), args.l2)
+    print(f"+ Saved engagement head {version} to {args.output}")
+
+if __name__ == "__main__":
+    main()
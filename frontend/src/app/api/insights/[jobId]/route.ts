@@ -0,0 +1,98 @@
+// app/api/insights/[jobId]/route.ts
+import { NextRequest, NextResponse } from 'next/server';
+import prisma from '@/lib/prisma';
+import { join } from 'path';
+import { readFile } from 'fs/promises';
+import { existsSync } from 'fs';
+import { execFile } from 'child_process';
+import { promisify } from 'util';
+
+const execFileAsync = promisify(execFile);
+
+// The script prints its result, or an { error } object on failure, as JSON on its last line
+function parseLastLine(stdout: string): Record<string, unknown> | null {
+  const lines = stdout.trim().split('\n');
+  try {
+    return JSON.parse(lines[lines.length - 1]);
+  } catch {
+    return null;
+  }
+}
+
+// Insights are generated lazily: the first request runs the backend script,
+// which saves insights.json next to the job's outputs for later requests.
+export async function GET(
+  request: NextRequest,
+  context: { params: Promise<{ jobId: string }> | { jobId: string } }
+) {
+  let jobId: string;
+
+  try {
+    if (context.params instanceof Promise) {
+      const resolvedParams = await context.params;
+      jobId = resolvedParams.jobId;
+    } else {
+      jobId = context.params.jobId;
+    }
+
+    const job = await prisma.job.findUnique({
+      where: { id: jobId }
+    });
+
+    if (!job) {
+      return NextResponse.json(
+        { error: 'Job not found' },
+        { status: 404 }
+      );
+    }
+
+    const outputDir = join(process.cwd(), 'jobs', jobId, 'outputs');
+    const insightsPath = join(outputDir, 'insights.json');
+
+    if (existsSync(insightsPath)) {
+      const insights = JSON.parse(await readFile(insightsPath, 'utf8'));
+      return NextResponse.json({ jobId, cached: true, ...insights });
+    }
+
+    if (!existsSync(join(outputDir, 'transcript.txt'))) {
+      return NextResponse.json(
+        { error: 'No transcript available for this job' },
+        { status: 404 }
+      );
+    }
+
+    let stdout: string;
+    try {
+      ({ stdout } = await execFileAsync(
+        'python',
+        ['generate_insights.py', outputDir],
+        { cwd: join(process.cwd(), '..', 'backend'), maxBuffer: 10 * 1024 * 1024 }
+      ));
+    } catch (error) {
+      // A non-zero exit means generation failed; report the script's own error when it gave one
+      const output = (error as { stdout?: string }).stdout;
+      const failure = output ? parseLastLine(output) : null;
+      console.error('Insights generation failed:', error);
+      return NextResponse.json(
+        { jobId, error: typeof failure?.error === 'string' ? failure.error : 'Failed to generate insights' },
+        { status: 502 }
+      );
+    }
+
+    const insights = parseLastLine(stdout);
+    if (!insights || 'error' in insights) {
+      return NextResponse.json(
+        { jobId, error: typeof insights?.error === 'string' ? insights.error : 'Failed to generate insights' },
+        { status: 502 }
+      );
+    }
+
+    return NextResponse.json({ jobId, cached: false, ...insights });
+  } catch (error) {
+    console.error('Error generating insights:', error);
+    return NextResponse.json(
+      { error: 'Failed to generate insights', details: error instanceof Error ? error.message : String(error) },
+      { status: 500 }
+    );
+  }
+}